@@ -13,9 +13,18 @@ if test -f "/run/secrets/atom_api_key"; then
     export ATOM_API_KEY=$(cat "/run/secrets/atom_api_key")
 fi
 
+# publish tasks wait for remote imports most of the time, the publish-worker
+# service runs them in threads so they do not block the default worker processes
+if [ "$WORKER" = "publish" ]
+then
+    WORKER_COMMAND="celery -A workers.default.tasks -Q publish worker -n publish@%h -P threads --concurrency=${PUBLISH_WORKER_THREADS:-16} --prefetch-multiplier=1 --loglevel=info"
+else
+    WORKER_COMMAND="celery -A workers.default.tasks -Q default,celery worker ${FIXITY_AUDIT_INTERVAL:+--beat} --loglevel=info"
+fi
+
 if [ "$CILANTRO_ENV" = "development" ]
 then
-    watchmedo auto-restart -R -d service -d config -d workers -d utils -p="*.py;*.yml" -- celery -A workers.default.tasks -Q default,celery worker --loglevel=info
+    watchmedo auto-restart -R -d service -d config -d workers -d utils -p="*.py;*.yml" -- $WORKER_COMMAND
 else
-    celery -A workers.default.tasks -Q default,celery worker --loglevel=info
+    $WORKER_COMMAND
 fi
@@ -1,10 +1,14 @@
 from flask import Blueprint
 from service.user.user_service import auth
 
-from utils.atom_api import get_record
+from service.atom.record_cache import RecordCache, create_redis_client
+from utils.atom_api import get_record_response
 
 atom_controller = Blueprint('atom', __name__)
 
+record_cache = RecordCache(get_record_response,
+                           redis_client=create_redis_client())
+
 
 @atom_controller.route('/<atom_id>', methods=['GET'])
 @auth.login_required
@@ -16,6 +20,9 @@ def get_atom_record(atom_id):
     key is not supposed to be handled by the frontend, it done through the
     backend where the is not exposed.
 
+    Records are cached for ATOM_CACHE_TTL seconds, see
+    `service.atom.record_cache.RecordCache`.
+
     .. :quickref: AtoM Controller; Get record from AtoM API
 
     **Example request**:
@@ -60,4 +67,4 @@ def get_atom_record(atom_id):
 
     :return: A JSON object containing the AtoM object
     """
-    return get_record(atom_id)
+    return record_cache.get(atom_id)
@@ -0,0 +1,215 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+
+log = logging.getLogger(__name__)
+
+ATOM_CACHE_SIZE = int(os.environ.get('ATOM_CACHE_SIZE', '1000'))
+ATOM_CACHE_TTL = float(os.environ.get('ATOM_CACHE_TTL', '300'))
+# share the cache between the service processes in the celery result redis
+ATOM_CACHE_REDIS = os.environ.get('ATOM_CACHE_REDIS', '0') == '1'
+# stale records are kept this many TTLs longer for revalidation
+STALE_TTL_FACTOR = 10
+
+_REDIS_PREFIX = 'cilantro:atom_record:'
+
+
+class CachedRecord:
+
+    def __init__(self, text, etag=None, last_modified=None, fetched=None):
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched = fetched if fetched is not None else time.time()
+
+    def is_fresh(self, ttl):
+        return time.time() - self.fetched < ttl
+
+    def validators(self):
+        """Return the headers of a conditional request for this record."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_json(self):
+        return json.dumps(self.__dict__)
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(**json.loads(data))
+
+
+class RecordCache:
+    """
+    A bounded LRU cache of AtoM records with a time to live.
+
+    Records older than the TTL are revalidated with a conditional request
+    if AtoM sent an ETag or Last-Modified header, otherwise fetched again.
+    Concurrent lookups of a missing or stale record wait for a single
+    request to AtoM.
+
+    The records can additionally be shared between processes in redis.
+    """
+
+    def __init__(self, fetch, max_entries=ATOM_CACHE_SIZE, ttl=ATOM_CACHE_TTL,
+                 redis_client=None):
+        """
+        :param fetch: function taking the id and the headers of a conditional
+            request, returning a `requests.Response`
+        :param int max_entries: maximum number of records kept in memory
+        :param float ttl: seconds a record is used without revalidation
+        :param redis.Redis redis_client: (optional) shared second level
+        """
+        self.fetch = fetch
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.redis = redis_client
+        self._records = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'shared_hits': 0, 'misses': 0,
+                       'revalidated': 0, 'coalesced': 0}
+
+    def get(self, record_id):
+        """
+        Return the record text, from the cache if it is fresh.
+
+        Failed requests are not cached, their response text is returned.
+
+        :param str record_id: the AtoM id
+        :return str:
+        """
+        with self._lock:
+            record = self._records.get(record_id)
+            if record is not None and record.is_fresh(self.ttl):
+                self._records.move_to_end(record_id)
+                self._stats['hits'] += 1
+                return record.text
+
+            pending = self._pending.get(record_id)
+            if pending is None:
+                pending = self._pending[record_id] = _PendingLookup()
+                leader = True
+            else:
+                self._stats['coalesced'] += 1
+                leader = False
+
+        if not leader:
+            return pending.wait()
+
+        try:
+            text = self._lookup(record_id, record)
+            pending.set_result(text)
+            return text
+        except BaseException as e:
+            pending.set_error(e)
+            raise
+        finally:
+            with self._lock:
+                del self._pending[record_id]
+
+    def stats(self):
+        """
+        Return the cache statistics of this process.
+
+        :return dict: counts of 'hits' in memory, 'shared_hits' in redis,
+            'misses', 'revalidated' records and 'coalesced' lookups, the
+            number of cached 'records' and the 'hit_rate'
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['records'] = len(self._records)
+        lookups = stats['hits'] + stats['shared_hits'] + stats['misses'] \
+            + stats['revalidated'] + stats['coalesced']
+        hits = lookups - stats['misses']
+        stats['hit_rate'] = round(hits / lookups, 3) if lookups else None
+        return stats
+
+    def _lookup(self, record_id, record):
+        shared = self._get_shared(record_id)
+        if shared is not None and (record is None
+                                   or shared.fetched > record.fetched):
+            record = shared
+            if record.is_fresh(self.ttl):
+                self._count('shared_hits')
+                self._store(record_id, record, share=False)
+                return record.text
+
+        response = self.fetch(record_id,
+                              record.validators() if record else {})
+        if response.status_code == 304 and record is not None:
+            self._count('revalidated')
+            record.fetched = time.time()
+            self._store(record_id, record)
+            return record.text
+
+        self._count('misses')
+        if response.status_code == 200:
+            self._store(record_id, CachedRecord(
+                response.text, response.headers.get('ETag'),
+                response.headers.get('Last-Modified')))
+        return response.text
+
+    def _store(self, record_id, record, share=True):
+        with self._lock:
+            self._records[record_id] = record
+            self._records.move_to_end(record_id)
+            while len(self._records) > self.max_entries:
+                self._records.popitem(last=False)
+        if share and self.redis is not None:
+            try:
+                self.redis.set(_REDIS_PREFIX + record_id, record.to_json(),
+                               ex=int(self.ttl * STALE_TTL_FACTOR) or 1)
+            except Exception as e:  # noqa: the shared cache is optional
+                log.warning(f"Could not store AtoM record in redis: {e}")
+
+    def _get_shared(self, record_id):
+        if self.redis is None:
+            return None
+        try:
+            data = self.redis.get(_REDIS_PREFIX + record_id)
+        except Exception as e:  # noqa: the shared cache is optional
+            log.warning(f"Could not read AtoM record from redis: {e}")
+            return None
+        return CachedRecord.from_json(data) if data else None
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+
+class _PendingLookup:
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._result = None
+        self._error = None
+
+    def set_result(self, result):
+        self._result = result
+        self._event.set()
+
+    def set_error(self, error):
+        self._error = error
+        self._event.set()
+
+    def wait(self):
+        self._event.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+def create_redis_client():
+    """Return a client of the redis used as celery backend, if enabled."""
+    if not ATOM_CACHE_REDIS:
+        return None
+    return redis.Redis(host=os.environ['DB_HOST'])
@@ -1,4 +1,7 @@
-from flask import Blueprint
+from flask import Blueprint, jsonify
+
+from service.atom.atom_controller import record_cache
+from utils import http_client
 
 front_controller = Blueprint('front', __name__)
 
@@ -6,3 +9,46 @@ front_controller = Blueprint('front', __name__)
 @front_controller.route('/')
 def index():
     return "cilantro is up and running ..."
+
+
+@front_controller.route('/metrics')
+def metrics():
+    """
+    Get the metrics of the service process answering the request.
+
+    The service runs in several processes, each with its own metrics.
+
+    .. :quickref: Front Controller; Get service metrics
+
+    **Example response SUCCESS**:
+
+    .. sourcecode:: http
+
+        HTTP/1.1 200 OK
+
+        {
+            "atom_record_cache": {
+                "hits": 12,
+                "shared_hits": 0,
+                "misses": 3,
+                "revalidated": 1,
+                "coalesced": 2,
+                "records": 3,
+                "hit_rate": 0.833
+            },
+            "http_requests": {
+                "atom.get_record": {
+                    "requests": 4,
+                    "errors": 0,
+                    "seconds": 1.2,
+                    "max_seconds": 0.5
+                }
+            }
+        }
+
+    :return: A JSON object containing the metrics
+    """
+    return jsonify({
+        'atom_record_cache': record_cache.stats(),
+        'http_requests': http_client.get_metrics()
+    })
@@ -9,7 +9,8 @@ from utils.job_db import JobDb
 from utils import json_validation
 
 from service.job.jobs import IngestArchivalMaterialsJob,\
-    IngestJournalsJob, IngestMonographsJob, NlpJob
+    IngestJournalsJob, IngestMonographsJob, NlpJob, RepublishMetadataJob
+from service.job.preflight import Preflight
 
 job_controller = Blueprint('job', __name__)
 
@@ -573,6 +574,183 @@ def nlp_job_create():
     return body, 202, headers
 
 
+@job_controller.route('/republish_metadata', methods=['POST'])
+@auth.login_required
+def republish_metadata_job_create():
+    """
+    Create a job that updates the metadata of archived objects.
+
+    The objects are loaded from the archive, only their PDF metadata and
+    XML files are regenerated and they are published again. The scans are
+    not processed again.
+
+    Journals and monographs are imported into OJS / OMP again, which
+    creates a new issue or submission instead of updating the existing one.
+    The digital objects of archival material in AtoM are kept.
+
+    Parameters can be provided as JSON as part of the request body
+    and must match the job parameter schema.
+
+    Valid user credential have to be given via HTTP basic authentication.
+
+    Also adds the job to the job database.
+
+    .. :quickref: Job Controller; Republish the metadata of archived objects
+
+    **Example request**:
+
+    .. sourcecode:: http
+
+      POST /job/republish_metadata HTTP/1.1
+
+      {
+          "targets": [
+            {
+              "id": "BOOK-ZID001573894_12",
+              "object_type": "monograph",
+              "metadata": {
+                "title": "Aus dem Tempel und dem ewigen Genuß des Geistes verstoßen?",
+                "press_code": "dai"
+              }
+            }
+          ]
+        }
+
+    The id is the object id in the archive, the metadata updates the
+    archived metadata.
+
+    **Example response SUCCESS**:
+
+    .. sourcecode:: http
+
+        HTTP/1.1 202 ACCEPTED
+
+        {
+            "job_id": "399a5952-f594-11e9-ae9e-0242ac120007",
+            "success": true
+        }
+
+    :reqheader Accept: application/json
+    :<json list targets: archived object ids, object types and metadata
+
+    :resheader Content-Type: application/json
+    :>json dict: operation result
+    :status 202: ACCEPTED
+
+    :return: A JSON object containing the status and the job id
+    """
+    if not request.data:
+        raise ApiError("invalid_job_params", "No request payload found")
+    params = request.get_json(force=True)
+    user_name = auth.username()
+    try:
+        json_validation.validate_params(params, 'republish_metadata')
+    except FileNotFoundError as e:
+        raise ApiError("unknown_job_type", str(e), 404)
+    except jsonschema.exceptions.ValidationError as e:
+        raise ApiError("invalid_job_params", str(e), 400)
+
+    job = RepublishMetadataJob(params, user_name)
+    job.run()
+
+    body = jsonify({
+        'success': True,
+        'job_id': job.id})
+
+    headers = {'Location': url_for(
+        'job.job_status', job_id=job.id)}
+    return body, 202, headers
+
+
+@job_controller.route('/<job_type>/preflight', methods=['POST'])
+@auth.login_required
+def job_preflight(job_type):
+    """
+    Check the staged files of a job and estimate its cost without queuing it.
+
+    The parameters are the same as for creating a job of the given type.
+    Every target is walked once, reading only the image headers.
+
+    .. :quickref: Job Controller; Check a job before creating it
+
+    **Example request**:
+
+    .. sourcecode:: http
+
+      POST /job/<job-type>/preflight HTTP/1.1
+
+    **Example response**:
+
+    .. sourcecode:: http
+
+        HTTP/1.1 200 OK
+
+        {
+            "success": true,
+            "valid": false,
+            "errors": [
+                {
+                    "target": "BOOK-ZID001573894",
+                    "file": "BOOK-ZID001573894/tif/0003.tif",
+                    "message": "unreadable image: cannot identify image file"
+                }
+            ],
+            "warnings": [
+                {
+                    "target": "BOOK-ZID001573894",
+                    "file": "BOOK-ZID001573894/tif/0001.tif",
+                    "message": "resolution of 72 dpi is below 150 dpi, OCR may fail"
+                }
+            ],
+            "estimate": {
+                "targets": 1,
+                "files": 3,
+                "pages": 2,
+                "bytes": 52428800,
+                "megapixels": 17.6,
+                "ocr_seconds": 40,
+                "ocr_seconds_per_page": 20.0,
+                "ocr_rate_source": "history"
+            },
+            "targets": [
+                {
+                    "id": "BOOK-ZID001573894",
+                    "files": 3,
+                    "pages": 2,
+                    "bytes": 52428800,
+                    "megapixels": 17.6
+                }
+            ],
+            "seconds": 0.012
+        }
+
+    :reqheader Accept: application/json
+    :param str job_type: name of the job type
+    :<json dict targets: targets with file path and metadata
+    :<json dict options: job chain options
+
+    :resheader Content-Type: application/json
+    :>json dict: validation results and cost estimate
+    :status 200: OK
+    :status 400: invalid job parameters
+    :status 404: unknown job type
+
+    :return: A JSON object containing errors, warnings and the cost estimate
+    """
+    if not request.data:
+        raise ApiError("invalid_job_params", "No request payload found")
+    params = request.get_json(force=True)
+    try:
+        json_validation.validate_params(params, job_type)
+    except FileNotFoundError as e:
+        raise ApiError("unknown_job_type", str(e), 404)
+    except jsonschema.exceptions.ValidationError as e:
+        raise ApiError("invalid_job_params", str(e), 400)
+
+    result = Preflight(job_type, params, auth.username()).run()
+    return jsonify({'success': True, **result})
+
+
 @job_controller.route('/param_schema/<job_type>', methods=['GET'])
 def get_job_param_schema(job_type):
     """
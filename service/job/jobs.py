@@ -9,6 +9,10 @@ from workers.task_information import get_label, get_description
 from utils.celery_client import celery_app
 from utils.job_db import JobDb
 
+# Reference galley files by their repository URL in the OJS and OMP import
+# XML instead of embedding them. OJS and OMP have to reach REPOSITORY_URI.
+GALLEYS_BY_REFERENCE = os.getenv('GALLEYS_BY_REFERENCE', '0') == '1'
+
 
 class BaseJob:
     """Wraps multiple celery task chains as a celery chord and handles ID generation."""
@@ -155,6 +159,9 @@ class IngestArchivalMaterialsJob(BatchJob):
 
             current_chain = _link('create_object', **task_params)
 
+            current_chain |= _link('convert.analyze_pages',
+                                   representation='tif')
+
             current_chain |= _link('list_files',
                                    representation='tif',
                                    target='jpg',
@@ -163,7 +170,7 @@ class IngestArchivalMaterialsJob(BatchJob):
             current_chain |= _link('list_files',
                                    representation='jpg',
                                    target='jpg_thumbnails',
-                                   task='convert.tif_to_jpg',
+                                   task='convert.scale_image',
                                    max_width=50,
                                    max_height=50)
 
@@ -195,6 +202,7 @@ class IngestArchivalMaterialsJob(BatchJob):
 
             current_chain |= _link('publish_to_repository')
             current_chain |= _link('publish_to_atom')
+            current_chain |= _link('convert.compress_masters')
             current_chain |= _link('publish_to_archive')
 
             current_chain |= _link('cleanup_directories')
@@ -210,7 +218,8 @@ class IngestArchivalMaterialsJob(BatchJob):
 
         return (chains, chain_parameters)
 
-    def _create_pdf_metadata(self, metadata):
+    @staticmethod
+    def _create_pdf_metadata(metadata):
         pdf_metadata = {}
         if "title" in metadata:
             pdf_metadata["/Title"] = metadata["title"]
@@ -323,21 +332,22 @@ class IngestJournalsJob(BatchJob):
             )
 
             article_workdir_prefixes = []
-            article_copy_instructions = {}
+            article_instructions = []
             for count, article in enumerate(issue_target["metadata"]["articles"]):
                 prefix = f"article-{count}_"
                 article_workdir_prefixes.append(prefix)
-                article_copy_instructions[f"{article['path']}/tif"] = (f"{prefix}tif", "*.tif")
+                article_instructions.append({
+                    'source': f"{article['path']}/tif",
+                    'prefix': prefix,
+                    'issue_pages': article.get('issue_pages')
+                })
 
             task_params = dict(
                 **issue_target, 
                 **{
                     'user': user_name,
-                    'copy_instructions':
-                    {
-                        **{"tif": ("issue_tif", "*.tif")},
-                        **article_copy_instructions
-                    }
+                    'copy_instructions': {"tif": ("issue_tif", "*.tif")},
+                    'article_instructions': article_instructions
                 }
             )
 
@@ -349,12 +359,21 @@ class IngestJournalsJob(BatchJob):
                 lang = None
 
             current_chain = self._add_image_processing_links(current_chain, "issue_", lang)
-            
-            counter = 0
-            for prefix in article_workdir_prefixes:
-                current_chain = self._add_image_processing_links(current_chain, prefix, lang)
-                counter += 1
-            
+
+            # Articles whose scans are not found in the issue are converted
+            # file by file. The links are skipped for the others, which have
+            # no tif representation and no pdf representation yet.
+            for instruction in article_instructions:
+                if not instruction['issue_pages']:
+                    current_chain = self._add_image_processing_links(
+                        current_chain, instruction['prefix'], lang,
+                        optional=True)
+
+            # Article pages are part of the issue scans, so the article
+            # representations are derived from the processed issue.
+            if article_instructions:
+                current_chain |= _link('convert.derive_articles')
+
             current_chain |= _link(
                 'generate_xml',
                 input_file_directories={
@@ -362,6 +381,7 @@ class IngestJournalsJob(BatchJob):
                 },
                 template_file='ojs3_template_issue.xml',
                 target_filename='ojs_import.xml',
+                galleys_by_reference=GALLEYS_BY_REFERENCE
             )
 
             # current_chain |= _link(
@@ -371,11 +391,16 @@ class IngestJournalsJob(BatchJob):
             #     schema_file='mets.xsd'
             # )
 
+            if GALLEYS_BY_REFERENCE:
+                # OJS fetches the galleys from the repository while importing
+                current_chain |= _link('publish_to_repository')
+
             current_chain |= _link(
                 'publish_to_ojs',
                 ojs_journal_code=issue_target['metadata']['ojs_journal_code']
             )
 
+            current_chain |= _link('convert.compress_masters')
             current_chain |= _link('publish_to_archive')
 
             current_chain |= _link('cleanup_directories')
@@ -395,25 +420,35 @@ class IngestJournalsJob(BatchJob):
 
         return (chains, chain_parameters)
 
-    def _add_image_processing_links(self, chain, directory_prefix, ocr_lang):
+    def _add_image_processing_links(self, chain, directory_prefix, ocr_lang,
+                                    optional=False):
+        chain |= _link(
+            'convert.analyze_pages',
+            representation=f'{directory_prefix}tif',
+            optional=optional
+        )
+
         chain |= _link(
                 'list_files',
                 representation=f'{directory_prefix}tif',
                 target=f'{directory_prefix}pdf',
                 task='convert.tif_to_pdf',
-                ocr_lang=ocr_lang
+                ocr_lang=ocr_lang,
+                optional=optional
             )
 
         chain |= _link(
             'convert.merge_converted_pdf',
-            input_directory=f'{directory_prefix}pdf'
+            input_directory=f'{directory_prefix}pdf',
+            optional=optional
         )
 
         chain |= _link(
             'list_files',
             representation=f'{directory_prefix}tif',
             target=f'{directory_prefix}jpg',
-            task='convert.tif_to_jpg'
+            task='convert.tif_to_jpg',
+            optional=optional
         )
 
         chain |= _link(
@@ -422,7 +457,9 @@ class IngestJournalsJob(BatchJob):
             target=f'{directory_prefix}jpg_thumbnails',
             task='convert.scale_image',
             max_width=50,
-            max_height=50
+            max_height=50,
+            derive_from=f'{directory_prefix}jpg',
+            optional=optional
         )
 
         return chain
@@ -446,6 +483,9 @@ class IngestMonographsJob(BatchJob):
 
             current_chain = _link('create_object', **task_params)
 
+            current_chain |= _link('convert.analyze_pages',
+                                   representation='tif')
+
             if params['options']['ocr_options']['do_ocr']:
                 lang = params['options']['ocr_options']['ocr_lang']
             else:
@@ -469,11 +509,13 @@ class IngestMonographsJob(BatchJob):
                                    target='jpg_thumbnails',
                                    task='convert.scale_image',
                                    max_width=50,
-                                   max_height=50)
+                                   max_height=50,
+                                   derive_from='jpg')
 
             current_chain |= _link('generate_xml',
                                    template_file='omp_template.xml',
-                                   target_filename='omp_import.xml')
+                                   target_filename='omp_import.xml',
+                                   galleys_by_reference=GALLEYS_BY_REFERENCE)
 
             current_chain |= _link('generate_xml',
                                     template_file='mets_template_monography.xml',
@@ -482,6 +524,7 @@ class IngestMonographsJob(BatchJob):
 
             current_chain |= _link('publish_to_repository')
 
+            current_chain |= _link('convert.compress_masters')
             current_chain |= _link('publish_to_archive')
 
             current_chain |= _link('publish_to_omp',
@@ -500,6 +543,120 @@ class IngestMonographsJob(BatchJob):
         return (chains, chain_parameters)
 
 
+class RepublishMetadataJob(BatchJob):
+    job_type = 'republish_metadata'
+    label = 'Republish Metadata'
+    description = ("Update the metadata of archived objects and publish them again without processing the scans. "
+                   "Journals and monographs are imported into OJS / OMP again as a new issue or submission, "
+                   "the existing one is not updated.")
+
+    def _create_chains(self, params, user_name):
+        chains = []
+        chain_parameters = []
+
+        for target in params['targets']:
+            chain_parameters.append(
+                target
+            )
+
+            object_type = target['object_type']
+            metadata = target['metadata']
+
+            # the PDF metadata is rewritten in place, the other
+            # representations can be linked from the archive
+            writable_representations = \
+                ['pdf'] if object_type == 'archival_material' else []
+
+            current_chain = _link(
+                'load_archived_object',
+                **target,
+                **{'user': user_name},
+                writable_representations=writable_representations
+            )
+
+            if object_type == 'archival_material':
+                current_chain = self._add_archival_material_links(
+                    current_chain, metadata)
+            elif object_type == 'journal':
+                current_chain = self._add_journal_links(
+                    current_chain, metadata)
+            else:
+                current_chain = self._add_monograph_links(
+                    current_chain, metadata)
+
+            current_chain |= _link('cleanup_directories')
+
+            current_chain |= _link(
+                'finish_chain',
+                success_msg="Metadata republished successfully",
+                user_name=user_name
+            )
+            chains.append(current_chain)
+
+        return (chains, chain_parameters)
+
+    def _add_archival_material_links(self, chain, metadata):
+        chain |= _link(
+            'convert.set_pdf_metadata',
+            metadata=IngestArchivalMaterialsJob._create_pdf_metadata(metadata)
+        )
+
+        chain |= _link('generate_xml',
+                       template_file='mets_template_archive.xml',
+                       target_filename='mets.xml',
+                       schema_file='mets.xsd')
+
+        # the digital object in AtoM links to the repository copy, which
+        # keeps its URL, so it is not created again
+        chain |= _link('publish_to_repository')
+        chain |= _link('publish_to_archive')
+        return chain
+
+    def _add_journal_links(self, chain, metadata):
+        article_pdf_directories = [
+            f"article-{count}_pdf"
+            for count in range(len(metadata['articles']))
+        ]
+
+        chain |= _link(
+            'generate_xml',
+            input_file_directories={
+                "pdfs": ["issue_pdf"] + article_pdf_directories
+            },
+            template_file='ojs3_template_issue.xml',
+            target_filename='ojs_import.xml',
+            galleys_by_reference=GALLEYS_BY_REFERENCE
+        )
+
+        if GALLEYS_BY_REFERENCE:
+            chain |= _link('publish_to_repository')
+
+        # OJS native import can not update an issue, so this creates a new
+        # one, the archive is updated first in case the import fails
+        chain |= _link('publish_to_archive')
+        chain |= _link('publish_to_ojs',
+                       ojs_journal_code=metadata['ojs_journal_code'])
+        return chain
+
+    def _add_monograph_links(self, chain, metadata):
+        chain |= _link('generate_xml',
+                       template_file='omp_template.xml',
+                       target_filename='omp_import.xml',
+                       galleys_by_reference=GALLEYS_BY_REFERENCE)
+
+        chain |= _link('generate_xml',
+                       template_file='mets_template_monography.xml',
+                       target_filename='mets.xml',
+                       schema_file='mets.xsd')
+
+        chain |= _link('publish_to_repository')
+        # like OJS, OMP native import creates a new submission
+        chain |= _link('publish_to_archive')
+        chain |= _link('publish_to_omp',
+                       omp_press_code=metadata['press_code'])
+        return chain
+
+
 class NlpJob(BatchJob):
     job_type = 'nlp'
     label = 'Experimental NLP'
@@ -528,7 +685,9 @@ class NlpJob(BatchJob):
                     chain |= _link('list_files',
                                        representation='pdf',
                                        target='txt',
-                                       task='convert.pdf_to_txt')
+                                       task='convert.pdf_to_txt',
+                                       ocr_lang=params['options'].get('ocr_lang'),
+                                       consolidate=True)
 
                     chain |= _link('nlp.annotate_pages',
                                         representation='txt',
@@ -0,0 +1,258 @@
+import glob
+import logging
+import os
+import statistics
+import time
+
+from PIL import Image
+
+from utils.job_db import JobDb
+from utils.object import InvalidObjectIdError
+from utils.repository import generate_repository_path
+
+log = logging.getLogger(__name__)
+
+staging_dir = os.environ['STAGING_DIR']
+archive_dir = os.environ['ARCHIVE_DIR']
+
+# OCR time per page if there are no finished OCR jobs in the job database
+OCR_SECONDS_PER_PAGE = float(os.environ.get('OCR_SECONDS_PER_PAGE', 20))
+# number of finished OCR jobs the historical rate is computed from
+OCR_RATE_SAMPLES = 500
+# scans with a lower resolution are not OCRed by ocrmypdf or yield bad text
+MIN_OCR_DPI = int(os.environ.get('PREFLIGHT_MIN_OCR_DPI', 150))
+
+TIF_PATTERNS = ['**/*.tif', '**/*.tiff', '**/*.TIF', '**/*.TIFF']
+NLP_PATTERNS = {
+    'pdf': ['**/*.pdf', '**/*.PDF'],
+    'txt': ['**/*.txt', '**/*.TXT']
+}
+
+_BITS_PER_BAND = {'1': 1, 'I': 32, 'F': 32, 'I;16': 16, 'I;16B': 16,
+                  'I;16L': 16, 'I;16N': 16}
+# image modes the converters handle, others like palette or 16 bit gray
+# images fail in tif_to_pdf or tif_to_jpg
+SUPPORTED_MODES = ('1', 'L', 'RGB', 'RGBA', 'CMYK')
+_TIFF_BITS_PER_SAMPLE = 258
+
+
+class Preflight:
+    """
+    Check the staged files of a job and estimate its cost before queuing it.
+
+    Every target directory is walked once and only the headers of the images
+    are read. Problems that let the job fail are reported as errors, problems
+    that degrade the result as warnings.
+    """
+
+    def __init__(self, job_type, params, user_name):
+        self.job_type = job_type
+        self.params = params
+        self.user_name = user_name
+        self.errors = []
+        self.warnings = []
+
+    def run(self):
+        """
+        Run the preflight checks.
+
+        :return dict: validation results, cost estimate and a summary of
+            every target
+        """
+        start = time.monotonic()
+        targets = [self._check_target(target)
+                   for target in self.params['targets']]
+
+        estimate = {
+            'targets': len(targets),
+            'files': sum(target['files'] for target in targets),
+            'pages': sum(target['pages'] for target in targets),
+            'bytes': sum(target['bytes'] for target in targets),
+            'megapixels': round(sum(target['megapixels']
+                                    for target in targets), 1)
+        }
+        estimate.update(self._estimate_ocr(estimate['pages']))
+
+        return {
+            'valid': not self.errors,
+            'errors': self.errors,
+            'warnings': self.warnings,
+            'estimate': estimate,
+            'targets': targets,
+            'seconds': round(time.monotonic() - start, 3)
+        }
+
+    def _check_target(self, target):
+        summary = {'id': target['id'], 'files': 0, 'pages': 0, 'bytes': 0,
+                   'megapixels': 0.0}
+        if self.job_type == 'republish_metadata':
+            return self._check_archived_object(target, summary)
+
+        path = os.path.join(staging_dir, self.user_name, target['path'])
+        if not os.path.isdir(path):
+            self._error(target, target['path'], "directory not found")
+            return summary
+
+        if self.job_type == 'ingest_journals':
+            files = self._find_files(target, path, ['tif/*.tif'])
+            self._check_articles(target, path, len(files))
+        elif self.job_type == 'nlp':
+            files = []
+            for extension in self.params['options']['extensions']:
+                files += self._find_files(target, path,
+                                          NLP_PATTERNS.get(extension, []))
+        else:
+            files = self._find_files(target, path, TIF_PATTERNS)
+
+        for file in files:
+            summary['files'] += 1
+            summary['bytes'] += os.path.getsize(file)
+            if self.job_type == 'nlp':
+                continue
+            header = self._read_image_header(target, file)
+            if header:
+                summary['pages'] += 1
+                summary['megapixels'] += header['megapixels']
+        summary['megapixels'] = round(summary['megapixels'], 1)
+        return summary
+
+    def _check_archived_object(self, target, summary):
+        """Check that the object of a target without staged files is archived."""
+        try:
+            path = os.path.join(archive_dir,
+                                generate_repository_path(target['id']))
+        except InvalidObjectIdError as e:
+            self._error(target, target['id'], str(e))
+            return summary
+
+        if not os.path.isfile(os.path.join(path, 'meta.json')):
+            self._error(target, target['id'], "object not found in archive")
+            return summary
+
+        for root, _, files in os.walk(path):
+            for name in files:
+                summary['files'] += 1
+                summary['bytes'] += os.path.getsize(os.path.join(root, name))
+        return summary
+
+    def _find_files(self, target, path, patterns):
+        files = []
+        for pattern in patterns:
+            files += glob.glob(os.path.join(path, pattern), recursive=True)
+        if not files:
+            self._error(target, target['path'],
+                        f"no files matching {', '.join(patterns)} found")
+        return sorted(set(files))
+
+    def _check_articles(self, target, path, issue_pages):
+        for article in target['metadata'].get('articles', []):
+            pages = article.get('issue_pages')
+            if pages:
+                first, last = pages
+                if first < 1 or last > issue_pages or first > last:
+                    self._error(target, article['path'],
+                                f"invalid issue pages {first}-{last}, the "
+                                f"issue has {issue_pages} scans")
+            elif not glob.glob(os.path.join(path, article['path'], 'tif',
+                                            '*.tif')):
+                self._error(target, article['path'],
+                            "no article scans and no issue pages given")
+
+    def _read_image_header(self, target, file):
+        """
+        Read dimensions, resolution, compression and bit depth of an image.
+
+        Pillow only parses the header when opening an image, the pixel data
+        is not decoded.
+        """
+        try:
+            with Image.open(file) as image:
+                width, height = image.size
+                header = {
+                    'megapixels': width * height / 1000000,
+                    'dpi': image.info.get('dpi'),
+                    'compression': image.info.get('compression'),
+                    'mode': image.mode,
+                    'bits_per_channel': _bits_per_channel(image)
+                }
+        except Image.DecompressionBombError as e:
+            self._warning(target, file, str(e))
+            return None
+        except OSError as e:
+            self._error(target, file, f"unreadable image: {e}")
+            return None
+
+        if self._ocr_lang():
+            dpi = header['dpi'][0] if header['dpi'] else None
+            if not dpi:
+                self._warning(target, file,
+                              "no resolution stored, OCR will be skipped")
+            elif dpi < MIN_OCR_DPI:
+                self._warning(target, file,
+                              f"resolution of {round(dpi)} dpi is below "
+                              f"{MIN_OCR_DPI} dpi, OCR may fail")
+        if header['mode'] not in SUPPORTED_MODES:
+            self._error(target, file,
+                        f"unsupported image mode {header['mode']}")
+        elif header['bits_per_channel'] > 8:
+            self._warning(target, file,
+                          f"{header['bits_per_channel']} bit per channel "
+                          f"image will be reduced to 8 bit per channel")
+        return header
+
+    def _estimate_ocr(self, pages):
+        if not self._ocr_lang() or not pages:
+            return {'ocr_seconds': 0}
+
+        durations = []
+        job_db = JobDb()
+        try:
+            durations = job_db.get_task_durations(
+                'convert.tif_to_pdf', {'ocr_lang': {'$ne': None}},
+                OCR_RATE_SAMPLES)
+        except Exception as e:
+            log.warning(f"Could not read OCR durations from job db: {e}")
+        finally:
+            job_db.close()
+
+        if durations:
+            rate, source = statistics.median(durations), 'history'
+        else:
+            rate, source = OCR_SECONDS_PER_PAGE, 'default'
+        return {
+            'ocr_seconds': round(pages * rate),
+            'ocr_seconds_per_page': round(rate, 2),
+            'ocr_rate_source': source
+        }
+
+    def _ocr_lang(self):
+        options = self.params.get('options', {})
+        ocr_options = options.get('ocr_options', {})
+        if ocr_options.get('do_ocr'):
+            return ocr_options.get('ocr_lang')
+        return None
+
+    def _error(self, target, file, message):
+        self.errors.append(self._issue(target, file, message))
+
+    def _warning(self, target, file, message):
+        self.warnings.append(self._issue(target, file, message))
+
+    def _issue(self, target, file, message):
+        user_dir = os.path.join(staging_dir, self.user_name)
+        if os.path.isabs(file):
+            file = os.path.relpath(file, user_dir)
+        return {'target': target['id'], 'file': file, 'message': message}
+
+
+def _bits_per_channel(image):
+    """
+    Return the bits per channel stored in the image.
+
+    Pillow opens e.g. 16 bit RGB TIFFs as 8 bit RGB images, so the TIFF
+    header is preferred over the image mode.
+    """
+    bits = getattr(image, 'tag_v2', {}).get(_TIFF_BITS_PER_SAMPLE)
+    if bits:
+        return max(bits) if isinstance(bits, tuple) else bits
+    return _BITS_PER_BAND.get(image.mode, 8)
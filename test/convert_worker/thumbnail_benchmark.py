@@ -0,0 +1,57 @@
+"""
+Compare the latency of thumbnail generation with and without reduced
+resolution decoding, over synthetic images of typical scan sizes.
+
+Run with: python -m test.convert_worker.thumbnail_benchmark
+"""
+import os
+import tempfile
+import timeit
+
+from PIL import Image as PilImage
+
+from workers.convert.image_scaling import scale_image
+
+SCAN_SIZES = {
+    'A4 400dpi': (3307, 4677),
+    'A3 400dpi': (4677, 6614),
+    'plan 600dpi': (14000, 10000)
+}
+THUMBNAIL_SIZE = (50, 50)
+REPEAT = 3
+
+
+def _full_decode_thumbnail(source, target_path):
+    image = PilImage.open(source).convert('RGB')
+    image.thumbnail(THUMBNAIL_SIZE)
+    image.save(os.path.join(target_path, os.path.basename(source)))
+    image.close()
+
+
+def _create_scan(path, size):
+    image = PilImage.effect_noise(size, 32).convert('RGB')
+    image.save(path)
+    image.close()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        target_path = os.path.join(tmp_dir, 'thumbnails')
+        os.makedirs(target_path)
+        print(f"{'image':<24}{'full decode':>14}{'reduced':>14}")
+        for name, size in SCAN_SIZES.items():
+            for extension in ['jpg', 'tif']:
+                source = os.path.join(tmp_dir, f"scan.{extension}")
+                _create_scan(source, size)
+                full = min(timeit.repeat(
+                    lambda: _full_decode_thumbnail(source, target_path),
+                    number=1, repeat=REPEAT))
+                reduced = min(timeit.repeat(
+                    lambda: scale_image(source, target_path, *THUMBNAIL_SIZE),
+                    number=1, repeat=REPEAT))
+                print(f"{name + ' ' + extension:<24}"
+                      f"{full * 1000:>12.0f}ms{reduced * 1000:>12.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
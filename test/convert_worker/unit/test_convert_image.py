@@ -1,7 +1,7 @@
 import unittest
 import os
 
-from workers.convert.image_scaling import scale_image
+from workers.convert.image_scaling import scale_image, open_reduced
 
 
 class ConvertImageTest(unittest.TestCase):
@@ -37,3 +37,10 @@ class ConvertImageTest(unittest.TestCase):
         self.assertTrue(os.path.isfile(
             f'{self.resource_dir}/test.tif'))
         os.remove(os.path.join(self.resource_dir, 'test.tif'))
+
+    def test_open_reduced_jpg(self):
+        """Test that JPEGs are decoded at a reduced size."""
+        image_file = os.path.join(self.resource_dir, 'files', 'test.jpg')
+        with open_reduced(image_file, (30, 40)) as image:
+            image.load()
+            self.assertEqual(image.size, (96, 132))
@@ -2,9 +2,11 @@ import os
 import logging
 
 from test.convert_worker.unit.convert_test import ConvertTest
-from workers.convert.convert_pdf import split_merge_pdf
+from workers.convert.convert_pdf import split_merge_pdf, extract_pdf_pages
 from utils.object import Object
 
+import PyPDF2
+
 log = logging.getLogger(__name__)
 
 
@@ -24,3 +26,14 @@ class CutPdfTest(ConvertTest):
 
         split_merge_pdf(params, obj.get_representation_dir('pdf'))
         self.assertTrue(os.path.isfile(file_generated))
+
+    def test_extract_pdf_pages(self):
+        """Test extracting a selection of pages into a new PDF."""
+        pdf_src = f'{self.resource_dir}/files/test.pdf'
+        file_generated = f'{self.working_dir}/data/article_pdf/article.pdf'
+
+        extract_pdf_pages(pdf_src, file_generated, [1, 2, 3, 5])
+        self.assertTrue(os.path.isfile(file_generated))
+
+        with open(file_generated, 'rb') as f:
+            self.assertEqual(PyPDF2.PdfFileReader(f).getNumPages(), 4)
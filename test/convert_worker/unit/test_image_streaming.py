@@ -0,0 +1,42 @@
+import os
+from unittest.mock import patch
+
+from PIL import Image as PilImage
+
+from test.convert_worker.unit.convert_test import ConvertTest
+from workers.convert.convert_image import convert_tif_to_jpg, tif_to_pdf
+from workers.convert.image_scaling import scale_image
+from workers.convert.image_streaming import exceeds_memory_limit
+
+
+@patch('workers.convert.image_streaming.IMAGE_MEMORY_LIMIT', 1024)
+class ImageStreamingTest(ConvertTest):
+    """Test processing images that exceed the memory limit."""
+
+    def setUp(self):
+        super().setUp()
+        self.tif_path = f'{self.resource_dir}/files/test.tif'
+        self.lzw_tif_path = f'{self.resource_dir}/files/some_tiffs/tif/test3.TIF'
+
+    def test_exceeds_memory_limit(self):
+        self.assertTrue(exceeds_memory_limit(self.tif_path))
+        self.assertFalse(exceeds_memory_limit(self.tif_path, 10 ** 9))
+
+    def test_tif_to_jpg(self):
+        jpg_path = os.path.join(self.working_dir, 'test.jpg')
+        convert_tif_to_jpg(self.tif_path, jpg_path)
+        with PilImage.open(jpg_path) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (365, 600))
+
+    def test_scale_image(self):
+        scale_image(self.tif_path, self.working_dir, 30, 40)
+        with PilImage.open(os.path.join(self.working_dir, 'test.tif')) as image:
+            self.assertLessEqual(image.size[0], 30)
+            self.assertLessEqual(image.size[1], 40)
+
+    def test_tif_to_pdf(self):
+        """LZW TIFFs can't be embedded as they are and are streamed."""
+        pdf_path = os.path.join(self.working_dir, 'test.pdf')
+        tif_to_pdf(self.lzw_tif_path, pdf_path)
+        self.assertGreater(os.stat(pdf_path).st_size, 0)
@@ -0,0 +1,48 @@
+import os
+
+import PyPDF2
+
+from test.convert_worker.unit.convert_test import ConvertTest
+from workers.convert.image_to_pdf import wrap_image_as_pdf, \
+    UnsupportedImageError
+
+
+class ImageToPdfTest(ConvertTest):
+    """Test embedding image data into PDFs without decoding it."""
+
+    def setUp(self):
+        super().setUp()
+        self.jpg_path = f'{self.resource_dir}/files/test.jpg'
+        self.tif_path = f'{self.resource_dir}/files/test.tif'
+        self.lzw_tif_path = f'{self.resource_dir}/files/some_tiffs/tif/test3.TIF'
+        self.pdf_path = f'{self.working_dir}/test.pdf'
+
+    def test_wrap_jpg(self):
+        """The JPEG data is copied into the PDF unchanged."""
+        wrap_image_as_pdf(self.jpg_path, self.pdf_path)
+
+        with open(self.jpg_path, 'rb') as jpg_file:
+            jpg_data = jpg_file.read()
+        with open(self.pdf_path, 'rb') as pdf_file:
+            self.assertIn(jpg_data, pdf_file.read())
+
+        with open(self.pdf_path, 'rb') as pdf_file:
+            pdf = PyPDF2.PdfFileReader(pdf_file)
+            self.assertEqual(pdf.getNumPages(), 1)
+
+    def test_wrap_tif(self):
+        wrap_image_as_pdf(self.tif_path, self.pdf_path)
+
+        with open(self.pdf_path, 'rb') as pdf_file:
+            pdf = PyPDF2.PdfFileReader(pdf_file)
+            self.assertEqual(pdf.getNumPages(), 1)
+            page = pdf.getPage(0)
+            image = page['/Resources']['/XObject']['/Im0']
+            self.assertEqual(image['/Filter'], '/FlateDecode')
+            self.assertEqual(image['/Width'], 365)
+            self.assertEqual(image['/Height'], 600)
+
+    def test_unsupported_compression(self):
+        self.assertRaises(UnsupportedImageError, wrap_image_as_pdf,
+                          self.lzw_tif_path, self.pdf_path)
+        self.assertFalse(os.path.exists(self.pdf_path))
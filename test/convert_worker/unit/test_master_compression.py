@@ -0,0 +1,33 @@
+import shutil
+
+from PIL import Image as PilImage
+
+from test.convert_worker.unit.convert_test import ConvertTest
+from workers.convert.master_compression import compress_master
+
+
+class MasterCompressionTest(ConvertTest):
+    """Test lossless compression of master TIFFs."""
+
+    def setUp(self):
+        super().setUp()
+        self.tif_path = f'{self.working_dir}/test.tif'
+        shutil.copy(f'{self.resource_dir}/files/test.tif', self.tif_path)
+
+    def test_compress(self):
+        with PilImage.open(self.tif_path) as image:
+            original = image.tobytes()
+
+        result = compress_master(self.tif_path)
+
+        self.assertGreater(result['ratio'], 1)
+        self.assertLess(result['after'], result['before'])
+        with PilImage.open(self.tif_path) as image:
+            self.assertEqual(image.info['compression'], 'tiff_adobe_deflate')
+            self.assertEqual(image.tobytes(), original)
+
+    def test_skip_compressed(self):
+        lzw_path = f'{self.working_dir}/test3.TIF'
+        shutil.copy(f'{self.resource_dir}/files/some_tiffs/tif/test3.TIF',
+                    lzw_path)
+        self.assertIsNone(compress_master(lzw_path))
@@ -0,0 +1,42 @@
+import os
+
+from PIL import Image as PilImage, ImageDraw
+
+from test.convert_worker.unit.convert_test import ConvertTest
+from workers.convert.page_analysis import analyze_page, PAGE_BLANK, \
+    PAGE_BITONAL, PAGE_GRAY, PAGE_COLOR
+
+
+class PageAnalysisTest(ConvertTest):
+    """Test the classification of scanned pages."""
+
+    def setUp(self):
+        super().setUp()
+        self.tif_path = f'{self.resource_dir}/files/test.tif'
+        self.page_path = os.path.join(self.working_dir, 'page.tif')
+
+    def test_color(self):
+        self.assertEqual(analyze_page(self.tif_path)['class'], PAGE_COLOR)
+
+    def test_gray(self):
+        with PilImage.open(self.tif_path) as image:
+            image.convert('L').save(self.page_path)
+        self.assertEqual(analyze_page(self.page_path)['class'], PAGE_GRAY)
+
+    def test_blank(self):
+        PilImage.new('RGB', (1240, 1754), (238, 232, 210)).save(self.page_path)
+        result = analyze_page(self.page_path)
+        self.assertEqual(result['class'], PAGE_BLANK)
+        self.assertEqual(result['ink_coverage'], 0)
+
+    def test_bitonal(self):
+        image = PilImage.new('L', (1240, 1754), 235)
+        draw = ImageDraw.Draw(image)
+        for y in range(150, 1600, 30):
+            draw.text((120, y), 'Lorem ipsum dolor sit amet ' * 4, fill=20)
+        image.save(self.page_path)
+
+        result = analyze_page(self.page_path)
+        self.assertEqual(result['class'], PAGE_BITONAL)
+        self.assertGreater(result['ink_coverage'], 0)
+        self.assertAlmostEqual(sum(result['histogram']), 1, places=2)
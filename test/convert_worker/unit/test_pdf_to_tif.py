@@ -3,6 +3,8 @@ import shutil
 
 from pathlib import Path
 
+from PIL import Image as PilImage
+
 from test.convert_worker.unit.convert_test import ConvertTest
 from workers.convert.convert_pdf import convert_pdf_to_tif
 
@@ -22,3 +24,12 @@ class PdfToTifTest(ConvertTest):
         self.assertTrue(Path(tif_0_path).is_file())
         stat = os.stat(tif_0_path)
         self.assertGreater(stat.st_size, 0)
+
+    def test_resolution_and_compression(self):
+        convert_pdf_to_tif(self.pdf_path, self.working_dir, resolution=100,
+                           compression='lzw')
+        name = os.path.splitext(os.path.basename(self.pdf_path))[0]
+        tif_0_path = os.path.join(self.working_dir, f'{name}_0000.tif')
+        with PilImage.open(tif_0_path) as image:
+            self.assertEqual(image.info['compression'], 'tiff_lzw')
+            self.assertEqual(round(image.info['dpi'][0]), 100)
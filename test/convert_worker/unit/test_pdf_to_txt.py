@@ -1,7 +1,9 @@
+import json
 import os
 
 from test.convert_worker.unit.convert_test import ConvertTest
-from workers.convert.convert_pdf import convert_pdf_to_txt
+from workers.convert.convert_pdf import convert_pdf_to_txt, tag_pdf_pages, \
+    PAGE_TAG_SCAN
 
 
 class PdfToTxtTest(ConvertTest):
@@ -22,3 +24,34 @@ class PdfToTxtTest(ConvertTest):
 
         with open(os.path.join(self.txt_dir, f'{name}_0000.txt')) as f:
             self.assertIn("TECHNISCHE UNIVERSITÄT CAROLO-WILHELMINA", f.read())
+
+    def test_consolidate(self):
+        convert_pdf_to_txt(self.pdf_path, self.txt_dir, consolidate=True)
+        name = os.path.splitext(os.path.basename(self.pdf_path))[0]
+        self.assertEqual(sorted(os.listdir(self.txt_dir)),
+                         [f'{name}.pages.json', f'{name}.txt'])
+
+        with open(os.path.join(self.txt_dir, f'{name}.pages.json')) as f:
+            page_offsets = json.load(f)['pages']
+        with open(os.path.join(self.txt_dir, f'{name}.txt'), newline='') as f:
+            text = f.read()
+
+        self.assertEqual(len(page_offsets), self.pdf_pages)
+        self.assertEqual(page_offsets[-1][1], len(text))
+        start, end = page_offsets[0]
+        self.assertIn("TECHNISCHE UNIVERSITÄT CAROLO-WILHELMINA",
+                      text[start:end])
+
+    def test_skip_ocr_for_text_layer(self):
+        """Pages of a born-digital PDF are not OCR'd."""
+        result = convert_pdf_to_txt(self.pdf_path, self.txt_dir, 'deu')
+        self.assertEqual(result['ocr_pages'], 0)
+        self.assertEqual(result['ocr_skipped_pages'], self.pdf_pages)
+        self.assertNotIn(PAGE_TAG_SCAN, result['page_tags'])
+
+    def test_tag_scanned_pages(self):
+        scanned_pdf_path = os.path.join(
+            self.resource_dir, 'objects', 'a_archival_description_0001',
+            'data', 'pdf', 'a_archival_description_0001.pdf')
+        tags = tag_pdf_pages(scanned_pdf_path)
+        self.assertEqual(tags, [PAGE_TAG_SCAN] * 4)
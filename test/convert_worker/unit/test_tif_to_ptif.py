@@ -1,12 +1,14 @@
 import os
 from pathlib import Path
 
+from PIL import Image as PilImage
+
 from test.convert_worker.unit.convert_test import ConvertTest
 from workers.convert.convert_image import convert_tif_to_ptif
 
 
 class TifToPTifTest(ConvertTest):
-    """Test conversion of TIFF to PTIFF using imagemagick shell command."""
+    """Test conversion of TIFF to PTIFF using libvips."""
 
     def setUp(self):
         """Test preparation by setting up needed paths."""
@@ -21,6 +23,15 @@ class TifToPTifTest(ConvertTest):
         stat = os.stat(self.ptif_path)
         self.assertGreater(stat.st_size, 0)
 
+    def test_pyramid(self):
+        result = convert_tif_to_ptif(self.tif_path,
+                                     os.path.dirname(self.ptif_path))
+        # 365x600 pixels: 6 + 2 + 1 tiles of 256x256
+        self.assertEqual(result['levels'], 3)
+        self.assertEqual(result['tiles'], 9)
+        with PilImage.open(self.ptif_path) as image:
+            self.assertEqual(image.n_frames, result['levels'])
+
     def test_error(self):
         """Test error case with faulty source TIFF."""
         self.assertRaises(OSError, convert_tif_to_ptif, self.broken_tif_path,
@@ -1,9 +1,17 @@
 import unittest
 import os
 import logging
+import base64
+import re
+import shutil
+import tempfile
+from unittest import mock
 
-from workers.default.xml.xml_generator import generate_xml
+from workers.default.xml.xml_generator import generate_xml, base64_file, \
+    LazyContext, get_environment, preload_templates
 from utils.object import Object
+from utils.publishing import publish_tree
+from utils.repository import generate_repository_path, get_repository_sources
 
 log = logging.getLogger(__name__)
 
@@ -42,3 +50,94 @@ class GenerateXMLTest(unittest.TestCase):
         self.assertTrue(os.path.isfile(
             f'{self.resource_dir}/objects/a_journal_0003/test_ojsxml.xml'))
         os.remove(f'{self.resource_dir}/objects/a_journal_0003/test_ojsxml.xml')
+
+    def test_base64_file_streams_chunks(self):
+        """Encoded chunks concatenate to the base64 of the whole file."""
+        file_path = f'{self.resource_dir}/files/test.pdf'
+        with open(file_path, 'rb') as file:
+            expected = base64.b64encode(file.read()).decode('ascii')
+
+        chunks = list(base64_file(file_path, chunk_size=1000))
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), expected)
+
+    def test_lazy_context_loads_on_access(self):
+        """Values are computed once and only when they are looked up."""
+        calls = []
+        context = LazyContext({
+            'jpegs': lambda: calls.append('jpegs') or ['a.jpg'],
+            'pdfs': lambda: calls.append('pdfs') or []
+        })
+
+        self.assertEqual(context['jpegs'], ['a.jpg'])
+        self.assertEqual(context['jpegs'], ['a.jpg'])
+        self.assertEqual(calls, ['jpegs'])
+        self.assertEqual(list(context), ['jpegs'])
+        self.assertEqual(context['pdfs'], [])
+        self.assertEqual(calls, ['jpegs', 'pdfs'])
+
+    def test_preload_templates(self):
+        """All templates compile and are served from the cache afterwards."""
+        names = preload_templates()
+
+        self.assertIn('ojs3_template_issue.xml', names)
+        env = get_environment()
+        self.assertIs(env.get_template('ojs3_template_issue.xml'),
+                      env.get_template('ojs3_template_issue.xml'))
+
+    @mock.patch.dict(os.environ, {'REPOSITORY_URI': 'http://repository'})
+    def test_generate_omp_xml_by_reference(self):
+        """Galleys are referenced by repository URL instead of embedded."""
+        obj = Object(f'{self.resource_dir}/objects/a_omp_book_0002')
+        target_file_path = os.path.join(obj.path, 'test_omp.xml')
+
+        try:
+            generate_xml(obj, 'omp_template.xml', target_file_path,
+                         {'galleys_by_reference': True})
+            with open(target_file_path) as file:
+                xml = file.read()
+        finally:
+            os.remove(target_file_path)
+
+        self.assertIn('<href src="http://repository/file/a_opm_book/data/pdf/'
+                      'a_opm_book.pdf" mime_type="application/pdf"/>', xml)
+        self.assertNotIn('<embed', xml)
+
+    @mock.patch.dict(os.environ, {'REPOSITORY_URI': 'http://repository'})
+    def test_generate_ojs_xml_by_reference_published_files(self):
+        """Every galley referenced in OJS XML is published to the repository."""
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            obj = Object(os.path.join(tmp_dir, 'work'))
+            obj.id = 'JOURNAL-ZID001108201_1234'
+            obj.metadata = {'title': '2.1931/32', 'articles': [
+                {'zenon_id': '001364448', 'title': 'An article',
+                 'abstracts': [], 'authors': []}]}
+            obj.write()
+            for representation in ('issue_pdf', 'article-0_pdf'):
+                obj.add_file(representation,
+                             f'{self.resource_dir}/files/test.pdf')
+
+            target_file_path = os.path.join(obj.path, 'ojs_import.xml')
+            generate_xml(obj, 'ojs3_template_issue.xml', target_file_path, {
+                'galleys_by_reference': True,
+                'input_file_directories': {
+                    'pdfs': ['issue_pdf', 'article-0_pdf']}})
+            with open(target_file_path) as file:
+                hrefs = re.findall(r'<href src="([^"]+)"', file.read())
+
+            repository_dir = os.path.join(tmp_dir, 'repository')
+            publish_tree(get_repository_sources(obj.path),
+                         os.path.join(repository_dir,
+                                      generate_repository_path(obj.id)))
+
+            self.assertEqual(len(hrefs), 2)
+            prefix = f'http://repository/file/{obj.id}/'
+            for href in hrefs:
+                self.assertTrue(href.startswith(prefix))
+                self.assertTrue(os.path.isfile(os.path.join(
+                    repository_dir, generate_repository_path(obj.id),
+                    href[len(prefix):])), href)
+        finally:
+            shutil.rmtree(tmp_dir)
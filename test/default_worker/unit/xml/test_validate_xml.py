@@ -1,8 +1,12 @@
+import base64
+import io
+import os
 import unittest
 
 from lxml import etree
 
-from workers.default.xml.xml_validator import validate_xml
+from workers.default.xml.xml_validator import validate_xml, get_schema, \
+    _EmbedFilter
 
 
 class ValidateXMLTest(unittest.TestCase):
@@ -48,3 +52,49 @@ class ValidateXMLTest(unittest.TestCase):
         xml_schema_file = self.marc_schema_file
         self.assertRaises(etree.DocumentInvalid, validate_xml, xml_file,
                           schema_file_path=xml_schema_file)
+
+    def test_schema_is_cached_until_changed(self):
+        """The compiled schema is reused until the file's mtime changes."""
+        schema = get_schema(self.marc_schema_file)
+        self.assertIs(get_schema(self.marc_schema_file), schema)
+
+        stat = os.stat(self.marc_schema_file)
+        os.utime(self.marc_schema_file,
+                 ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        try:
+            self.assertIsNot(get_schema(self.marc_schema_file), schema)
+        finally:
+            os.utime(self.marc_schema_file,
+                     ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    def test_validate_xml_streaming(self):
+        """Validate in streaming mode against DTD and schema."""
+        validate_xml(self.ojs_xml_file, dtd_file_path=self.dtd_file,
+                     streaming=True)
+        validate_xml(self.marc_xml_file,
+                     schema_file_path=self.marc_schema_file, streaming=True)
+
+    def test_streaming_validation_failed(self):
+        """Syntax and schema errors are raised in streaming mode as well."""
+        self.assertRaises(etree.XMLSyntaxError, validate_xml,
+                          self.ojs_xml_file_faulty, streaming=True)
+        self.assertRaises(etree.DocumentInvalid, validate_xml,
+                          self.marc_xml_file_faulty,
+                          schema_file_path=self.marc_schema_file,
+                          streaming=True)
+
+    def test_embed_filter(self):
+        """Embedded content is dropped and checked for base64."""
+        payload = base64.b64encode(bytes(range(256)) * 100)
+        xml = b'<a><embed encoding="base64">\n' + payload \
+            + b'\n</embed><embed/><embedded>x</embedded>' \
+            b'<embed>not base64!</embed></a>'
+        source = _EmbedFilter(io.BytesIO(xml), chunk_size=7)
+
+        filtered = b''.join(iter(lambda: source.read(16), b''))
+
+        self.assertEqual(filtered, b'<a><embed encoding="base64">AAAA</embed>'
+                                   b'<embed/><embedded>x</embedded>'
+                                   b'<embed>AAAA</embed></a>')
+        self.assertEqual(source.payloads, 2)
+        self.assertEqual(source.invalid_payloads, 1)
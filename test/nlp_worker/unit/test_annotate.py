@@ -6,7 +6,7 @@ import cassis
 
 from test.nlp_worker.unit.text_analyzer_mock import TextAnalyzer as MockAnalyzer, MockDAIEntity
 from workers.nlp.annotate.nlp_components_wrapper import annotate_text, annotate_xmi
-from workers.nlp.annotate.page_annotation import annotate_pages
+from workers.nlp.annotate.page_annotation import annotate_pages, annotate_page_offsets
 from workers.nlp.formats.xmi import Annotation
 
 _example_xmi_with_pages = """<?xml version='1.0' encoding='ASCII'?>
@@ -53,6 +53,13 @@ class PageAnnotationTest(unittest.TestCase, AssertsXmiCanBeLoadedWithDaiTypesyst
         page_numbers = [int(a.number) for a in annotations]
         self.assertEqual(set(page_numbers), {1, 2, 3, 4})
 
+    def test_annotate_page_offsets(self):
+        pages = ['A\nB\nC\n', 'Äöß', 'バートアスキー\n', 'Letzte Seite']
+        page_offsets = [[0, 6], [6, 9], [9, 17], [17, 29]]
+        result = annotate_page_offsets(''.join(pages), page_offsets)
+
+        self.assertEqual(result, annotate_pages(pages))
+
 
 @patch('workers.nlp.annotate.nlp_components_wrapper._init_text_analyzer')
 class NlpComponentsAnnotationTest(unittest.TestCase, AssertsXmiCanBeLoadedWithDaiTypesystem):
@@ -0,0 +1,81 @@
+import threading
+import time
+import unittest
+
+from service.atom.record_cache import RecordCache
+
+
+class _Response:
+
+    def __init__(self, status_code, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+
+class RecordCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.requests = []
+
+    def _fetch(self, record_id, headers):
+        self.requests.append((record_id, headers))
+        if headers.get('If-None-Match') == '"1"':
+            return _Response(304)
+        return _Response(200, f'record {record_id}', {'ETag': '"1"'})
+
+    def test_fresh_records_are_cached(self):
+        cache = RecordCache(self._fetch, ttl=60)
+
+        self.assertEqual(cache.get('a'), 'record a')
+        self.assertEqual(cache.get('a'), 'record a')
+
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['hit_rate'], 0.5)
+
+    def test_stale_records_are_revalidated(self):
+        cache = RecordCache(self._fetch, ttl=0)
+
+        cache.get('a')
+        self.assertEqual(cache.get('a'), 'record a')
+
+        self.assertEqual(self.requests[1], ('a', {'If-None-Match': '"1"'}))
+        self.assertEqual(cache.stats()['revalidated'], 1)
+
+    def test_least_recently_used_records_are_evicted(self):
+        cache = RecordCache(self._fetch, max_entries=2, ttl=60)
+
+        for record_id in ('a', 'b', 'a', 'c', 'a', 'b'):
+            cache.get(record_id)
+
+        self.assertEqual([request[0] for request in self.requests],
+                         ['a', 'b', 'c', 'b'])
+
+    def test_errors_are_not_cached(self):
+        cache = RecordCache(lambda *_: _Response(404, 'not found'), ttl=60)
+
+        self.assertEqual(cache.get('a'), 'not found')
+        self.assertEqual(cache.stats()['records'], 0)
+
+    def test_concurrent_lookups_are_coalesced(self):
+        release = threading.Event()
+
+        def slow_fetch(record_id, headers):
+            release.wait()
+            return self._fetch(record_id, headers)
+
+        cache = RecordCache(slow_fetch, ttl=60)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            cache.get('a'))) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ['record a'] * 3)
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(cache.stats()['coalesced'], 2)
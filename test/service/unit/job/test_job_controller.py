@@ -8,6 +8,7 @@ import time
 from pymongo import MongoClient
 
 from service.run_service import app
+from utils.repository import generate_repository_path
 from test.service.unit.user.user_utils import get_auth_header, test_user
 
 
@@ -16,6 +17,7 @@ class JobControllerTest(unittest.TestCase):
 
     test_resource_dir = 'test/resources'
     staging_dir = os.environ['STAGING_DIR']
+    archive_dir = os.environ['ARCHIVE_DIR']
 
     def setUp(self):
         """Prepare test setup."""
@@ -105,6 +107,65 @@ class JobControllerTest(unittest.TestCase):
         self._make_request('/job/ingest_journals', json.dumps(job_params), 400,
                            'invalid_job_params', 'is not of type')
 
+    def test_preflight(self):
+        """Preflight reports the staged scans without creating a job."""
+        job_params = self._read_test_params('monograph.json')
+        response = self._make_request('/job/ingest_monographs/preflight',
+                                      json.dumps(job_params), 200)
+        response_json = response.get_json()
+
+        self.assertTrue(response_json['valid'])
+        self.assertEqual(response_json['estimate']['pages'], 4)
+        self.assertGreater(response_json['estimate']['ocr_seconds'], 0)
+        self.assertIn('72 dpi', response_json['warnings'][0]['message'])
+
+    def test_preflight_missing_directory(self):
+        job_params = self._read_test_params('monograph.json')
+        job_params['targets'][0]['path'] = 'does_not_exist'
+        response = self._make_request('/job/ingest_monographs/preflight',
+                                      json.dumps(job_params), 200)
+        response_json = response.get_json()
+
+        self.assertFalse(response_json['valid'])
+        self.assertEqual(response_json['errors'][0]['message'],
+                         'directory not found')
+
+    def test_preflight_republish_metadata(self):
+        """Targets of republish jobs are looked up in the archive."""
+        job_params = self._read_test_params('republish_metadata.json')
+        object_path = os.path.join(self.archive_dir, generate_repository_path(
+            job_params['targets'][0]['id']))
+        os.makedirs(object_path)
+        try:
+            with open(os.path.join(object_path, 'meta.json'), 'w') as file:
+                file.write('{}')
+
+            response = self._make_request('/job/republish_metadata/preflight',
+                                          json.dumps(job_params), 200)
+        finally:
+            shutil.rmtree(object_path)
+        response_json = response.get_json()
+
+        self.assertFalse(response_json['valid'])
+        self.assertEqual(response_json['targets'][0]['files'], 1)
+        self.assertEqual(
+            [error['target'] for error in response_json['errors']],
+            [target['id'] for target in job_params['targets'][1:]])
+        self.assertEqual(response_json['errors'][0]['message'],
+                         'object not found in archive')
+
+    def test_republish_metadata_invalid_id(self):
+        """Object ids must not contain path separators."""
+        job_params = self._read_test_params('republish_metadata.json')
+        job_params['targets'][0]['id'] = '../../../../tmp/x1234'
+        self._make_request('/job/republish_metadata', json.dumps(job_params),
+                           400, 'invalid_job_params', 'does not match')
+
+    def test_preflight_unknown_job_type(self):
+        job_params = self._read_test_params('monograph.json')
+        self._make_request('/job/ingest_nothing/preflight',
+                           json.dumps(job_params), 404, 'unknown_job_type')
+
     def _make_request(self, job_name, payload, expected_http_code,
                       expected_error_code='', expected_error_message=''):
         response = self.client.post(job_name, data=payload,
@@ -123,9 +184,9 @@ class JobControllerTest(unittest.TestCase):
 
         return response
 
-    def _read_test_params(self):
+    def _read_test_params(self, file_name='journal.json'):
         test_params_path = os.path.join(self.test_resource_dir, 'params',
-                                        'journal.json')
+                                        file_name)
 
         with open(test_params_path, 'r') as params_file:
             job_params = json.loads(params_file.read())
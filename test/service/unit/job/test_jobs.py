@@ -2,8 +2,10 @@ import unittest
 import os
 import json
 import logging
+from unittest import mock
 
-from service.job.jobs import IngestJournalsJob, IngestArchivalMaterialsJob, IngestMonographsJob
+from service.job.jobs import IngestJournalsJob, IngestArchivalMaterialsJob, IngestMonographsJob, \
+    RepublishMetadataJob
 
 
 class JobsTest(unittest.TestCase):
@@ -32,8 +34,8 @@ class JobsTest(unittest.TestCase):
             job.chain_ids), 2, 'two chains should be generated, one for each "targets" item')
 
         chain_length = len(job.chord.tasks[0].tasks)
-        self.assertEqual(chain_length, 13,
-                         'each default archival material import chain should consist of 14 subtasks.')
+        self.assertEqual(chain_length, 15,
+                         'each default archival material import chain should consist of 15 subtasks.')
 
     def test_import_journals_job(self):
         """Test initialization for journal batch import."""
@@ -61,20 +63,20 @@ class JobsTest(unittest.TestCase):
 
         self.assertEqual(
             len(job.chord.tasks[0].tasks),
-            50,
-            'first target import chain should consist of 50 subtasks, because it includes 10 articles.'
+            63,
+            'first target import chain should consist of 63 subtasks, because the 10 articles without issue pages get optional conversion links.'
         )
 
         self.assertEqual(
             len(job.chord.tasks[1].tasks),
-            10,
-            'second target import chain should consist of 10 subtasks, because it does not include articles.'
+            12,
+            'second target import chain should consist of 12 subtasks, because it does not include articles.'
         )
 
         self.assertEqual(
             len(job.chord.tasks[1].tasks),
-            10,
-            'third target import chain should consist of 10 subtasks, because it does not include articles.'
+            12,
+            'third target import chain should consist of 12 subtasks, because it does not include articles.'
         )
 
     def test_import_monographs_job(self):
@@ -99,6 +101,76 @@ class JobsTest(unittest.TestCase):
 
         chain_length = len(job.chord.tasks[0].tasks)
 
-        self.assertEqual(chain_length, 12,
-                         'each default monograph import chain should consist of 13 subtasks.')
+        self.assertEqual(chain_length, 14,
+                         'each default monograph import chain should consist of 14 subtasks.')
 
+
+    def test_import_journals_job_articles_with_issue_pages(self):
+        """Articles with issue pages are only derived from the issue."""
+        test_params_path = os.path.join(
+            self.test_resource_dir, 'params/journal.json')
+
+        with open(test_params_path, 'r') as params_file:
+            job_params = json.loads(params_file.read())
+
+        for article in job_params['targets'][0]['metadata']['articles']:
+            article['issue_pages'] = [1, 2]
+        job = IngestJournalsJob(job_params, 'test_user')
+
+        tasks = [task['task'] for task in job.chord.tasks[0].tasks]
+        self.assertEqual(len(tasks), 13)
+        self.assertEqual(tasks.count('convert.analyze_pages'), 1)
+        self.assertIn('convert.derive_articles', tasks)
+
+    @mock.patch('service.job.jobs.GALLEYS_BY_REFERENCE', True)
+    def test_import_journals_job_galleys_by_reference(self):
+        """The issue is published to the repository before OJS fetches it."""
+        test_params_path = os.path.join(
+            self.test_resource_dir, 'params/journal.json')
+
+        with open(test_params_path, 'r') as params_file:
+            job_params = json.loads(params_file.read())
+
+        job = IngestJournalsJob(job_params, 'test_user')
+
+        tasks = [task['task'] for task in job.chord.tasks[0].tasks]
+        self.assertEqual(len(tasks), 64)
+        self.assertLess(tasks.index('publish_to_repository'),
+                        tasks.index('publish_to_ojs'))
+
+    def test_republish_metadata_job(self):
+        """Only the metadata and publishing steps are run for archived objects."""
+        test_params_path = os.path.join(
+            self.test_resource_dir, 'params/republish_metadata.json')
+
+        with open(test_params_path, 'r') as params_file:
+            job_params = json.loads(params_file.read())
+
+        job = RepublishMetadataJob(job_params, 'test_user')
+
+        self.assertEqual(len(job.chain_ids), 3)
+        self.assertIn('new issue or submission', job.description)
+
+        archival_material, journal, monograph = [
+            [task['task'] for task in current_chain.tasks]
+            for current_chain in job.chord.tasks]
+
+        # the AtoM digital object is not created again
+        self.assertEqual(archival_material, [
+            'load_archived_object', 'convert.set_pdf_metadata',
+            'generate_xml', 'publish_to_repository', 'publish_to_archive',
+            'cleanup_directories', 'finish_chain'])
+        # OJS and OMP get a new import after the archive is updated
+        self.assertEqual(journal, [
+            'load_archived_object', 'generate_xml', 'publish_to_archive',
+            'publish_to_ojs', 'cleanup_directories', 'finish_chain'])
+        self.assertEqual(monograph, [
+            'load_archived_object', 'generate_xml', 'generate_xml',
+            'publish_to_repository', 'publish_to_archive', 'publish_to_omp',
+            'cleanup_directories', 'finish_chain'])
+
+        load = job.chord.tasks[0].tasks[0]
+        self.assertEqual(load.kwargs['writable_representations'], ['pdf'])
+        self.assertEqual(
+            job.chord.tasks[1].tasks[1].kwargs['input_file_directories'],
+            {'pdfs': ['issue_pdf', 'article-0_pdf', 'article-1_pdf']})
@@ -0,0 +1,83 @@
+import unittest
+import os
+import shutil
+import struct
+
+from PIL import Image
+
+from service.job import preflight
+from service.job.preflight import Preflight
+
+
+class PreflightTest(unittest.TestCase):
+    """Test the checks of the image headers."""
+
+    user_name = 'preflight_test_user'
+    path = 'preflight_images'
+
+    def setUp(self):
+        self.target_dir = os.path.join(preflight.staging_dir, self.user_name,
+                                       self.path)
+        os.makedirs(self.target_dir)
+
+    def tearDown(self):
+        shutil.rmtree(os.path.join(preflight.staging_dir, self.user_name))
+
+    def test_8_bit_images(self):
+        """Ordinary 8 bit images pass without errors or warnings."""
+        for mode in ('1', 'L', 'RGB', 'RGBA', 'CMYK'):
+            with self.subTest(mode=mode):
+                result = self._check_image(Image.new(mode, (10, 10)))
+
+                self.assertTrue(result['valid'])
+                self.assertEqual(result['warnings'], [])
+                self.assertEqual(result['estimate']['pages'], 1)
+
+    def test_16_bit_rgb_image(self):
+        """Images with more than 8 bit per channel are reported."""
+        result = self._check_file(_write_rgb16_tiff)
+
+        self.assertTrue(result['valid'])
+        self.assertIn('16 bit per channel', result['warnings'][0]['message'])
+
+    def test_unsupported_modes(self):
+        """Images the converters cannot handle are errors."""
+        for mode in ('P', 'LA', 'I;16'):
+            with self.subTest(mode=mode):
+                result = self._check_image(Image.new(mode, (10, 10)))
+
+                self.assertFalse(result['valid'])
+                self.assertEqual(result['errors'][0]['message'],
+                                 f'unsupported image mode {mode}')
+
+    def _check_image(self, image):
+        return self._check_file(image.save)
+
+    def _check_file(self, write):
+        for name in os.listdir(self.target_dir):
+            os.remove(os.path.join(self.target_dir, name))
+        write(os.path.join(self.target_dir, 'page.tif'))
+
+        params = {'targets': [{'id': 'BOOK-ZID001', 'path': self.path,
+                               'metadata': {}}],
+                  'options': {'ocr_options': {'do_ocr': False}}}
+        return Preflight('ingest_monographs', params, self.user_name).run()
+
+
+def _write_rgb16_tiff(path, width=2, height=2):
+    """Write an uncompressed 16 bit RGB TIFF, which Pillow cannot save."""
+    data = bytes(width * height * 6)
+    # header, entry count, 9 entries and the next IFD offset
+    bits_offset = 8 + 2 + 9 * 12 + 4
+    entries = [(256, 3, 1, width), (257, 3, 1, height),
+               (258, 3, 3, bits_offset), (259, 3, 1, 1), (262, 3, 1, 2),
+               (273, 4, 1, bits_offset + 6), (277, 3, 1, 3),
+               (278, 3, 1, height), (279, 4, 1, len(data))]
+    with open(path, 'wb') as file:
+        file.write(b'II' + struct.pack('<HI', 42, 8))
+        file.write(struct.pack('<H', len(entries)))
+        for tag, field_type, count, value in entries:
+            file.write(struct.pack('<HHII', tag, field_type, count, value))
+        file.write(struct.pack('<I', 0))
+        file.write(struct.pack('<HHH', 16, 16, 16))
+        file.write(data)
@@ -0,0 +1,99 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import requests
+
+from utils.adaptive_limiter import AdaptiveLimiter
+
+
+class AdaptiveLimiterTest(unittest.TestCase):
+
+    def test_limit_grows_on_success(self):
+        limiter = AdaptiveLimiter('test', initial=1, maximum=4)
+
+        for _ in range(10):
+            with limiter.slot():
+                pass
+
+        self.assertEqual(limiter.stats()['limit'], 4)
+        self.assertEqual(limiter.stats()['calls'], 10)
+
+    def test_limit_is_halved_on_overload(self):
+        for err in (requests.ConnectionError(), requests.Timeout(),
+                    _http_error(503)):
+            with self.subTest(err=err):
+                limiter = AdaptiveLimiter('test', initial=4, maximum=4)
+
+                with self.assertRaises(type(err)):
+                    with limiter.slot():
+                        raise err
+
+                self.assertEqual(limiter.stats()['limit'], 2)
+                self.assertEqual(limiter.stats()['errors'], 1)
+
+    def test_limit_is_kept_on_other_errors(self):
+        for err in (_http_error(400), _http_error(404), RuntimeError()):
+            with self.subTest(err=err):
+                limiter = AdaptiveLimiter('test', initial=4, maximum=4)
+
+                with self.assertRaises(type(err)):
+                    with limiter.slot():
+                        raise err
+
+                self.assertEqual(limiter.stats()['limit'], 4)
+                self.assertEqual(limiter.stats()['errors'], 1)
+
+    def test_limit_does_not_drift_with_varying_latency(self):
+        """Mostly slow calls, e.g. of large payloads, are no overload."""
+        limiter = AdaptiveLimiter('test', initial=4, maximum=8)
+
+        _call_with_latencies(limiter, [0.1, 1.0, 1.0] * 30)
+
+        self.assertEqual(limiter.stats()['limit'], 8)
+
+    def test_limit_decreases_on_latency_spike(self):
+        limiter = AdaptiveLimiter('test', initial=8, maximum=8)
+
+        _call_with_latencies(limiter, [0.1] * 10 + [1.0] * 10)
+
+        self.assertLess(limiter.stats()['limit'], 8)
+
+    def test_concurrency_is_limited(self):
+        limiter = AdaptiveLimiter('test', initial=2, maximum=2)
+        max_in_flight = []
+        release = threading.Event()
+
+        def call():
+            with limiter.slot():
+                max_in_flight.append(limiter.stats()['in_flight'])
+                release.wait()
+
+        threads = [threading.Thread(target=call) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        stats = limiter.stats()
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(stats['in_flight'], 2)
+        self.assertEqual(stats['queued'], 3)
+        self.assertLessEqual(max(max_in_flight), 2)
+        self.assertEqual(limiter.stats()['in_flight'], 0)
+
+
+def _http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.HTTPError(response=response)
+
+
+def _call_with_latencies(limiter, latencies):
+    clock = [0.0]
+    with patch('utils.adaptive_limiter.time.monotonic', lambda: clock[0]):
+        for seconds in latencies:
+            with limiter.slot():
+                clock[0] += seconds
@@ -0,0 +1,72 @@
+import os
+import shutil
+import unittest
+
+from utils.blob_store import BlobStore, migrate_archive
+from utils.fixity import file_checksum
+from utils.publishing import publish_tree
+
+working_dir = os.environ['WORKING_DIR']
+resource_dir = os.environ['TEST_RESOURCE_DIR']
+test_file_path = os.path.join(resource_dir, 'files', 'test.jpg')
+archive_path = os.path.join(working_dir, 'blob_archive')
+
+
+class BlobStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        os.makedirs(archive_path)
+        self.store = BlobStore(os.path.join(archive_path, '.blobs'))
+
+    def tearDown(self):
+        shutil.rmtree(archive_path, ignore_errors=True)
+
+    def test_import_file_stores_content_once(self):
+        first = os.path.join(archive_path, 'first.jpg')
+        second = os.path.join(archive_path, 'second.jpg')
+
+        checksum, written = self.store.import_file(test_file_path, first)
+        self.assertEqual(written, os.path.getsize(test_file_path))
+        self.assertEqual(checksum, file_checksum(test_file_path))
+
+        _, written = self.store.import_file(test_file_path, second, checksum)
+        self.assertEqual(written, 0)
+        self.assertTrue(os.path.samefile(first, second))
+        self.assertEqual(self.store.stats()['ratio'], 2.0)
+
+    def test_collect_garbage(self):
+        target = os.path.join(archive_path, 'test.jpg')
+        self.store.import_file(test_file_path, target)
+        self.assertEqual(self.store.collect_garbage()['blobs'], 0)
+
+        os.remove(target)
+        self.assertEqual(self.store.collect_garbage()['blobs'], 1)
+        self.assertEqual(self.store.stats()['blobs'], 0)
+
+    def test_migrate_archive(self):
+        for object_id in ('a_0001', 'b_0001'):
+            path = os.path.join(archive_path, '0000', '0001', object_id)
+            os.makedirs(path)
+            shutil.copy(test_file_path, path)
+
+        result = migrate_archive(archive_path, self.store)
+
+        self.assertEqual(result['files'], 2)
+        self.assertEqual(result['deduplicated'], 1)
+        self.assertTrue(os.path.samefile(
+            os.path.join(archive_path, '0000', '0001', 'a_0001', 'test.jpg'),
+            os.path.join(archive_path, '0000', '0001', 'b_0001', 'test.jpg')))
+
+    def test_publish_with_blob_store(self):
+        sources = {'data/jpg/test.jpg': test_file_path}
+        first = os.path.join(archive_path, '0000', '0001', 'a_0001')
+        second = os.path.join(archive_path, '0000', '0001', 'b_0001')
+
+        publish_tree(sources, first, manifest=True, blob_store=self.store)
+        stats = publish_tree(sources, second, manifest=True,
+                             blob_store=self.store)
+
+        self.assertEqual(stats['bytes'], 0)
+        self.assertTrue(os.path.samefile(
+            os.path.join(first, 'data', 'jpg', 'test.jpg'),
+            os.path.join(second, 'data', 'jpg', 'test.jpg')))
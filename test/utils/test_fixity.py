@@ -0,0 +1,68 @@
+import hashlib
+import os
+import shutil
+import unittest
+
+from utils.fixity import copy_with_checksum, write_manifest, read_manifest, \
+    verify_manifest, audit_objects, MANIFEST_FILE, TAG_MANIFEST_FILE
+
+working_dir = os.environ['WORKING_DIR']
+resource_dir = os.environ['TEST_RESOURCE_DIR']
+test_file_path = os.path.join(resource_dir, 'files', 'test.jpg')
+archive_path = os.path.join(working_dir, 'fixity_archive')
+
+
+class FixityTest(unittest.TestCase):
+
+    def setUp(self):
+        self.objects = []
+        for object_id in ('a_0001', 'b_0002', 'c_0003'):
+            path = os.path.join(archive_path, '0000', '0001', object_id)
+            os.makedirs(os.path.join(path, 'data', 'jpg'))
+            copy_with_checksum(test_file_path,
+                               os.path.join(path, 'data', 'jpg', 'test.jpg'))
+            self.objects.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(archive_path, ignore_errors=True)
+
+    def test_copy_with_checksum(self):
+        target = os.path.join(self.objects[0], 'copy.jpg')
+        checksum = copy_with_checksum(test_file_path, target)
+
+        with open(test_file_path, 'rb') as file:
+            self.assertEqual(checksum, hashlib.sha256(file.read()).hexdigest())
+
+    def test_manifest(self):
+        path = self.objects[0]
+        checksum = copy_with_checksum(test_file_path,
+                                      os.path.join(path, 'copy.jpg'))
+        write_manifest(path, {'copy.jpg': checksum})
+
+        self.assertEqual(read_manifest(path), {'copy.jpg': checksum})
+        self.assertIn(MANIFEST_FILE, read_manifest(path, TAG_MANIFEST_FILE))
+        self.assertEqual(verify_manifest(path)['verified'], 1)
+
+        with open(os.path.join(path, 'copy.jpg'), 'ab') as file:
+            file.write(b'x')
+        self.assertEqual(verify_manifest(path)['failures'], ['copy.jpg'])
+
+    def test_audit_objects(self):
+        for path in self.objects:
+            write_manifest(path, {'data/jpg/test.jpg': copy_with_checksum(
+                test_file_path, os.path.join(path, 'data', 'jpg', 'test.jpg'))})
+        with open(os.path.join(self.objects[1], 'data', 'jpg', 'test.jpg'),
+                  'wb') as file:
+            file.write(b'broken')
+
+        result = audit_objects(archive_path, max_objects=2)
+        self.assertEqual(result['cursor'], '0000/0001/b_0002')
+        self.assertEqual(result['files'], 1)
+        self.assertEqual(result['failures'],
+                         {'0000/0001/b_0002': ['data/jpg/test.jpg']})
+
+        result = audit_objects(archive_path, result['cursor'], max_objects=2)
+        self.assertEqual(result['audited'], ['0000/0001/c_0003'])
+
+        result = audit_objects(archive_path, result['cursor'], max_objects=2)
+        self.assertEqual(result['audited'][0], '0000/0001/a_0001')
@@ -0,0 +1,67 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+from utils import http_client
+
+
+class _FlakyHandler(BaseHTTPRequestHandler):
+    """Answers the first request with 503 and all following with 200."""
+
+    protocol_version = 'HTTP/1.1'
+    requests = 0
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self._respond()
+
+    def _respond(self):
+        _FlakyHandler.requests += 1
+        status = 503 if _FlakyHandler.requests == 1 else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *_):
+        pass
+
+
+@mock.patch.object(http_client, 'HTTP_BACKOFF_FACTOR', 0)
+class HttpClientTest(unittest.TestCase):
+
+    def setUp(self):
+        _FlakyHandler.requests = 0
+        http_client._session = None
+        self.server = HTTPServer(('127.0.0.1', 0), _FlakyHandler)
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api"
+
+    def tearDown(self):
+        http_client.get_session().close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_get_is_retried(self):
+        response = http_client.get(self.url, endpoint='test.get')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(_FlakyHandler.requests, 2)
+        metrics = http_client.get_metrics()['test.get']
+        self.assertGreaterEqual(metrics['requests'], 1)
+
+    def test_post_is_not_retried(self):
+        response = http_client.post(self.url, data=b'x', endpoint='test.post')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(_FlakyHandler.requests, 1)
+        self.assertGreaterEqual(http_client.get_metrics()['test.post']
+                                ['errors'], 1)
+
+    def test_session_is_shared(self):
+        self.assertIs(http_client.get_session(), http_client.get_session())
@@ -6,7 +6,8 @@ from filecmp import dircmp
 from io import BytesIO
 import json
 
-from utils.object import Object
+from utils.fixity import read_manifest
+from utils.object import Object, import_file
 
 working_dir = os.environ['WORKING_DIR']
 resource_dir = os.environ['TEST_RESOURCE_DIR']
@@ -84,6 +85,42 @@ class ObjectTest(unittest.TestCase):
                                           'jpg', test_file_name)
         self.assertTrue(os.path.isfile(expected_file_path))
 
+    def test_add_files(self):
+        obj = Object(test_object_working_path)
+        methods = obj.add_files('files', [test_file_path,
+                                          test_metadata_file_path],
+                                checksum=True)
+
+        self.assertEqual(sum(methods.values()), 2)
+        self.assertEqual(sorted(read_manifest(test_object_working_path)),
+                         ['data/files/marc.xml', 'data/files/test.jpg'])
+        for path in (test_file_path, test_metadata_file_path):
+            with open(path, 'rb') as source:
+                expected = source.read()
+            with open(os.path.join(test_object_working_path, 'data', 'files',
+                                   os.path.basename(path)), 'rb') as target:
+                self.assertEqual(target.read(), expected)
+
+    def test_import_file_without_hardlinks(self):
+        target = os.path.join(working_dir, 'imported.jpg')
+        self.addCleanup(os.remove, target)
+        method = import_file(test_file_path, target, hardlink=False)
+
+        self.assertNotEqual(method, 'hardlink')
+        self.assertNotEqual(os.stat(target).st_ino,
+                            os.stat(test_file_path).st_ino)
+        with open(test_file_path, 'rb') as source, open(target, 'rb') as copy:
+            self.assertEqual(source.read(), copy.read())
+
+    def test_import_file_does_not_hardlink_by_default(self):
+        target = os.path.join(working_dir, 'imported.jpg')
+        self.addCleanup(os.remove, target)
+        method = import_file(test_file_path, target)
+
+        self.assertNotEqual(method, 'hardlink')
+        self.assertNotEqual(os.stat(target).st_ino,
+                            os.stat(test_file_path).st_ino)
+
     def test_list_representations(self):
         _copy_test_object()
         obj = Object(test_object_working_path)
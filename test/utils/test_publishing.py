@@ -0,0 +1,68 @@
+import os
+import shutil
+import unittest
+
+from utils.fixity import read_manifest, verify_manifest, \
+    ChecksumMismatchError
+from utils.publishing import publish_tree
+
+working_dir = os.environ['WORKING_DIR']
+resource_dir = os.environ['TEST_RESOURCE_DIR']
+source_path = os.path.join(resource_dir, 'objects',
+                           'a_archival_description_0001')
+publish_path = os.path.join(working_dir, 'published')
+
+
+class PublishingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_path = os.path.join(working_dir, 'publish_source')
+        shutil.copytree(source_path, self.work_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_path, ignore_errors=True)
+        shutil.rmtree(publish_path, ignore_errors=True)
+
+    def test_publish(self):
+        stats = publish_tree({'': self.work_path}, publish_path)
+
+        self.assertGreater(stats['imported'], 0)
+        self.assertEqual(stats['linked'], 0)
+        self.assertEqual(sorted(os.listdir(publish_path)),
+                         sorted(os.listdir(self.work_path)))
+        self.assertEqual(os.listdir(working_dir).count('published'), 1)
+
+    def test_republish_links_unchanged_files(self):
+        publish_tree({'': self.work_path}, publish_path)
+        with open(os.path.join(self.work_path, 'meta.json'), 'a') as meta:
+            meta.write(' ')
+
+        stats = publish_tree({'': self.work_path}, publish_path)
+
+        self.assertEqual(stats['imported'], 1)
+        self.assertGreater(stats['linked'], 0)
+        with open(os.path.join(publish_path, 'meta.json')) as meta:
+            self.assertTrue(meta.read().endswith(' '))
+        self.assertFalse([name for name in os.listdir(working_dir)
+                          if name.startswith('.published')])
+
+    def test_publish_subset(self):
+        publish_tree({'meta.json': os.path.join(self.work_path, 'meta.json')},
+                     publish_path)
+
+        self.assertEqual(os.listdir(publish_path), ['meta.json'])
+
+    def test_publish_with_manifest(self):
+        publish_tree({'': self.work_path}, publish_path, manifest=True)
+        self.assertTrue(read_manifest(publish_path))
+        self.assertFalse(verify_manifest(publish_path)['failures'])
+
+        stats = publish_tree({'': self.work_path}, publish_path, manifest=True)
+        self.assertEqual(stats['imported'], 0)
+        self.assertFalse(verify_manifest(publish_path)['failures'])
+
+    def test_publish_checksum_mismatch(self):
+        self.assertRaises(ChecksumMismatchError, publish_tree,
+                          {'': self.work_path}, publish_path,
+                          expected={'meta.json': 'not a checksum'})
+        self.assertFalse(os.path.exists(publish_path))
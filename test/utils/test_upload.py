@@ -0,0 +1,69 @@
+import gzip
+import os
+import shutil
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from utils.upload import upload_file
+
+working_dir = os.environ['WORKING_DIR']
+resource_dir = os.environ['TEST_RESOURCE_DIR']
+xml_file = os.path.join(resource_dir, 'files', 'ojs3_import.xml')
+
+
+class _RecordingHandler(BaseHTTPRequestHandler):
+
+    requests = []
+
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        self.requests.append((dict(self.headers), self.rfile.read(length)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{"success": true}')
+
+    def log_message(self, *_):
+        pass
+
+
+class UploadTest(unittest.TestCase):
+
+    def setUp(self):
+        _RecordingHandler.requests = []
+        self.server = HTTPServer(('127.0.0.1', 0), _RecordingHandler)
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/import/test"
+        self.work_path = os.path.join(working_dir, 'upload')
+        os.makedirs(self.work_path)
+        self.file = shutil.copy(xml_file, self.work_path)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.work_path, ignore_errors=True)
+
+    def test_upload(self):
+        response = upload_file(self.url, self.file,
+                               {'Content-Type': 'application/xml'},
+                               compress=False)
+
+        self.assertTrue(response.json()['success'])
+        headers, body = _RecordingHandler.requests[0]
+        with open(self.file, 'rb') as file:
+            self.assertEqual(body, file.read())
+        self.assertEqual(headers['Content-Length'],
+                         str(os.path.getsize(self.file)))
+        self.assertNotIn('Content-Encoding', headers)
+
+    def test_upload_compressed(self):
+        upload_file(self.url, self.file, {}, compress=True)
+
+        headers, body = _RecordingHandler.requests[0]
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        with open(self.file, 'rb') as file:
+            self.assertEqual(gzip.decompress(body), file.read())
+        self.assertEqual(os.listdir(self.work_path),
+                         [os.path.basename(self.file)])
@@ -0,0 +1,148 @@
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+log = logging.getLogger(__name__)
+
+PUBLISH_CONCURRENCY_INITIAL = int(
+    os.environ.get('PUBLISH_CONCURRENCY_INITIAL', '2'))
+PUBLISH_CONCURRENCY_MAX = int(os.environ.get('PUBLISH_CONCURRENCY_MAX', '8'))
+# calls slower than this factor times the average latency count as overload
+LATENCY_TOLERANCE = 2.0
+# weight of the latest call in the exponentially decaying average latency
+LATENCY_DECAY = 0.1
+DECREASE_FACTOR = 0.5
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class AdaptiveLimiter:
+    """
+    Limit the concurrent calls to a target system, adapting to its load.
+
+    The limit grows by one after as many successful calls as the limit,
+    i.e. about once per round of calls, as long as the latency stays within
+    LATENCY_TOLERANCE times the decaying average latency of the successful
+    calls. It is halved on errors signalling overload of the target system
+    (see is_overload) and reduced slightly on slow calls (additive increase,
+    multiplicative decrease). Other errors, like rejected requests, are
+    counted but leave the limit unchanged.
+    """
+
+    def __init__(self, name, initial=PUBLISH_CONCURRENCY_INITIAL,
+                 maximum=PUBLISH_CONCURRENCY_MAX, minimum=1):
+        self.name = name
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.queued = 0
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.avg_latency = None
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        """
+        Wait for a free slot and hold it while the block runs.
+
+        Exceptions raised in the block count as errors, those signalling
+        overload of the target system also decrease the limit.
+        """
+        with self._condition:
+            self.queued += 1
+            try:
+                while self.in_flight >= int(self.limit):
+                    self._condition.wait()
+            finally:
+                self.queued -= 1
+            self.in_flight += 1
+
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException as err:
+            self._release(time.monotonic() - start, True, is_overload(err))
+            raise
+        self._release(time.monotonic() - start, False, False)
+
+    def stats(self):
+        """
+        Return the current state of the limiter.
+
+        :return dict: the current 'limit', the calls 'in_flight' and
+            'queued' for a slot, the number of 'calls' and 'errors' and the
+            average latency in 'avg_seconds'
+        """
+        with self._condition:
+            return {
+                'limit': int(self.limit),
+                'in_flight': self.in_flight,
+                'queued': self.queued,
+                'calls': self.calls,
+                'errors': self.errors,
+                'avg_seconds': round(self.seconds / self.calls, 3)
+                if self.calls else None
+            }
+
+    def _release(self, seconds, error, overload):
+        with self._condition:
+            self.in_flight -= 1
+            self.calls += 1
+            self.seconds += seconds
+            previous = int(self.limit)
+            if error:
+                self.errors += 1
+                if overload:
+                    self.limit = max(self.minimum,
+                                     self.limit * DECREASE_FACTOR)
+            elif self.avg_latency is not None \
+                    and seconds > self.avg_latency * LATENCY_TOLERANCE:
+                self.limit = max(self.minimum, self.limit - 1 / self.limit)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            if not error:
+                self.avg_latency = seconds if self.avg_latency is None \
+                    else (1 - LATENCY_DECAY) * self.avg_latency \
+                    + LATENCY_DECAY * seconds
+            if int(self.limit) != previous:
+                log.info(f"Concurrency limit for {self.name} changed from "
+                         f"{previous} to {int(self.limit)}.")
+            self._condition.notify_all()
+
+
+def is_overload(err):
+    """
+    Tell whether an error signals overload of the target system.
+
+    :param BaseException err: the exception raised while calling the system
+    :return bool: True for connection errors, timeouts and 5xx responses
+    """
+    if isinstance(err, requests.HTTPError):
+        return err.response is not None and err.response.status_code >= 500
+    return isinstance(err, (requests.ConnectionError, requests.Timeout,
+                            requests.exceptions.RetryError, ConnectionError,
+                            TimeoutError, socket.timeout))
+
+
+def get_limiter(name):
+    """Return the limiter of this process for the named target system."""
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = AdaptiveLimiter(name)
+        return _limiters[name]
+
+
+def get_limiter_stats():
+    """Return the stats of all limiters of this process by target name."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
@@ -1,8 +1,9 @@
 import os
 import logging
-import requests
 import json
 
+from utils import http_client
+
 atom_uri = os.environ['ATOM_URI']
 atom_api_key = os.environ['ATOM_API_KEY']
 
@@ -11,10 +12,21 @@ log = logging.getLogger(__name__)
 
 def get_record(atom_id):
     """Get record from AtoM API."""
+    return get_record_response(atom_id).text
+
+
+def get_record_response(atom_id, headers=None):
+    """
+    Request a record from AtoM API.
+
+    :param str atom_id: the AtoM id
+    :param dict headers: (optional) additional headers, e.g. of a
+        conditional request
+    :return requests.Response:
+    """
     url = f"{atom_uri}/api/informationobjects/{atom_id}"
-    headers = {'REST-API-Key': atom_api_key}
-    response = requests.get(url, headers=headers)
-    return response.text
+    headers = {'REST-API-Key': atom_api_key, **(headers or {})}
+    return http_client.get(url, headers=headers, endpoint='atom.get_record')
 
 
 def create_digital_object(obj):
@@ -30,7 +42,8 @@ def create_digital_object(obj):
     data = _get_digital_object_data(obj)
     json_data = json.dumps(data, indent=4)
     log.debug(f"Digital object: {json_data}")
-    response = requests.post(url, data=json_data, headers=headers)
+    response = http_client.post(url, data=json_data, headers=headers,
+                                endpoint='atom.create_digital_object')
     response.raise_for_status()
     return f"{atom_uri}/{response.json()['slug']}"
 
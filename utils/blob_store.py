@@ -0,0 +1,235 @@
+import argparse
+import logging
+import os
+import tempfile
+
+from utils.fixity import TAG_FILES, copy_with_checksum, file_checksum, \
+    list_archived_objects, ChecksumMismatchError
+
+log = logging.getLogger(__name__)
+
+BLOB_DIR_NAME = '.blobs'
+
+
+class BlobStore:
+    """
+    A content addressed store for archived files.
+
+    Every distinct content is stored once as a blob named by its SHA-256
+    checksum in a directory sharded by the first two byte pairs of the
+    checksum, e.g. "ab/cd/abcd...". Object directories reference blobs by
+    hardlinks, so the store has to be on the same filesystem as them.
+
+    The link count of a blob is its reference count: a blob with a single
+    link is not used by any object and removed by `collect_garbage()`.
+    Files in object directories must never be rewritten in place, they have
+    to be replaced.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+    def blob_path(self, checksum):
+        """Return the path of the blob with the given checksum."""
+        return os.path.join(self.path, checksum[0:2], checksum[2:4], checksum)
+
+    def has(self, checksum):
+        return os.path.exists(self.blob_path(checksum))
+
+    def import_file(self, src, target, checksum=None):
+        """
+        Store a file in the blob store and hardlink it to target.
+
+        If the checksum of the file is known and a blob with that checksum
+        exists already, the file is not read at all. Otherwise it is copied
+        into the store while computing its checksum.
+
+        :param str src: The path to the source file
+        :param str target: The path of the generated file
+        :param str checksum: (optional) the known SHA-256 checksum of src
+        :return tuple: the checksum and the number of bytes written to the
+            store, 0 if the content was stored before
+        :raises ChecksumMismatchError: if the content does not match the
+            given checksum
+        """
+        written = 0
+        if checksum is None or not self.has(checksum):
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix='.import-')
+            os.close(fd)
+            try:
+                actual = copy_with_checksum(src, tmp_path)
+                if checksum is not None and actual != checksum:
+                    raise ChecksumMismatchError(
+                        f"Checksum of {src} does not match, expected "
+                        f"{checksum}, got {actual}.")
+                checksum = actual
+                written = self._store(tmp_path, checksum)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        _replace_with_link(self.blob_path(checksum), target)
+        return checksum, written
+
+    def add_existing_file(self, path, checksum=None):
+        """
+        Replace a file by a link to its blob, storing it if necessary.
+
+        The file itself becomes the blob if its content is not stored yet,
+        so no data is copied.
+
+        :param str path: The path to the file
+        :param str checksum: (optional) the SHA-256 checksum of the file, it
+            is computed if not given
+        :return tuple: the checksum and if the file was deduplicated
+        """
+        checksum = checksum or file_checksum(path)
+        blob = self.blob_path(checksum)
+        if os.path.exists(blob):
+            if os.path.samefile(blob, path):
+                return checksum, False
+            _replace_with_link(blob, path)
+            return checksum, True
+
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        try:
+            os.link(path, blob)
+        except FileExistsError:
+            _replace_with_link(blob, path)
+            return checksum, True
+        return checksum, False
+
+    def collect_garbage(self, dry_run=False):
+        """
+        Remove blobs no object references anymore.
+
+        :param bool dry_run: only count the blobs that would be removed
+        :return dict: the number of 'blobs' and 'bytes' removed
+        """
+        result = {'blobs': 0, 'bytes': 0}
+        for blob, stat in self._iter_blobs():
+            if stat.st_nlink == 1:
+                result['blobs'] += 1
+                result['bytes'] += stat.st_size
+                if not dry_run:
+                    os.remove(blob)
+        log.info(f"Garbage collection {'found' if dry_run else 'removed'} "
+                 f"{result['blobs']} blobs with {result['bytes']} bytes.")
+        return result
+
+    def stats(self):
+        """
+        Compute the size of the store and the deduplication ratio.
+
+        :return dict: the number of 'blobs' and 'references', the 'bytes'
+            stored, the 'logical_bytes' referenced by objects and their
+            'ratio'
+        """
+        result = {'blobs': 0, 'references': 0, 'bytes': 0,
+                  'logical_bytes': 0}
+        for _, stat in self._iter_blobs():
+            references = stat.st_nlink - 1
+            result['blobs'] += 1
+            result['references'] += references
+            result['bytes'] += stat.st_size
+            result['logical_bytes'] += stat.st_size * references
+        result['ratio'] = round(result['logical_bytes'] / result['bytes'], 2) \
+            if result['bytes'] else 1.0
+        return result
+
+    def _store(self, tmp_path, checksum):
+        blob = self.blob_path(checksum)
+        if os.path.exists(blob):
+            return 0
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        os.chmod(tmp_path, 0o444)
+        try:
+            # link instead of rename to never replace a concurrently
+            # stored blob, which may be linked already
+            os.link(tmp_path, blob)
+        except FileExistsError:
+            return 0
+        return os.path.getsize(blob)
+
+    def _iter_blobs(self):
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                if not name.startswith('.'):
+                    blob = os.path.join(root, name)
+                    yield blob, os.stat(blob)
+
+
+def get_archive_blob_store(archive_dir):
+    """
+    Return the blob store of the archive if enabled, otherwise None.
+
+    The store is enabled by setting ARCHIVE_BLOB_STORE to 1 and located in
+    ARCHIVE_BLOB_DIR, which defaults to a hidden directory in the archive.
+    """
+    if os.environ.get('ARCHIVE_BLOB_STORE', '0') != '1':
+        return None
+    return BlobStore(os.environ.get('ARCHIVE_BLOB_DIR',
+                                    os.path.join(archive_dir, BLOB_DIR_NAME)))
+
+
+def migrate_archive(archive_dir, blob_store):
+    """
+    Move the files of all archived objects into the blob store.
+
+    Files are replaced by links to their blobs. The migration can be
+    interrupted and restarted, files already linked to a blob are only
+    hashed again.
+
+    :return dict: the number of 'objects' and 'files' migrated and the
+        'deduplicated' files and their 'bytes'
+    """
+    result = {'objects': 0, 'files': 0, 'deduplicated': 0, 'bytes': 0}
+    for obj in list_archived_objects(archive_dir):
+        object_path = os.path.join(archive_dir, obj)
+        for root, _, files in os.walk(object_path):
+            for name in files:
+                if root == object_path and name in TAG_FILES:
+                    continue
+                path = os.path.join(root, name)
+                size = os.path.getsize(path)
+                _, deduplicated = blob_store.add_existing_file(path)
+                result['files'] += 1
+                if deduplicated:
+                    result['deduplicated'] += 1
+                    result['bytes'] += size
+        result['objects'] += 1
+        log.info(f"Migrated {obj} to the blob store.")
+    return result
+
+
+def _replace_with_link(blob, target):
+    tmp_path = f"{target}.link-tmp"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    os.link(blob, tmp_path)
+    os.replace(tmp_path, target)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Manage the deduplicating blob store of the archive.")
+    parser.add_argument('command', choices=['migrate', 'gc', 'stats'])
+    parser.add_argument('--archive-dir', default=os.environ.get('ARCHIVE_DIR'))
+    parser.add_argument('--blob-dir')
+    parser.add_argument('--dry-run', action='store_true',
+                        help="only report the blobs gc would remove")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    blob_store = BlobStore(args.blob_dir or os.path.join(args.archive_dir,
+                                                         BLOB_DIR_NAME))
+    if args.command == 'migrate':
+        print(migrate_archive(args.archive_dir, blob_store))
+    elif args.command == 'gc':
+        print(blob_store.collect_garbage(args.dry_run))
+    print(blob_store.stats())
+
+
+if __name__ == '__main__':
+    main()
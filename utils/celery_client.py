@@ -22,6 +22,7 @@ celery_app.conf.task_queues = (
     Queue('nlp', nlp_exchange, routing_key='nlp'),
     Queue('nlp_heideltime', nlp_exchange, routing_key='nlp_heideltime'),
     Queue('convert', nlp_exchange, routing_key='convert'),
+    Queue('publish', default_exchange, routing_key='publish'),
 )
 celery_app.conf.task_default_queue = 'default'
 celery_app.conf.task_default_exchange = 'default'
@@ -40,6 +41,20 @@ celery_app.conf.task_routes = {
     'convert.*': {
             'queue': 'convert',
             'routing_key': 'convert',
-    }
+    },
+    # publish tasks mostly wait for remote imports, they are run in threads
+    # by a separate worker of the default worker image
+    **{name: {'queue': 'publish', 'routing_key': 'publish'}
+       for name in ('publish_to_ojs', 'publish_to_omp', 'publish_to_atom')}
 }
 
+# the archive fixity audit runs periodically if an interval in seconds is set,
+# the default worker then has to be started with an embedded beat scheduler
+fixity_audit_interval = os.environ.get('FIXITY_AUDIT_INTERVAL')
+if fixity_audit_interval:
+    celery_app.conf.beat_schedule = {
+        'fixity-audit': {
+            'task': 'fixity_audit',
+            'schedule': float(fixity_audit_interval)
+        }
+    }
@@ -0,0 +1,228 @@
+import datetime
+import hashlib
+import logging
+import os
+import time
+from typing import Dict
+
+from utils.list_dir import list_dir
+
+log = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'manifest-sha256.txt'
+TAG_MANIFEST_FILE = 'tagmanifest-sha256.txt'
+BAGIT_FILE = 'bagit.txt'
+BAG_INFO_FILE = 'bag-info.txt'
+TAG_FILES = (MANIFEST_FILE, TAG_MANIFEST_FILE, BAGIT_FILE, BAG_INFO_FILE)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class ChecksumMismatchError(OSError):
+    pass
+
+
+class Throttle:
+    """Limit the rate of bytes read by sleeping between chunks."""
+
+    def __init__(self, bytes_per_second=None):
+        self.bytes_per_second = bytes_per_second
+        self.start = time.monotonic()
+        self.bytes = 0
+
+    def consume(self, size):
+        """Account for size bytes read and sleep if reading too fast."""
+        if not self.bytes_per_second:
+            return
+        self.bytes += size
+        ahead = self.bytes / self.bytes_per_second \
+            - (time.monotonic() - self.start)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+def copy_with_checksum(src, target, hasher=None):
+    """
+    Copy a file and compute its SHA-256 checksum while streaming the bytes.
+
+    :param str src: The path to the source file
+    :param str target: The path of the generated file
+    :param hasher: (optional) hashlib object to update, a new SHA-256
+        object is used if omitted
+    :return str: the hex digest
+    """
+    hasher = hasher or hashlib.sha256()
+    with open(src, 'rb') as source, open(target, 'wb') as copy:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+            copy.write(chunk)
+    return hasher.hexdigest()
+
+
+def file_checksum(path, hasher=None, throttle=None):
+    """
+    Compute the SHA-256 checksum of a file.
+
+    :param str path: The path to the file
+    :param hasher: (optional) hashlib object to update
+    :param Throttle throttle: (optional) limits the read rate
+    :return str: the hex digest
+    """
+    hasher = hasher or hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+            if throttle:
+                throttle.consume(len(chunk))
+    return hasher.hexdigest()
+
+
+def read_manifest(path, manifest_file=MANIFEST_FILE) -> Dict[str, str]:
+    """
+    Read the checksums of a BagIt style manifest in a directory.
+
+    :param str path: The directory containing the manifest
+    :return dict: maps relative file paths to SHA-256 checksums, empty if
+        there is no manifest
+    """
+    checksums = {}
+    try:
+        with open(os.path.join(path, manifest_file), encoding='utf-8') as file:
+            for line in file:
+                checksum, _, rel_path = line.rstrip('\n').partition(' ')
+                if rel_path:
+                    checksums[rel_path.lstrip(' ')] = checksum
+    except FileNotFoundError:
+        pass
+    return checksums
+
+
+def write_manifest(path, checksums: Dict[str, str]):
+    """
+    Write a BagIt style manifest with tag files to a directory.
+
+    Besides manifest-sha256.txt with the given checksums, bagit.txt,
+    bag-info.txt and tagmanifest-sha256.txt covering these are written.
+    The payload is not moved into a data directory as BagIt requires, the
+    paths in the manifest are relative to path.
+
+    :param str path: The directory to write the manifest to
+    :param dict checksums: maps relative file paths to SHA-256 checksums
+    """
+    size = 0
+    for rel_path in checksums:
+        try:
+            size += os.path.getsize(os.path.join(path, rel_path))
+        except FileNotFoundError:
+            pass
+
+    tag_files = {
+        MANIFEST_FILE: ''.join(f"{checksum}  {rel_path}\n" for rel_path,
+                               checksum in sorted(checksums.items())),
+        BAGIT_FILE: "BagIt-Version: 1.0\nTag-File-Character-Encoding: UTF-8\n",
+        BAG_INFO_FILE: f"Bagging-Date: {datetime.date.today().isoformat()}\n"
+                       f"Payload-Oxum: {size}.{len(checksums)}\n"
+    }
+    tag_checksums = {}
+    for name, content in tag_files.items():
+        data = content.encode('utf-8')
+        with open(os.path.join(path, name), 'wb') as file:
+            file.write(data)
+        tag_checksums[name] = hashlib.sha256(data).hexdigest()
+
+    with open(os.path.join(path, TAG_MANIFEST_FILE), 'w',
+              encoding='utf-8') as file:
+        for name, checksum in sorted(tag_checksums.items()):
+            file.write(f"{checksum}  {name}\n")
+
+
+def verify_manifest(path, throttle=None):
+    """
+    Verify the files of a directory against its manifest.
+
+    :param str path: The directory containing the manifest
+    :param Throttle throttle: (optional) limits the read rate
+    :return dict: the number of 'verified' files and 'bytes' read, the
+        'failures' as relative paths and if a 'manifest' was found
+    """
+    result = {'verified': 0, 'bytes': 0, 'failures': [], 'manifest': True}
+    checksums = read_manifest(path)
+    if not checksums:
+        result['manifest'] = os.path.exists(os.path.join(path, MANIFEST_FILE))
+        return result
+
+    for rel_path, expected in sorted(checksums.items()):
+        file = os.path.join(path, rel_path)
+        try:
+            actual = file_checksum(file, throttle=throttle)
+            result['bytes'] += os.path.getsize(file)
+        except OSError:
+            actual = None
+        if actual == expected:
+            result['verified'] += 1
+        else:
+            result['failures'].append(rel_path)
+    return result
+
+
+def list_archived_objects(base_dir):
+    """
+    List the paths of all objects below base_dir, sorted.
+
+    Objects are stored in checksum-based folders as generated by
+    `utils.repository.generate_repository_path()`. Hidden directories, e.g.
+    of publications in progress or the blob store, are skipped.
+
+    :return list: paths relative to base_dir
+    """
+    objects = []
+    for f1 in _list_visible(base_dir):
+        for f2 in _list_visible(os.path.join(base_dir, f1)):
+            for object_id in _list_visible(os.path.join(base_dir, f1, f2)):
+                objects.append(os.path.join(f1, f2, object_id))
+    return objects
+
+
+def _list_visible(directory):
+    return sorted(name for name in list_dir(directory, ignore_not_found=True)
+                  if not name.startswith('.'))
+
+
+def audit_objects(base_dir, cursor=None, max_objects=100,
+                  bytes_per_second=None):
+    """
+    Verify a batch of objects against their manifests.
+
+    Objects are audited in order of their paths, starting after cursor.
+    After the last object the audit starts over with the first one.
+
+    :param str base_dir: e.g. the archive dir
+    :param str cursor: (optional) path of the last object audited before
+    :param int max_objects: number of objects audited in this batch
+    :param int bytes_per_second: (optional) maximum read rate
+    :return dict: the new 'cursor', the 'audited' objects, the number of
+        'objects' and 'files' verified, the 'bytes' read, the 'failures' per
+        object and the objects without manifest ('unbagged')
+    """
+    objects = list_archived_objects(base_dir)
+    pending = [obj for obj in objects if cursor is None or obj > cursor]
+    if not pending:
+        pending = objects
+    batch = pending[:max_objects]
+
+    throttle = Throttle(bytes_per_second)
+    result = {'cursor': cursor, 'audited': batch, 'objects': 0, 'files': 0,
+              'bytes': 0, 'failures': {}, 'unbagged': []}
+    for obj in batch:
+        verification = verify_manifest(os.path.join(base_dir, obj), throttle)
+        result['cursor'] = obj
+        result['objects'] += 1
+        result['files'] += verification['verified']
+        result['bytes'] += verification['bytes']
+        if verification['failures']:
+            log.error(f"Fixity check of {obj} failed for "
+                      f"{verification['failures']}.")
+            result['failures'][obj] = verification['failures']
+        if not verification['manifest']:
+            result['unbagged'].append(obj)
+    return result
@@ -0,0 +1,122 @@
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+log = logging.getLogger(__name__)
+
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', '10'))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', '60'))
+HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES', '3'))
+# waits between retries are backoff factor * 2 ** (retry - 1) seconds
+HTTP_BACKOFF_FACTOR = float(os.environ.get('HTTP_BACKOFF_FACTOR', '1'))
+# connections kept alive per host
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', '10'))
+
+RETRY_STATUS = (502, 503, 504)
+# requests with other methods are only retried if they were not sent
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+_session = None
+_session_pid = None
+_metrics = {}
+_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Return the HTTP session of this process, creating it on first use.
+
+    The session keeps connections alive in a pool per host. Failed
+    connections are retried for all requests, 502, 503 and 504 responses
+    and read errors only for idempotent methods, with exponential backoff.
+
+    :return requests.Session:
+    """
+    global _session, _session_pid
+    with _lock:
+        # connections must not be shared with a forked worker process
+        if _session is None or _session_pid != os.getpid():
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE,
+                                  pool_maxsize=HTTP_POOL_SIZE,
+                                  max_retries=_create_retry())
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+            _session_pid = os.getpid()
+        return _session
+
+
+def request(method, url, endpoint=None, timeout=None, **kwargs):
+    """
+    Make a request with the shared session and record its metrics.
+
+    :param str method: HTTP method
+    :param str url: the URL
+    :param str endpoint: (optional) name the metrics are recorded under,
+        defaults to method and URL without query
+    :param tuple timeout: (optional) connect and read timeout in seconds,
+        defaults to HTTP_CONNECT_TIMEOUT and HTTP_READ_TIMEOUT
+    :param kwargs: passed on to `requests.Session.request()`
+    :return requests.Response: the response, which may have an error status
+    :raises requests.RequestException: if the request failed after all
+        retries
+    """
+    endpoint = endpoint or f"{method} {url.split('?')[0]}"
+    timeout = timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    start = time.monotonic()
+    try:
+        response = get_session().request(method, url, timeout=timeout,
+                                         **kwargs)
+    except requests.RequestException as e:
+        _record(endpoint, time.monotonic() - start, True)
+        log.error(f"Request {endpoint} failed: {e}")
+        raise
+    _record(endpoint, time.monotonic() - start, response.status_code >= 400)
+    return response
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def get_metrics():
+    """
+    Return the metrics of the requests made by this process.
+
+    :return dict: per endpoint the number of 'requests' and 'errors', the
+        total and maximum latency in 'seconds' and 'max_seconds'
+    """
+    with _lock:
+        return {endpoint: dict(metrics)
+                for endpoint, metrics in _metrics.items()}
+
+
+def _record(endpoint, seconds, error):
+    with _lock:
+        metrics = _metrics.setdefault(endpoint, {
+            'requests': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+        metrics['requests'] += 1
+        metrics['errors'] += int(error)
+        metrics['seconds'] += seconds
+        metrics['max_seconds'] = max(metrics['max_seconds'], seconds)
+    log.debug(f"Request {endpoint} took {seconds:.3f}s.")
+
+
+def _create_retry():
+    options = dict(total=HTTP_RETRIES, backoff_factor=HTTP_BACKOFF_FACTOR,
+                   status_forcelist=RETRY_STATUS, raise_on_status=False)
+    try:
+        return Retry(allowed_methods=IDEMPOTENT_METHODS, **options)
+    except TypeError:
+        # urllib3 before 1.26
+        return Retry(method_whitelist=IDEMPOTENT_METHODS, **options)
@@ -187,6 +187,61 @@ class JobDb:
         self.db.jobs.update_many({"job_id": job_id},
                             {'$push': {'errors': error_message}, '$set': {'updated': timestamp}})
 
+    def get_task_durations(self, job_type, parameters=None, limit=500):
+        """
+        Get the run times of the most recent successful jobs of a type.
+
+        The run time of a job is the time between its start and its last
+        update, which is the time it finished for successful jobs.
+
+        :param str job_type: type of job, i.e. 'convert.tif_to_pdf'
+        :param dict parameters: (optional) job parameters that have to match
+        :param int limit: maximum number of jobs taken into account
+        :return list: run times in seconds
+        """
+        query = {'job_type': job_type, 'state': 'success',
+                 'started': {'$ne': None}}
+        for key, value in (parameters or {}).items():
+            query[f'parameters.{key}'] = value
+
+        jobs = self.db.jobs.find(query, {'_id': False, 'started': True,
+                                         'updated': True})
+        jobs = jobs.sort('updated', DESCENDING).limit(limit)
+        return [(job['updated'] - job['started']).total_seconds()
+                for job in jobs]
+
+    def get_fixity_progress(self):
+        """
+        Get the state of the archive fixity audit.
+
+        :return dict: the 'cursor' (last object audited), the totals and the
+            'failures' as list of dicts with 'object' and 'files'
+        """
+        progress = self.db.fixity.find_one({'_id': 'audit'}, {'_id': False})
+        return progress or {'cursor': None, 'failures': []}
+
+    def update_fixity_progress(self, result):
+        """
+        Store the result of a fixity audit batch.
+
+        Failures of the audited objects replace their previous failures.
+
+        :param dict result: result of `utils.fixity.audit_objects()`
+        :return: None
+        """
+        progress = self.get_fixity_progress()
+        failures = [failure for failure in progress.get('failures', [])
+                    if failure['object'] not in result['audited']]
+        failures += [{'object': obj, 'files': files}
+                     for obj, files in result['failures'].items()]
+
+        self.db.fixity.update_one({'_id': 'audit'}, {
+            '$set': {'cursor': result['cursor'], 'failures': failures,
+                     'updated': datetime.datetime.now()},
+            '$inc': {'objects': result['objects'], 'files': result['files'],
+                     'bytes': result['bytes']}
+        }, upsert=True)
+
     def _create_index(self):
         """
         Create index for faster lookup in database.
@@ -1,11 +1,34 @@
+import errno
+import fcntl
+import hashlib
 import json
+import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from distutils.dir_util import copy_tree
 from io import BytesIO
-from typing import List, Iterator
+from typing import Dict, List, Iterator
 
+from utils.fixity import copy_with_checksum, file_checksum, read_manifest, \
+    write_manifest
 from utils.list_dir import list_dir
 
+log = logging.getLogger(__name__)
+
+# number of threads used to import files into an object
+IMPORT_WORKERS = int(os.environ.get('OBJECT_IMPORT_WORKERS', 4))
+# hardlinks share the inode with the source, so an in place rewrite on
+# either side, e.g. of a file in staging, silently changes the other. They
+# are only used if enabled, reflinks and copies are independent.
+IMPORT_HARDLINKS = os.environ.get('OBJECT_IMPORT_HARDLINKS', '0') == '1'
+
+# ioctl creating a reflink (copy on write clone) on btrfs, xfs and others
+_FICLONE = 0x40049409
+# errors meaning that linking or in kernel copying is not possible here
+_UNSUPPORTED = (errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP, errno.ENOTTY,
+                errno.EINVAL, errno.ENOSYS, errno.EMLINK)
+
 
 class PathDoesNotExist(Exception):
     pass
@@ -51,6 +74,7 @@ class Object:
         :param str path: the Path where the object lives.
         """
         self.path = path
+        self._manifest_lock = threading.Lock()
 
         if not os.path.exists(self.path):
             os.makedirs(self.path)
@@ -96,22 +120,75 @@ class Object:
                                file_name), 'wb+') as stream:
             stream.write(file.read())
 
-    def add_file(self, representation: str, src: str):
+    def add_file(self, representation: str, src: str, checksum: bool = False):
         """
         Add a file to a representation of the object.
 
-        This acts as a convenience wrapper around `add_stream()` and handles
-        opening and reading the file.
+        The file is imported without reading it into memory, see
+        `import_file()`.
 
         The generated file has the same name as the source file.
 
         :param str representation: The file format of the input.
         :param str src: The path to the source file
+        :param bool checksum: (optional) compute the SHA-256 checksum while
+            importing and add it to the manifest of the object
+        :return str: the method used to import the file
+        """
+        method, rel_path, digest = self._import_file(representation, src,
+                                                     checksum)
+        if checksum:
+            self.update_manifest({rel_path: digest})
+        return method
+
+    def add_files(self, representation: str, sources: List[str],
+                  workers: int = None, checksum: bool = False):
+        """
+        Add multiple files to a representation of the object in parallel.
+
+        :param str representation: The file format of the input.
+        :param List[str] sources: The paths to the source files
+        :param int workers: (optional) number of threads, defaults to
+            IMPORT_WORKERS
+        :param bool checksum: (optional) compute the SHA-256 checksums while
+            importing and add them to the manifest of the object
+        :return dict: the number of files imported per import method
+        """
+        methods = {}
+        checksums = {}
+        with ThreadPoolExecutor(max_workers=workers or IMPORT_WORKERS) \
+                as executor:
+            for method, rel_path, digest in executor.map(
+                    lambda src: self._import_file(representation, src,
+                                                  checksum), sources):
+                methods[method] = methods.get(method, 0) + 1
+                checksums[rel_path] = digest
+        if checksum:
+            self.update_manifest(checksums)
+        log.info(f"Imported {len(sources)} files to {representation}: "
+                 f"{methods}")
+        return methods
+
+    def update_manifest(self, checksums: Dict[str, str]):
+        """
+        Add checksums to the BagIt style manifest of the object.
+
+        :param dict checksums: maps paths relative to the object to SHA-256
+            checksums
         :return: None
         """
-        with open(src, 'rb') as stream:
-            self.add_stream(os.path.basename(src), representation,
-                            BytesIO(stream.read()))
+        with self._manifest_lock:
+            write_manifest(self.path, {**read_manifest(self.path),
+                                       **checksums})
+
+    def _import_file(self, representation, src, checksum):
+        representation_dir = self.get_representation_dir(representation)
+        os.makedirs(representation_dir, exist_ok=True)
+        target = os.path.join(representation_dir, os.path.basename(src))
+        hasher = hashlib.sha256() if checksum else None
+        method = import_file(src, target, hasher=hasher)
+        return (method, os.path.relpath(target, self.path),
+                hasher.hexdigest() if hasher else None)
 
     def list_representations(self) -> List[str]:
         """
@@ -166,3 +243,96 @@ class Object:
         :return str:
         """
         return os.path.join(self.get_data_dir(), representation)
+
+
+def import_file(src: str, target: str, hardlink: bool = None,
+                hasher=None):
+    """
+    Copy a file without passing its content through Python.
+
+    The cheapest method available is used:
+    * a reflink, sharing the data blocks copy on write
+    * a hardlink, if enabled and source and target share a filesystem
+    * copy_file_range or sendfile, copying inside the kernel
+    * a buffered copy as last resort
+
+    If a hasher is given, the data is hashed while copying it in Python
+    instead of copying inside the kernel. Reflinked and hardlinked files
+    are read once to hash them.
+
+    An existing target is replaced.
+
+    :param str src: The path to the source file
+    :param str target: The path of the generated file
+    :param bool hardlink: (optional) if hardlinks may be used, defaults to
+        IMPORT_HARDLINKS
+    :param hasher: (optional) hashlib object updated with the file content
+    :return str: the method used, one of 'reflink', 'hardlink',
+        'copy_file_range', 'sendfile', 'copy' and 'stream' (hashing copy)
+    """
+    if hardlink is None:
+        hardlink = IMPORT_HARDLINKS
+    if os.path.lexists(target):
+        os.remove(target)
+
+    with open(src, 'rb') as source_file, open(target, 'wb') as target_file:
+        try:
+            fcntl.ioctl(target_file.fileno(), _FICLONE, source_file.fileno())
+            if hasher:
+                file_checksum(src, hasher)
+            return 'reflink'
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+
+    if hardlink:
+        os.remove(target)
+        try:
+            os.link(src, target)
+            if hasher:
+                file_checksum(src, hasher)
+            return 'hardlink'
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+
+    if hasher:
+        copy_with_checksum(src, target, hasher)
+        return 'stream'
+
+    with open(src, 'rb') as source_file, open(target, 'wb') as target_file:
+        return _copy_file_data(source_file.fileno(), target_file.fileno(),
+                               os.fstat(source_file.fileno()).st_size)
+
+
+def _copy_file_data(source_fd, target_fd, size):
+    """Copy the data of a file inside the kernel where possible."""
+    # os.copy_file_range is only available with Python 3.8 and later
+    for method in ('copy_file_range', 'sendfile'):
+        function = getattr(os, method, None)
+        if function is None:
+            continue
+        try:
+            offset = 0
+            while offset < size:
+                if method == 'sendfile':
+                    copied = function(target_fd, source_fd, offset,
+                                      size - offset)
+                else:
+                    copied = function(source_fd, target_fd, size - offset,
+                                      offset, offset)
+                if copied == 0:
+                    break
+                offset += copied
+            return method
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED or offset > 0:
+                raise
+
+    os.lseek(source_fd, 0, os.SEEK_SET)
+    os.lseek(target_fd, 0, os.SEEK_SET)
+    while True:
+        chunk = os.read(source_fd, 1024 * 1024)
+        if not chunk:
+            return 'copy'
+        os.write(target_fd, chunk)
@@ -0,0 +1,10 @@
+import os
+
+# written by convert.pdf_to_txt next to a consolidated text file and read by
+# the nlp workers
+PAGE_INDEX_EXTENSION = '.pages.json'
+
+
+def get_page_index_path(text_file):
+    """Return the path of the page index belonging to a consolidated text."""
+    return os.path.splitext(text_file)[0] + PAGE_INDEX_EXTENSION
@@ -0,0 +1,210 @@
+import ctypes
+import ctypes.util
+import errno
+import filecmp
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from typing import Dict, List
+
+from utils.fixity import ChecksumMismatchError, TAG_FILES, file_checksum, \
+    read_manifest, write_manifest
+from utils.object import import_file
+
+log = logging.getLogger(__name__)
+
+# unchanged files are detected by size and mtime or, if set, by content
+PUBLISH_COMPARE_CONTENT = os.environ.get('PUBLISH_COMPARE_CONTENT', '0') == '1'
+
+_RENAME_EXCHANGE = 2
+_AT_FDCWD = -100
+_libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+
+
+def publish_tree(sources: Dict[str, str], target: str,
+                 link_dirs: List[str] = None, manifest: bool = False,
+                 expected: Dict[str, str] = None, blob_store=None):
+    """
+    Publish files and directories to target, replacing it atomically.
+
+    The new version is staged in a temporary sibling of target and swapped
+    in with a rename, so readers see either the old or the new version
+    and never a missing or partial one.
+
+    Files that did not change compared to the previous version at target
+    or to the same file below one of link_dirs are hardlinked from there,
+    so published copies share inodes where the storage allows it. Other
+    files are reflinked or copied with `utils.object.import_file()`.
+
+    :param dict sources: maps paths relative to target to source files or
+        directories
+    :param str target: the directory to publish to
+    :param list link_dirs: (optional) other published copies to hardlink
+        unchanged files from, e.g. the repository copy of an archived object
+    :param bool manifest: (optional) write a BagIt style manifest of the
+        published files, the checksums are computed while copying or taken
+        from the manifest of the version a file is linked from
+    :param dict expected: (optional) checksums of files by path relative to
+        target, e.g. the manifest written on ingest, publishing fails if a
+        copied file does not match
+    :param BlobStore blob_store: (optional) store changed files once in this
+        `utils.blob_store.BlobStore` and link them from there, link_dirs
+        are not used then
+    :return dict: the number of 'linked' and 'imported' files and the
+        'bytes' that had to be imported
+    :raises ChecksumMismatchError: if a file does not match its expected
+        checksum
+    """
+    target = os.path.abspath(target)
+    parent = os.path.dirname(target)
+    os.makedirs(parent, exist_ok=True)
+    candidates = [target] if blob_store else [target] + (link_dirs or [])
+    stats = {'linked': 0, 'imported': 0, 'bytes': 0}
+    publication = _Publication(candidates, manifest, expected or {},
+                               blob_store)
+
+    staging = tempfile.mkdtemp(dir=parent,
+                               prefix=f'.{os.path.basename(target)}.new-')
+    try:
+        for rel_path, source in sources.items():
+            if os.path.isdir(source):
+                for root, _, files in os.walk(source):
+                    for name in files:
+                        file = os.path.join(root, name)
+                        rel_file = os.path.normpath(os.path.join(
+                            rel_path, os.path.relpath(file, source)))
+                        if rel_file not in TAG_FILES:
+                            publication.publish_file(file, staging, rel_file,
+                                                     stats)
+            else:
+                publication.publish_file(source, staging, rel_path, stats)
+        if manifest:
+            write_manifest(staging, publication.checksums)
+        os.chmod(staging, 0o755)
+        _swap_in(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    log.info(f"Published {target}: {stats['linked']} files unchanged, "
+             f"{stats['imported']} files with {stats['bytes']} bytes "
+             f"imported.")
+    return stats
+
+
+class _Publication:
+
+    def __init__(self, candidates, manifest, expected, blob_store):
+        self.candidates = candidates
+        self.manifest = manifest
+        self.expected = expected
+        self.blob_store = blob_store
+        self.checksums = {}
+        self._candidate_manifests = {}
+
+    def publish_file(self, source, staging, rel_path, stats):
+        staged = os.path.join(staging, rel_path)
+        os.makedirs(os.path.dirname(staged), exist_ok=True)
+
+        for candidate_dir in self.candidates:
+            candidate = os.path.join(candidate_dir, rel_path)
+            if _is_unchanged(source, candidate):
+                try:
+                    os.link(candidate, staged)
+                except OSError as e:
+                    if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                        raise
+                    continue
+                if self.manifest:
+                    self.checksums[rel_path] = \
+                        self._candidate_checksum(candidate_dir, rel_path)
+                stats['linked'] += 1
+                return
+
+        if self.blob_store:
+            checksum, written = self.blob_store.import_file(
+                source, staged, self.expected.get(rel_path))
+            self.checksums[rel_path] = checksum
+            stats['imported'] += 1
+            stats['bytes'] += written
+            return
+
+        # work files may still be rewritten in place, so they are never linked
+        hasher = hashlib.sha256() if self.manifest or self.expected else None
+        import_file(source, staged, hardlink=False, hasher=hasher)
+        if hasher:
+            self._check(rel_path, hasher.hexdigest())
+        source_stat = os.stat(source)
+        os.utime(staged, ns=(source_stat.st_atime_ns,
+                             source_stat.st_mtime_ns))
+        stats['imported'] += 1
+        stats['bytes'] += source_stat.st_size
+
+    def _candidate_checksum(self, candidate_dir, rel_path):
+        if candidate_dir not in self._candidate_manifests:
+            self._candidate_manifests[candidate_dir] = \
+                read_manifest(candidate_dir)
+        checksum = self._candidate_manifests[candidate_dir].get(rel_path)
+        if checksum is None:
+            checksum = file_checksum(os.path.join(candidate_dir, rel_path))
+        return checksum
+
+    def _check(self, rel_path, checksum):
+        expected = self.expected.get(rel_path)
+        if expected is not None and expected != checksum:
+            raise ChecksumMismatchError(
+                f"Checksum of {rel_path} does not match, expected "
+                f"{expected}, got {checksum}.")
+        self.checksums[rel_path] = checksum
+
+
+def _is_unchanged(source, candidate):
+    try:
+        source_stat = os.stat(source)
+        candidate_stat = os.stat(candidate)
+    except FileNotFoundError:
+        return False
+    if source_stat.st_size != candidate_stat.st_size:
+        return False
+    if PUBLISH_COMPARE_CONTENT:
+        return filecmp.cmp(source, candidate, shallow=False)
+    return source_stat.st_mtime_ns == candidate_stat.st_mtime_ns
+
+
+def _swap_in(staging, target):
+    """
+    Replace target with the staging directory.
+
+    If target exists both are exchanged in a single renameat2 call where
+    the kernel and filesystem support it. Otherwise the previous version is
+    moved aside first, leaving a short window without target.
+    """
+    if not os.path.exists(target):
+        os.rename(staging, target)
+        return
+
+    if _exchange(staging, target):
+        shutil.rmtree(staging)
+        return
+
+    previous = tempfile.mkdtemp(dir=os.path.dirname(target),
+                                prefix=f'.{os.path.basename(target)}.old-')
+    os.rename(target, os.path.join(previous, 'version'))
+    os.rename(staging, target)
+    shutil.rmtree(previous)
+
+
+def _exchange(path_a, path_b):
+    renameat2 = getattr(_libc, 'renameat2', None)
+    if renameat2 is None:
+        return False
+    result = renameat2(_AT_FDCWD, os.fsencode(path_a), _AT_FDCWD,
+                       os.fsencode(path_b), _RENAME_EXCHANGE)
+    if result == 0:
+        return True
+    error = ctypes.get_errno()
+    if error in (errno.EINVAL, errno.ENOSYS):
+        return False
+    raise OSError(error, os.strerror(error), path_a)
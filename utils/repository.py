@@ -3,10 +3,15 @@ import hashlib
 
 from utils.list_dir import list_dir
 from utils.sorting_algorithms import sort_alphanumeric
-from utils.object import InvalidObjectIdError
+from utils.object import InvalidObjectIdError, Object
 
 repository_dir = os.environ['REPOSITORY_DIR']
 
+# representations served from the repository, also with a prefix, e.g.
+# 'issue_pdf' or 'article-0_pdf'
+REPOSITORY_REPRESENTATIONS = ('pdf', 'jpg')
+REPOSITORY_METADATA_FILES = ('meta.json', 'mets.xml')
+
 
 def list_objects_in_repository():
     """
@@ -45,3 +50,26 @@ def generate_repository_path(object_id):
                                    f"'{object_id}' have to be numeric")
     path = os.path.join(folder[0:2] + "00", folder, object_id)
     return path
+
+
+def get_repository_sources(work_path):
+    """
+    Return the files of an object that are published to the repository.
+
+    These are its pdf and jpg representations and the metadata files the
+    object has.
+
+    :param str work_path: The path of the object in the working dir
+    :return dict: maps paths in the repository copy to source paths, see
+        `utils.publishing.publish_tree()`
+    """
+    sources = {}
+    data_dir = os.path.join(work_path, Object.DATA_DIR)
+    for representation in list_dir(data_dir, ignore_not_found=True):
+        if representation.split('_')[-1] in REPOSITORY_REPRESENTATIONS:
+            sources[os.path.join(Object.DATA_DIR, representation)] = \
+                os.path.join(data_dir, representation)
+    for file_name in REPOSITORY_METADATA_FILES:
+        if os.path.exists(os.path.join(work_path, file_name)):
+            sources[file_name] = os.path.join(work_path, file_name)
+    return sources
@@ -0,0 +1,95 @@
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+
+from utils import http_client
+
+log = logging.getLogger(__name__)
+
+# compress uploads with gzip, the server has to decompress request bodies
+# with Content-Encoding: gzip, e.g. Apache with "SetInputFilter DEFLATE"
+UPLOAD_GZIP = os.environ.get('UPLOAD_GZIP', '0') == '1'
+UPLOAD_CONNECT_TIMEOUT = float(os.environ.get('UPLOAD_CONNECT_TIMEOUT', '10'))
+# imports of large issues may take long before the server responds
+UPLOAD_READ_TIMEOUT = float(os.environ.get('UPLOAD_READ_TIMEOUT', '3600'))
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+PROGRESS_STEP_PERCENT = 10
+
+
+class UploadBody:
+    """
+    A request body read from a file chunk by chunk, logging the progress.
+
+    The size is known up front, so the body is sent with a Content-Length
+    and never held in memory as a whole.
+    """
+
+    def __init__(self, file, size, name):
+        self.file = file
+        self.size = size
+        self.name = name
+        self.sent = 0
+        self._next_report = PROGRESS_STEP_PERCENT
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return iter(lambda: self.read(UPLOAD_CHUNK_SIZE), b'')
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        self.sent += len(data)
+        percent = 100 * self.sent // self.size if self.size else 100
+        if percent >= self._next_report:
+            log.info(f"Uploaded {percent}% of {self.name} "
+                     f"({self.sent} of {self.size} bytes).")
+            self._next_report = \
+                (percent // PROGRESS_STEP_PERCENT + 1) * PROGRESS_STEP_PERCENT
+        return data
+
+
+def upload_file(url, file_path, headers, compress=None, endpoint=None):
+    """
+    POST a file streamed from disk.
+
+    If compressed, the file is gzipped chunk by chunk to a temporary file
+    next to it first, so the upload still has a known length.
+
+    :param str url: the URL to post to
+    :param str file_path: path of the file to upload
+    :param dict headers: request headers, Content-Encoding is added
+    :param bool compress: (optional) gzip the body, defaults to UPLOAD_GZIP
+    :param str endpoint: (optional) name of the request in the metrics of
+        `utils.http_client`
+    :return requests.Response: the response, which may have an error status
+    :raises requests.RequestException: if the connection fails or times out
+    """
+    compress = UPLOAD_GZIP if compress is None else compress
+    headers = dict(headers)
+    upload_path = file_path
+    try:
+        if compress:
+            fd, upload_path = tempfile.mkstemp(
+                dir=os.path.dirname(file_path), suffix='.gz')
+            with open(file_path, 'rb') as source, \
+                    os.fdopen(fd, 'wb') as target, \
+                    gzip.GzipFile(fileobj=target, mode='wb') as compressed:
+                shutil.copyfileobj(source, compressed, UPLOAD_CHUNK_SIZE)
+            headers['Content-Encoding'] = 'gzip'
+
+        with open(upload_path, 'rb') as file:
+            body = UploadBody(file, os.fstat(file.fileno()).st_size,
+                              os.path.basename(file_path))
+            log.info(f"Uploading {body.name} with {body.size} bytes "
+                     f"to {url}.")
+            return http_client.post(url, data=body, headers=headers,
+                                    endpoint=endpoint,
+                                    timeout=(UPLOAD_CONNECT_TIMEOUT,
+                                             UPLOAD_READ_TIMEOUT))
+    finally:
+        if upload_path != file_path:
+            os.remove(upload_path)
@@ -5,6 +5,7 @@ import shutil
 from abc import abstractmethod
 import traceback
 import json
+import threading
 
 import celery.signals
 from celery.task import Task
@@ -60,6 +61,66 @@ def merge_dicts(a, b, path=None):
     return a
 
 
+class _TaskState(threading.local):
+    """
+    State of the task run in the current thread.
+
+    Celery uses a single instance per task type and process, so the state
+    of a run must not be stored in instance attributes when a worker runs
+    several tasks in threads (the publish worker uses the threads pool).
+    """
+
+    params = {}
+    results = {}
+    work_path = None
+    job_id = None
+    parent_job_id = None
+    error = None
+    log_output = None
+
+
+class _TaskLogHandler(logging.Handler):
+    """
+    Write log records to the log of the task run in the current thread.
+
+    Records of other threads, e.g. of thread pools used by a task, go to the
+    log of the only task running, if there is only one.
+    """
+
+    def __init__(self, state):
+        super().__init__(logging.INFO)
+        self.state = state
+        self.outputs = set()
+        self.lock = threading.Lock()
+
+    def emit(self, record):
+        output = self.state.log_output
+        if output is None:
+            with self.lock:
+                if len(self.outputs) != 1:
+                    return
+                output = next(iter(self.outputs))
+        try:
+            output.write(self.format(record) + '\n')
+        except Exception:  # noqa: logging must not fail the task
+            self.handleError(record)
+
+    def start(self):
+        output = io.StringIO()
+        with self.lock:
+            self.outputs.add(output)
+        self.state.log_output = output
+
+    def stop(self):
+        with self.lock:
+            self.outputs.discard(self.state.log_output)
+
+
+def _state_property(name):
+    return property(lambda self: getattr(self._state, name),
+                    lambda self, value: setattr(self._state, name, value))
+
+
 class BaseTask(Task):
     """
     Abstract base class for all tasks in cilantro.
@@ -76,11 +137,17 @@ class BaseTask(Task):
 
     working_dir = os.environ['WORKING_DIR']
     staging_dir = os.environ['STAGING_DIR']
-    params = {}
-    results = {}
-    work_path = None
     log = logging.getLogger(__name__)
 
+    _state = _TaskState()
+    params = _state_property('params')
+    results = _state_property('results')
+    work_path = _state_property('work_path')
+    job_id = _state_property('job_id')
+    parent_job_id = _state_property('parent_job_id')
+    error = _state_property('error')
+    log_output = _state_property('log_output')
+
     _label = None
     _description = None
 
@@ -104,9 +171,7 @@ class BaseTask(Task):
     def description(self, value):
         self._description = value
 
-    log_output = io.StringIO()
-    handler = logging.StreamHandler(log_output)
-    handler.setLevel(logging.INFO)
+    handler = _TaskLogHandler(_state)
     logging.getLogger().addHandler(handler)
 
     def __init__(self):
@@ -118,7 +183,8 @@ class BaseTask(Task):
 
         job = self.job_db.get_job_by_id(job_id)
 
-        if job['job_type'] == 'cilantro_batch_chain':
+        if job['job_type'] == 'cilantro_batch_chain' \
+                and 'path' in job['parameters']:
             batch_directory = os.path.join(
                 self.staging_dir, 
                 job['user'], 
@@ -159,6 +225,7 @@ class BaseTask(Task):
         """
         self.job_db.update_job_state(self.job_id, status.lower())
         self.job_db.update_job_log(self.job_id, self.log_output.getvalue().strip().split('\n'))
+        self.handler.stop()
 
         if status == 'FAILURE':
             error_object = { 'job_id': self.job_id, 'job_name': self.name, 'message': self.error }
@@ -170,7 +237,9 @@ class BaseTask(Task):
 
             self.delete_temp_folders()
 
-        self.job_db.close()
+        # tasks running in threads share the connections of the job db
+        if threading.current_thread() is threading.main_thread():
+            self.job_db.close()
 
     def get_work_path(self):
         abs_path = os.path.join(self.working_dir, self.work_path)
@@ -201,8 +270,7 @@ class BaseTask(Task):
         :return dict: merged result of the task and previous tasks
         """
 
-        self.log_output.truncate(0)
-        self.log_output.seek(0)
+        self.handler.start()
 
         self.results = {}
         self._init_params(params)
@@ -327,7 +395,7 @@ class FileTask(BaseTask):
             target_rep
         )
         os.makedirs(target_dir, exist_ok=True)
-        self.process_file(file, target_dir)
+        return self.process_file(file, target_dir)
 
     @abstractmethod
     def process_file(self, file, target_dir):
@@ -339,7 +407,7 @@ class FileTask(BaseTask):
 
         :param str file: The path to the file that should be processed
         :param str target_dir: The path of the target directory
-        :return None:
+        :return dict: (optional) the task result
         """
         raise NotImplementedError("Process file method not implemented")
 
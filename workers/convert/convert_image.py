@@ -1,11 +1,19 @@
 import logging
 import os
-import subprocess
+import tempfile
 
 from PIL import Image as PilImage
 import ocrmypdf
 import pyocr
 
+from workers.convert.image_pyramid import build_pyramid_tiff
+from workers.convert.image_streaming import exceeds_memory_limit, \
+    stream_to_jpg, stream_to_deflate_tiff
+from workers.convert.image_to_pdf import wrap_image_as_pdf, \
+    UnsupportedImageError
+from workers.convert.page_analysis import PAGE_BLANK, PAGE_BITONAL, \
+    PAGE_GRAY, INK_THRESHOLD
+
 log = logging.getLogger(__name__)
 
 tools = pyocr.get_available_tools()
@@ -19,66 +27,86 @@ ocr_langs = ocr_tool.get_available_languages()
 log.debug("Available languages: %s" % ", ".join(ocr_langs))
 
 def convert_tif_to_ptif(source_file, output_dir):
-    """Transform the source TIFF file to PTIF via vips shell command."""
+    """
+    Transform the source TIFF file to a tiled pyramid TIFF (PTIF).
+
+    :param str source_file: path to the TIFF
+    :param str output_dir: directory the <name>.ptif is written to
+    :return dict: the number of levels and tiles written and the time taken
+    """
     new_filename = os.path.join(output_dir,
                                 os.path.splitext(os.path.basename(
                                     source_file))[0] + '.ptif')
+    return build_pyramid_tiff(source_file, new_filename)
 
-    shell_command = subprocess.run([
-        "vips",
-        "im_vips2tiff",
-        source_file,
-        f"{new_filename}:jpeg,tile:256x256,pyramid"
-    ])
-
-    if shell_command.returncode != 0:
-        log.error("PTIF conversion failed")
-        raise OSError(f"PTIF conversion failed")
 
-
-def convert_tif_to_jpg(source_file, target_file):
+def convert_tif_to_jpg(source_file, target_file, grayscale=False):
     """
     Save the parameter source file and saves it as the target file.
 
+    Images exceeding the memory limit are converted region by region.
+
     :param str source_file: path to the TIF source file
     :param str target_file: path to the generated output file
+    :param bool grayscale: save a grayscale instead of a colour JPEG
     """
     if source_file != target_file:
         logging.getLogger(__name__).debug(f"Converting {source_file} "
                                           f"to {target_file}")
+        if exceeds_memory_limit(source_file):
+            stream_to_jpg(source_file, target_file)
+            return
         image = PilImage.open(source_file)
 
-        rgb_im = image.convert('RGB')
+        rgb_im = image.convert('L' if grayscale else 'RGB')
         rgb_im.save(target_file)
         rgb_im.close()
         image.close()
 
 
-def convert_jpg_to_pdf(source_file, target_file, max_size=(900, 1200)):
+def convert_jpg_to_pdf(source_file, target_file, max_size=None):
     """
     Make a 1 Paged PDF Document from a jpg file.
 
+    Without max_size the JPEG data is embedded into the PDF as it is.
+
     :param str source_file: path to the jpg
     :param str target_file: desired output path
-    :param tuple max_size: the maximum size in pixels of the resulting pdf
+    :param tuple max_size: (optional) the maximum size in pixels of the
+        resulting pdf, the image is downscaled if given
     """
-    image = PilImage.open(source_file)
-    image.thumbnail(max_size)
-    image.save(target_file, 'PDF', resolution=100.0)
-    image.close()
+    _to_pdf_without_ocr(source_file, target_file, max_size)
 
 
-def tif_to_pdf(source_file, target_file, ocr_lang=None):
+def tif_to_pdf(source_file, target_file, ocr_lang=None, max_size=None,
+               page_class=None):
     """
     Make a 1 Paged PDF Document from a tif file.
 
+    If the page class determined by analyze_page is given, blank pages are
+    not OCR'd and bitonal and gray pages are embedded with 1 bit or 8 bit
+    gray values.
+
     :param str source_file: path to the jpg
     :param str target_file: desired output path
     :param ocr_lang: the language used for ocr
+    :param tuple max_size: (optional) the maximum size in pixels of the
+        resulting pdf if no ocr is done, the image is downscaled if given
+    :param str page_class: (optional) the class of the page
     """
+    if page_class == PAGE_BLANK:
+        ocr_lang = None
+    if page_class in (PAGE_BITONAL, PAGE_GRAY) \
+            and not exceeds_memory_limit(source_file):
+        with tempfile.TemporaryDirectory(
+                dir=os.path.dirname(os.path.abspath(target_file))) as tmp_dir:
+            reduced_file = os.path.join(tmp_dir, os.path.basename(source_file))
+            reduce_colors(source_file, reduced_file, page_class)
+            tif_to_pdf(reduced_file, target_file, ocr_lang, max_size)
+        return
 
     if ocr_lang == None:
-        _to_pdf_without_ocr(source_file, target_file)
+        _to_pdf_without_ocr(source_file, target_file, max_size)
     else:
         ocr_params = {
             "language": ocr_lang,
@@ -101,12 +129,29 @@ def tif_to_pdf(source_file, target_file, ocr_lang=None):
             os.remove(tmp_path)
         except ocrmypdf.exceptions.DpiError:
             log.error(f'Low dpi image #{source_file}, skipping PDF OCR.')
-            _to_pdf_without_ocr(source_file, target_file)
+            _to_pdf_without_ocr(source_file, target_file, max_size)
+
+def _to_pdf_without_ocr(source_file, target_file, scale=None):
+    if scale is None:
+        try:
+            wrap_image_as_pdf(source_file, target_file)
+            return
+        except UnsupportedImageError as e:
+            log.debug(f"Can not wrap {source_file} without decoding: {e}")
+
+    if exceeds_memory_limit(source_file):
+        with tempfile.TemporaryDirectory(
+                dir=os.path.dirname(os.path.abspath(target_file))) as tmp_dir:
+            tmp_file = os.path.join(tmp_dir, 'image.tif')
+            stream_to_deflate_tiff(source_file, tmp_file, scale,
+                                   None if scale is None else 100.0)
+            wrap_image_as_pdf(tmp_file, target_file)
+        return
 
-def _to_pdf_without_ocr(source_file, target_file, scale=(900, 1200)):
     try:
         image = PilImage.open(source_file)
-        image.thumbnail(scale)
+        if scale is not None:
+            image.thumbnail(scale)
         image.save(target_file, 'PDF', resolution=100.0)
         image.close()
 
@@ -117,6 +162,30 @@ def _to_pdf_without_ocr(source_file, target_file, scale=(900, 1200)):
         rgb_image.save(target_file, 'PDF', resolution=100.0)
         image.close()
 
+def reduce_colors(source_file, target_file, page_class):
+    """
+    Save a bitonal or gray page as 1 bit or 8 bit gray TIFF.
+
+    The TIFF is Deflate compressed and keeps the resolution of the source.
+
+    :param str source_file: path to the image of the page
+    :param str target_file: path of the generated TIFF
+    :param str page_class: 'bitonal' or 'gray'
+    """
+    with PilImage.open(source_file) as image:
+        dpi = image.info.get('dpi')
+        reduced = image.convert('L')
+    if page_class == PAGE_BITONAL:
+        reduced = reduced.point(
+            lambda value: 255 if value >= INK_THRESHOLD else 0, '1')
+
+    save_params = {'compression': 'tiff_adobe_deflate'}
+    if dpi:
+        save_params['dpi'] = dpi
+    reduced.save(target_file, **save_params)
+    reduced.close()
+
+
 def tif_to_txt(source_file, target_file, language='eng'):
     """
     Extract text from tiff file via OCR and writes to target file.
@@ -2,58 +2,352 @@ import logging
 import os
 import subprocess
 import glob
+import json
 import sys
+import math
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 from shutil import copyfile
 
 import pdftotext
 import PyPDF2
-from wand.image import Image as WandImage
+from PyPDF2.pdf import ContentStream
 
+from utils.page_index import get_page_index_path
+from workers.convert.convert_image import tif_to_txt
 
 
 log = logging.getLogger(__name__)
 
-
-def convert_pdf_to_tif(source_file, output_dir):
+# A page counts as having a usable text layer with at least this many
+# non-whitespace characters.
+TEXT_LAYER_MIN_CHARS = 20
+# Pages without usable text are only OCR'd if images cover at least this
+# fraction of the page.
+OCR_MIN_IMAGE_COVERAGE = 0.1
+OCR_RESOLUTION = 300
+
+PAGE_TAG_TEXT = 'text'
+PAGE_TAG_SCAN = 'scan'
+PAGE_TAG_EMPTY = 'empty'
+
+PDF_TO_TIF_RESOLUTION = int(os.environ.get('PDF_TO_TIF_RESOLUTION', 200))
+# one of none, packbits, jpeg, lzw, deflate (see pdftoppm -tiffcompression)
+PDF_TO_TIF_COMPRESSION = os.environ.get('PDF_TO_TIF_COMPRESSION', 'deflate')
+# pdftoppm and text extraction processes per task, the prefork pool already
+# runs one task per CPU, so a small bound avoids oversubscribing the CPUs
+PDF_TO_TIF_WORKERS = int(os.environ.get('PDF_TO_TIF_WORKERS', 2))
+PDF_TO_TXT_WORKERS = int(os.environ.get('PDF_TO_TXT_WORKERS', 2))
+
+
+def convert_pdf_to_tif(source_file, output_dir, resolution=None,
+                       compression=None, workers=None):
     """
     Create a TIF for every Page in the PDF and saves them to the output_dir.
 
+    Pages are rendered one at a time by pdftoppm processes that work on
+    page ranges concurrently, so only a few pages are held in memory.
+
     :param str source_file: path to the PDF
     :param str output_dir: path to the output Directory
+    :param int resolution: (optional) resolution in dpi, defaults to
+        PDF_TO_TIF_RESOLUTION
+    :param str compression: (optional) TIFF compression, defaults to
+        PDF_TO_TIF_COMPRESSION
+    :param int workers: (optional) number of concurrently rendered page
+        ranges, defaults to PDF_TO_TIF_WORKERS
     """
     log.debug(f"Creating tif files from {source_file} to {output_dir}")
-
-    with WandImage(filename=source_file, resolution=200) as img:
-        pages = len(img.sequence)
-        for i in range(pages):
-            with WandImage(img.sequence[i]) as page_img:
-                page_img.type = 'truecolor'
-                name = os.path.splitext(os.path.basename(source_file))[0]
-                page_img.save(filename=os.path.join(output_dir,
-                                                    f"{name}_{'%04i'% i}.tif"))
-
-
-def convert_pdf_to_txt(source_file, output_dir):
+    resolution = resolution or PDF_TO_TIF_RESOLUTION
+    compression = compression or PDF_TO_TIF_COMPRESSION
+    workers = workers or PDF_TO_TIF_WORKERS
+
+    name = os.path.splitext(os.path.basename(source_file))[0]
+    os.makedirs(output_dir, exist_ok=True)
+    page_ranges = _split_page_ranges(_get_page_count(source_file), workers)
+
+    with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+        def render(page_range):
+            _render_pages_to_tif(source_file, page_range, tmp_dir, resolution,
+                                 compression)
+            _move_rendered_pages(tmp_dir, output_dir, name, page_range)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # list() re-raises the first error of the rendering threads
+            list(executor.map(render, page_ranges))
+
+
+def _render_pages_to_tif(source_file, page_range, tmp_dir, resolution,
+                         compression):
+    first, last = page_range
+    process = subprocess.run([
+        "pdftoppm",
+        "-f", str(first),
+        "-l", str(last),
+        "-r", str(resolution),
+        "-tiff",
+        "-tiffcompression", compression,
+        source_file,
+        os.path.join(tmp_dir, f"range{first}")
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    if process.returncode != 0:
+        error = process.stderr.decode('utf-8', errors='replace').strip()
+        raise OSError(f"Rendering pages {first}-{last} of {source_file} "
+                      f"failed: {error}")
+
+
+def _move_rendered_pages(tmp_dir, output_dir, name, page_range):
+    # pdftoppm names the files <prefix>-<page number>.tif, where the page
+    # number is padded depending on the page count
+    first, _ = page_range
+    prefix = f"range{first}-"
+    for file_name in os.listdir(tmp_dir):
+        if not file_name.startswith(prefix):
+            continue
+        page = int(os.path.splitext(file_name)[0][len(prefix):])
+        os.replace(os.path.join(tmp_dir, file_name),
+                   os.path.join(output_dir, f"{name}_{'%04i' % (page - 1)}.tif"))
+
+
+def convert_pdf_to_txt(source_file, output_dir, ocr_lang=None,
+                       consolidate=False, workers=None):
     """
     Create text file for every page of source-PDF file.
 
+    The text is taken from the text layer of the PDF. If an OCR language is
+    given, pages without a usable text layer (see tag_pdf_pages) are
+    rendered and OCR'd instead. Page ranges are extracted concurrently.
+
+    If consolidate is set, a single text file <name>.txt is written instead
+    together with a page index <name>.pages.json that holds the start and
+    end character offsets of every page in the text file.
+
     :param str source_file: PDF to generate text files from
     :param str output_dir: target directory for generated files
+    :param str ocr_lang: (optional) language used for OCR of scanned pages
+    :param bool consolidate: write one text file and a page index
+    :param int workers: (optional) number of concurrently processed page
+        ranges, defaults to PDF_TO_TXT_WORKERS
+    :return dict: the page tags and the number of OCR'd and skipped pages
     """
     log.debug(f"Creating txt files from {source_file} to {output_dir}")
-    with open(source_file, "rb") as input_stream:
-        pdf = pdftotext.PDF(input_stream)
-        index = 0
-        # Needed as pdftotext is not a Python list with .index() capability.
-        for page in pdf:
-            if not os.path.exists(output_dir):
-                os.makedirs(output_dir)
-            name = os.path.splitext(os.path.basename(source_file))[0]
-            with open(os.path.join(output_dir, f'{name}_{"%04i"% index}.txt'),
-                      'wb') as output:
+    os.makedirs(output_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(source_file))[0]
+    workers = workers or PDF_TO_TXT_WORKERS
+
+    page_ranges = _split_page_ranges(_get_page_count(source_file), workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pages = [page
+                 for range_pages in executor.map(
+                     lambda page_range: _extract_text(source_file, page_range),
+                     page_ranges)
+                 for page in range_pages]
+
+        if ocr_lang is None:
+            tags = [PAGE_TAG_TEXT] * len(pages)
+        else:
+            tags = tag_pdf_pages(source_file, pages)
+
+        scan_indices = [index for index, tag in enumerate(tags)
+                        if tag == PAGE_TAG_SCAN]
+        ocr_texts = executor.map(
+            lambda index: _ocr_pdf_page(source_file, index, ocr_lang),
+            scan_indices)
+        for index, text in zip(scan_indices, ocr_texts):
+            pages[index] = text
+
+    if consolidate:
+        write_consolidated_text(pages, os.path.join(output_dir, f'{name}.txt'))
+    else:
+        for index, page in enumerate(pages):
+            target_file = os.path.join(output_dir, f'{name}_{"%04i"% index}.txt')
+            with open(target_file, 'wb') as output:
                 output.write(page.encode('utf-8'))
-            index += 1
+
+    ocr_pages = len(scan_indices)
+    if ocr_lang is not None:
+        log.info(f"{source_file}: OCR'd {ocr_pages} of {len(pages)} pages, "
+                 f"skipped OCR for {len(pages) - ocr_pages} pages with text "
+                 f"layer or without images.")
+    return {
+        'page_tags': tags,
+        'ocr_pages': ocr_pages,
+        'ocr_skipped_pages': len(pages) - ocr_pages
+    }
+
+
+def write_consolidated_text(pages, target_file):
+    """
+    Write the pages into a single text file and create its page index.
+
+    The index is written next to the text file, with the extension replaced
+    by utils.page_index.PAGE_INDEX_EXTENSION. It contains a list of
+    [start, end] character offsets, one entry per page.
+
+    :param list pages: the text of the pages
+    :param str target_file: path of the text file
+    """
+    offsets = []
+    start = 0
+    for page in pages:
+        offsets.append([start, start + len(page)])
+        start += len(page)
+
+    with open(target_file, 'w', encoding='utf-8', newline='') as output:
+        output.write(''.join(pages))
+    with open(get_page_index_path(target_file), 'w') as output:
+        json.dump({'pages': offsets}, output, separators=(',', ':'))
+
+
+def _get_page_count(source_file):
+    with open(source_file, 'rb') as input_stream:
+        return PyPDF2.PdfFileReader(input_stream, strict=False).getNumPages()
+
+
+def _split_page_ranges(pages, workers):
+    """Split the pages into ranges (1-based, inclusive) for the workers."""
+    # small ranges keep all workers busy until the end
+    range_size = max(1, math.ceil(pages / (workers * 4)))
+    return [(first, min(first + range_size - 1, pages))
+            for first in range(1, pages + 1, range_size)]
+
+
+def _extract_text(source_file, page_range):
+    """Extract the text layer of a page range with the pdftotext CLI."""
+    first, last = page_range
+    process = subprocess.run([
+        "pdftotext",
+        "-layout",
+        "-enc", "UTF-8",
+        "-f", str(first),
+        "-l", str(last),
+        source_file,
+        "-"
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    if process.returncode != 0:
+        error = process.stderr.decode('utf-8', errors='replace').strip()
+        raise OSError(f"Extracting text of pages {first}-{last} of "
+                      f"{source_file} failed: {error}")
+
+    # every page is terminated by a form feed
+    pages = process.stdout.decode('utf-8').split('\f')
+    count = last - first + 1
+    return (pages + [''] * count)[:count]
+
+
+def tag_pdf_pages(source_file, page_texts=None):
+    """
+    Tag every page of a PDF by the usability of its text layer.
+
+    Pages with at least TEXT_LAYER_MIN_CHARS characters of text are tagged
+    'text'. Pages with less text are tagged 'scan' if images cover at least
+    OCR_MIN_IMAGE_COVERAGE of the page and 'empty' otherwise. Nothing is
+    rendered, the image coverage is computed from the page content streams.
+
+    :param str source_file: path to the PDF
+    :param list page_texts: (optional) the text of the pages as extracted
+        by pdftotext, extracted from the file if not given
+    :return list: one tag per page
+    """
+    if page_texts is None:
+        with open(source_file, "rb") as input_stream:
+            page_texts = list(pdftotext.PDF(input_stream))
+
+    tags = []
+    with open(source_file, "rb") as input_stream:
+        pdf = PyPDF2.PdfFileReader(input_stream)
+        for index, text in enumerate(page_texts):
+            if len("".join(text.split())) >= TEXT_LAYER_MIN_CHARS:
+                tags.append(PAGE_TAG_TEXT)
+                continue
+            try:
+                coverage = image_coverage(pdf.getPage(index))
+            except Exception as e:  # noqa: broken content streams are common
+                log.warning(f"Could not determine image coverage of page "
+                            f"{index} in {source_file}: {e}")
+                coverage = 1.0
+            if coverage >= OCR_MIN_IMAGE_COVERAGE:
+                tags.append(PAGE_TAG_SCAN)
+            else:
+                tags.append(PAGE_TAG_EMPTY)
+    return tags
+
+
+def image_coverage(page):
+    """
+    Return the fraction of the page area covered by images.
+
+    Overlapping images are counted multiple times, the result is capped at 1.
+
+    :param PyPDF2.pdf.PageObject page: the page
+    :return float:
+    """
+    box = page.mediaBox
+    page_area = abs(float(box.getWidth()) * float(box.getHeight()))
+    if page_area == 0:
+        return 0.0
+    area = _image_area(page.getContents(), page.get('/Resources'), page.pdf,
+                       (1, 0, 0, 1, 0, 0), 0)
+    return min(area / page_area, 1.0)
+
+
+def _image_area(contents, resources, pdf, ctm, depth):
+    if contents is None or resources is None or depth > 3:
+        return 0.0
+    resources = resources.getObject()
+    x_objects = resources.get('/XObject', {})
+    area = 0.0
+    stack = []
+    for operands, operator in ContentStream(contents, pdf).operations:
+        if operator == b'q':
+            stack.append(ctm)
+        elif operator == b'Q' and stack:
+            ctm = stack.pop()
+        elif operator == b'cm':
+            ctm = _multiply([float(operand) for operand in operands], ctm)
+        elif operator == b'Do' and operands[0] in x_objects:
+            x_object = x_objects[operands[0]].getObject()
+            if x_object.get('/Subtype') == '/Image':
+                a, b, c, d, _, _ = ctm
+                area += abs(a * d - b * c)
+            elif x_object.get('/Subtype') == '/Form':
+                matrix = [float(value) for value in
+                          x_object.get('/Matrix', [1, 0, 0, 1, 0, 0])]
+                area += _image_area(x_object, x_object.get('/Resources'), pdf,
+                                    _multiply(matrix, ctm), depth + 1)
+    return area
+
+
+def _multiply(m, n):
+    """Multiply two PDF transformation matrices given as 6-tuples."""
+    return (m[0] * n[0] + m[1] * n[2],
+            m[0] * n[1] + m[1] * n[3],
+            m[2] * n[0] + m[3] * n[2],
+            m[2] * n[1] + m[3] * n[3],
+            m[4] * n[0] + m[5] * n[2] + n[4],
+            m[4] * n[1] + m[5] * n[3] + n[5])
+
+
+def _ocr_pdf_page(source_file, index, ocr_lang):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        image_file = os.path.join(tmp_dir, 'page.png')
+        text_file = os.path.join(tmp_dir, 'page.txt')
+        subprocess.check_output([
+            "mutool",
+            "draw",
+            "-r",
+            str(OCR_RESOLUTION),
+            "-o",
+            image_file,
+            source_file,
+            str(index + 1)
+        ])
+        tif_to_txt(image_file, text_file, ocr_lang)
+        with open(text_file, encoding='utf-8') as text:
+            return text.read()
 
 
 def set_pdf_metadata(obj, metadata):
@@ -112,6 +406,40 @@ def merge_pdf(files, path: str, filename='merged.pdf', remove_old=True, downscal
                 os.remove(file_path)
 
 
+def extract_pdf_pages(source_file, target_file, page_numbers):
+    """
+    Create a PDF file from a selection of pages of another PDF.
+
+    :param str source_file: path to the source PDF
+    :param str target_file: path of the generated PDF
+    :param list page_numbers: the page numbers (starting at 1) to be copied,
+        in the order given
+    """
+    os.makedirs(os.path.dirname(target_file), exist_ok=True)
+
+    log.info(f"Extracting {len(page_numbers)} pages from {source_file}.")
+    subprocess.check_output([
+        "mutool",
+        "merge",
+        "-o",
+        target_file,
+        source_file,
+        _to_page_ranges(page_numbers)
+    ])
+
+
+def _to_page_ranges(page_numbers):
+    """Compress page numbers to a mutool page range, e.g. [1,2,3,5] -> '1-3,5'."""
+    ranges = []
+    for number in page_numbers:
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ",".join(str(start) if start == end else f"{start}-{end}"
+                    for start, end in ranges)
+
+
 def split_merge_pdf(files, path: str, filename='merged.pdf', remove_old=True):
     """
     Create a PDF file by combining sections of other PDFs.
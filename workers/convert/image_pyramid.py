@@ -0,0 +1,67 @@
+import logging
+import math
+import time
+
+import pyvips
+
+from workers.convert.image_streaming import to_8bit_without_alpha
+
+log = logging.getLogger(__name__)
+
+TILE_SIZE = 256
+JPEG_QUALITY = 75
+
+
+def build_pyramid_tiff(source_file, target_file, tile_size=TILE_SIZE,
+                       quality=JPEG_QUALITY):
+    """
+    Write a tiled pyramid TIFF with JPEG compressed tiles via libvips.
+
+    The source is read sequentially and all pyramid levels are written in a
+    single pass, so only a few rows of tiles are held in memory. The number
+    of threads libvips uses can be set per worker with the environment
+    variable VIPS_CONCURRENCY.
+
+    :param str source_file: path to the source image
+    :param str target_file: path of the generated pyramid TIFF
+    :param int tile_size: width and height of the tiles in pixels
+    :param int quality: JPEG quality of the tiles
+    :return dict: the number of levels and tiles written and the time taken
+    :raises OSError: if libvips fails, with the libvips error message
+    """
+    start = time.monotonic()
+    try:
+        image = pyvips.Image.new_from_file(source_file, access='sequential')
+        image = to_8bit_without_alpha(image)
+        image.tiffsave(target_file, compression='jpeg', Q=quality, tile=True,
+                       tile_width=tile_size, tile_height=tile_size,
+                       pyramid=True)
+    except pyvips.Error as e:
+        raise OSError(f"PTIF conversion of {source_file} failed: "
+                      f"{' '.join(str(e).split())}") from e
+
+    levels, tiles = count_pyramid_tiles(image.width, image.height, tile_size)
+    seconds = round(time.monotonic() - start, 3)
+    log.info(f"Wrote {tiles} tiles in {levels} levels to {target_file} "
+             f"in {seconds}s.")
+    return {'levels': levels, 'tiles': tiles, 'seconds': seconds}
+
+
+def count_pyramid_tiles(width, height, tile_size=TILE_SIZE):
+    """
+    Return the number of levels and tiles of a pyramid TIFF.
+
+    Levels are halved in size until the image fits into a single tile.
+
+    :return tuple: (levels, tiles)
+    """
+    levels = 0
+    tiles = 0
+    while True:
+        levels += 1
+        tiles += math.ceil(width / tile_size) * math.ceil(height / tile_size)
+        if width <= tile_size and height <= tile_size:
+            return levels, tiles
+        width = max(1, width // 2)
+        height = max(1, height // 2)
+
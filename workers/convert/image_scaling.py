@@ -3,6 +3,15 @@ import os
 
 from PIL import Image as PilImage
 
+from workers.convert.image_streaming import exceeds_memory_limit, \
+    stream_thumbnail
+
+# images are first reduced by integer factors down to this multiple of the
+# requested size, the remaining resize is done with a proper filter
+REDUCING_GAP = 2.0
+# TIFF tag marking reduced-resolution versions of another image
+NEW_SUBFILE_TYPE = 254
+
 
 def scale_image(source, target_path, max_width, max_height, keep_ratio=True):
     """
@@ -15,6 +24,10 @@ def scale_image(source, target_path, max_width, max_height, keep_ratio=True):
 
     Tested, working for JPEG and TIFF.
 
+    The image is decoded at a reduced resolution where possible, see
+    open_reduced. Images exceeding the memory limit are scaled by libvips
+    without being decoded completely.
+
     :param str source: path to the image to be scaled, with filename
     :param str target_path: path without filename to save generated image to
     :param int max_width: maximum width in pixels of the generated image
@@ -25,15 +38,62 @@ def scale_image(source, target_path, max_width, max_height, keep_ratio=True):
                                       f"to size: {(max_width, max_height)} "
                                       f"target path: {target_path}")
 
-    # conversion is needed for tiffs
-    image = PilImage.open(source).convert('RGB')
+    file_name = os.path.splitext(os.path.basename(source))[0]
+    file_extension = os.path.splitext(os.path.basename(source))[1]
+    target_file = os.path.join(target_path, file_name + file_extension)
+
+    if exceeds_memory_limit(source):
+        stream_thumbnail(source, target_file, max_width, max_height,
+                         keep_ratio)
+        return
+
+    image = open_reduced(source, (max_width, max_height))
+    if image.mode not in ('RGB', 'L'):
+        # e.g. bilevel or 16 bit tiffs can't be scaled smoothly
+        image = image.convert('RGB')
 
     if keep_ratio:
-        image.thumbnail((max_width, max_height))
+        image.thumbnail((max_width, max_height), reducing_gap=REDUCING_GAP)
     else:
-        image = image.resize((max_width, max_height))
+        image = image.resize((max_width, max_height),
+                             reducing_gap=REDUCING_GAP)
 
-    file_name = os.path.splitext(os.path.basename(source))[0]
-    file_extension = os.path.splitext(os.path.basename(source))[1]
-    image.save(os.path.join(target_path, file_name + file_extension))
+    image = image.convert('RGB')
+    image.save(target_file)
     image.close()
+
+
+def open_reduced(source, size):
+    """
+    Open an image at the smallest stored resolution covering the given size.
+
+    JPEGs are decoded with DCT scaling (at 1/2, 1/4 or 1/8 of their size),
+    for TIFFs the smallest reduced-resolution subfile (e.g. a pyramid level)
+    that is at least as large as the given size is selected. Other images
+    are opened as they are. Nothing is decoded yet.
+
+    :param str source: path to the image
+    :param tuple size: the minimal (width, height) needed
+    :return PIL.Image.Image: the opened image
+    """
+    image = PilImage.open(source)
+    if image.format == 'JPEG':
+        image.draft(image.mode, (size[0] * REDUCING_GAP,
+                                 size[1] * REDUCING_GAP))
+    elif image.format == 'TIFF':
+        _seek_reduced_subfile(image, size)
+    return image
+
+
+def _seek_reduced_subfile(image, size):
+    width, height = image.size
+    best_frame = 0
+    for frame in range(1, getattr(image, 'n_frames', 1)):
+        image.seek(frame)
+        is_reduced = image.tag_v2.get(NEW_SUBFILE_TYPE, 0) & 1
+        frame_width, frame_height = image.size
+        if is_reduced and frame_width >= size[0] and frame_height >= size[1] \
+                and frame_width * frame_height < width * height:
+            best_frame = frame
+            width, height = frame_width, frame_height
+    image.seek(best_frame)
@@ -0,0 +1,145 @@
+import logging
+import os
+from contextlib import contextmanager
+
+from PIL import Image as PilImage
+import pyvips
+
+log = logging.getLogger(__name__)
+
+# Estimated memory a task may use to hold a decoded image. Larger images are
+# processed region by region by libvips instead of being loaded by Pillow.
+IMAGE_MEMORY_LIMIT = int(os.environ.get('IMAGE_MEMORY_LIMIT_MB', 1024)) \
+    * 1024 * 1024
+
+_BYTES_PER_BAND = {'1': 1 / 8, 'I': 4, 'F': 4, 'I;16': 2, 'I;16B': 2,
+                   'I;16L': 2, 'I;16N': 2}
+
+pyvips.cache_set_max_mem(IMAGE_MEMORY_LIMIT // 4)
+
+
+def estimate_memory(image):
+    """
+    Estimate the memory needed to decode an image and convert it to RGB.
+
+    Only the image header is read.
+
+    :param PIL.Image.Image image: the opened image
+    :return int: the estimated number of bytes
+    """
+    width, height = image.size
+    decoded = width * height * len(image.getbands()) \
+        * _BYTES_PER_BAND.get(image.mode, 1)
+    if image.mode != 'RGB':
+        decoded += width * height * 3
+    return int(decoded)
+
+
+def exceeds_memory_limit(source_file, memory_limit=None):
+    """
+    Check if decoding the image would exceed the memory limit.
+
+    :param str source_file: path to the image
+    :param int memory_limit: (optional) limit in bytes, defaults to
+        IMAGE_MEMORY_LIMIT
+    :return bool:
+    """
+    try:
+        with PilImage.open(source_file) as image:
+            return estimate_memory(image) > (memory_limit or IMAGE_MEMORY_LIMIT)
+    except PilImage.DecompressionBombError:
+        return True
+
+
+def to_8bit_without_alpha(image):
+    """Convert a libvips image to 8 bit without alpha, e.g. for JPEG."""
+    if image.hasalpha():
+        image = image.flatten(background=255)
+    if image.interpretation == 'rgb16':
+        image = image.colourspace('srgb')
+    elif image.interpretation == 'grey16':
+        image = image.colourspace('b-w')
+    return image
+
+
+def stream_to_jpg(source_file, target_file):
+    """
+    Save an image as JPEG, reading and writing it region by region.
+
+    :param str source_file: path to the source image
+    :param str target_file: path of the generated JPEG
+    :raises OSError: if libvips fails, with the libvips error message
+    """
+    log.info(f"Streaming {source_file} to {target_file}.")
+    with _vips_errors(source_file):
+        image = pyvips.Image.new_from_file(source_file, access='sequential')
+        image = to_8bit_without_alpha(image)
+        if image.interpretation not in ('srgb', 'b-w'):
+            image = image.colourspace('srgb')
+        image.jpegsave(target_file)
+
+
+def stream_thumbnail(source_file, target_file, max_width, max_height,
+                     keep_ratio=True):
+    """
+    Scale an image without decoding it completely.
+
+    libvips decodes the image at a reduced size where the format allows it
+    and otherwise shrinks it while streaming. The output format is taken
+    from the extension of target_file.
+
+    :param str source_file: path to the source image
+    :param str target_file: path of the generated image
+    :param int max_width: maximum width in pixels of the generated image
+    :param int max_height: maximum height in pixels of the generated image
+    :param bool keep_ratio: keeps the ratio of the generated image
+    :raises OSError: if libvips fails, with the libvips error message
+    """
+    log.info(f"Streaming thumbnail of {source_file} to {target_file}.")
+    with _vips_errors(source_file):
+        image = pyvips.Image.thumbnail(source_file, max_width,
+                                       height=max_height,
+                                       size='both' if keep_ratio else 'force')
+        to_8bit_without_alpha(image).colourspace('srgb').write_to_file(
+            target_file)
+
+
+def stream_to_deflate_tiff(source_file, target_file, max_size=None,
+                           resolution=None):
+    """
+    Save an image as Deflate compressed TIFF, region by region.
+
+    The result can be embedded into a PDF with wrap_image_as_pdf without
+    holding the decoded image in memory.
+
+    :param str source_file: path to the source image
+    :param str target_file: path of the generated TIFF
+    :param tuple max_size: (optional) the maximum size in pixels, the image
+        is downscaled if given
+    :param float resolution: (optional) resolution in dpi to store
+    :raises OSError: if libvips fails, with the libvips error message
+    """
+    log.info(f"Streaming {source_file} to {target_file}.")
+    with _vips_errors(source_file):
+        if max_size is None:
+            image = pyvips.Image.new_from_file(source_file,
+                                               access='sequential')
+        else:
+            image = pyvips.Image.thumbnail(source_file, max_size[0],
+                                           height=max_size[1])
+        image = to_8bit_without_alpha(image)
+        if image.interpretation not in ('srgb', 'b-w', 'cmyk'):
+            image = image.colourspace('srgb')
+        if resolution is not None:
+            image = image.copy(xres=resolution / 25.4, yres=resolution / 25.4)
+        image.tiffsave(target_file, compression='deflate')
+
+
+@contextmanager
+def _vips_errors(source_file):
+    """Raise libvips errors as OSError with the libvips error message."""
+    try:
+        yield
+    except pyvips.Error as e:
+        raise OSError(f"Processing {source_file} failed: "
+                      f"{' '.join(str(e).split())}") from e
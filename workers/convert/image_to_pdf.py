@@ -0,0 +1,254 @@
+import logging
+import zlib
+
+from PIL import Image as PilImage
+
+log = logging.getLogger(__name__)
+
+DEFAULT_RESOLUTION = 100.0
+
+# TIFF tag ids used to locate and describe the raw image data
+_COMPRESSION = 259
+_PHOTOMETRIC = 262
+_FILL_ORDER = 266
+_STRIP_OFFSETS = 273
+_ORIENTATION = 274
+_SAMPLES_PER_PIXEL = 277
+_STRIP_BYTE_COUNTS = 279
+_PLANAR_CONFIG = 284
+_PREDICTOR = 317
+_EXTRA_SAMPLES = 338
+_BITS_PER_SAMPLE = 258
+
+_TIFF_UNCOMPRESSED = 1
+_TIFF_CCITT_G4 = 4
+_TIFF_DEFLATE = (8, 32946)
+
+_COLOR_SPACES = {
+    (0, 1): '/DeviceGray',
+    (1, 1): '/DeviceGray',
+    (2, 3): '/DeviceRGB',
+    (5, 4): '/DeviceCMYK'
+}
+
+
+class UnsupportedImageError(ValueError):
+    """
+    Raised if an image can not be embedded into a PDF without decoding it.
+
+    Callers are expected to fall back to a conversion that decodes the image.
+    """
+    pass
+
+
+def wrap_image_as_pdf(source_file, target_file):
+    """
+    Make a 1 paged PDF document that embeds the image data as it is.
+
+    The compressed image data is copied into the PDF without being decoded,
+    so the conversion is lossless and mostly bound by I/O. Supported are
+    JPEG files (DCTDecode), single strip CCITT Group 4 TIFFs (CCITTFaxDecode)
+    and uncompressed or Deflate compressed TIFFs (FlateDecode).
+
+    The page size is derived from the resolution stored in the image.
+
+    :param str source_file: path to the JPEG or TIFF file
+    :param str target_file: desired output path
+    :raises UnsupportedImageError: if the image can not be embedded as is
+    """
+    with PilImage.open(source_file) as image:
+        if image.format == 'JPEG':
+            image_dict, data = _jpeg_image_data(image, source_file)
+        elif image.format == 'TIFF':
+            image_dict, data = _tiff_image_data(image, source_file)
+        else:
+            raise UnsupportedImageError(
+                f"Unsupported image format {image.format}")
+        width, height = image.size
+        x_dpi, y_dpi = _get_resolution(image)
+
+    page_size = (width * 72.0 / x_dpi, height * 72.0 / y_dpi)
+    _write_single_image_pdf(target_file, image_dict, data, (width, height),
+                            page_size)
+    log.debug(f"Wrapped {source_file} into {target_file} without decoding.")
+
+
+def _get_resolution(image):
+    dpi = image.info.get('dpi')
+    if not dpi or min(dpi) < 10:
+        return DEFAULT_RESOLUTION, DEFAULT_RESOLUTION
+    return float(dpi[0]), float(dpi[1])
+
+
+def _jpeg_image_data(image, source_file):
+    color_spaces = {'L': '/DeviceGray', 'RGB': '/DeviceRGB',
+                    'CMYK': '/DeviceCMYK'}
+    if image.mode not in color_spaces:
+        raise UnsupportedImageError(f"Unsupported JPEG mode {image.mode}")
+
+    image_dict = {
+        '/ColorSpace': color_spaces[image.mode],
+        '/BitsPerComponent': 8,
+        '/Filter': '/DCTDecode'
+    }
+    if image.mode == 'CMYK' and 'adobe' in image.info:
+        # Adobe CMYK JPEGs are stored with inverted components
+        image_dict['/Decode'] = '[1 0 1 0 1 0 1 0]'
+
+    with open(source_file, 'rb') as stream:
+        return image_dict, stream.read()
+
+
+def _tiff_image_data(image, source_file):
+    tags = image.tag_v2
+    if getattr(image, 'n_frames', 1) > 1:
+        raise UnsupportedImageError("Multi page TIFFs are not supported")
+    if tags.get(_ORIENTATION, 1) != 1 or tags.get(_FILL_ORDER, 1) != 1 \
+            or tags.get(_PLANAR_CONFIG, 1) != 1 or _EXTRA_SAMPLES in tags:
+        raise UnsupportedImageError("Unsupported TIFF data layout")
+
+    compression = tags.get(_COMPRESSION, _TIFF_UNCOMPRESSED)
+    photometric = tags.get(_PHOTOMETRIC)
+    samples = tags.get(_SAMPLES_PER_PIXEL, 1)
+    bits = _as_tuple(tags.get(_BITS_PER_SAMPLE, 1))[0]
+    width, height = image.size
+
+    if (photometric, samples) not in _COLOR_SPACES:
+        raise UnsupportedImageError(
+            f"Unsupported photometric interpretation {photometric}")
+
+    strips = _get_strips(tags)
+
+    if compression == _TIFF_CCITT_G4:
+        if len(strips) != 1:
+            raise UnsupportedImageError("Multi strip CCITT G4 is not supported")
+        black_is_1 = 'false' if photometric == 0 else 'true'
+        image_dict = {
+            '/ColorSpace': '/DeviceGray',
+            '/BitsPerComponent': 1,
+            '/Filter': '/CCITTFaxDecode',
+            '/DecodeParms': f'<< /K -1 /Columns {width} /Rows {height} '
+                            f'/BlackIs1 {black_is_1} >>'
+        }
+        return image_dict, _read_strip(source_file, strips[0])
+
+    if bits not in (1, 8):
+        raise UnsupportedImageError(f"Unsupported bit depth {bits}")
+
+    image_dict = {
+        '/ColorSpace': _COLOR_SPACES[(photometric, samples)],
+        '/BitsPerComponent': bits,
+        '/Filter': '/FlateDecode'
+    }
+    if photometric == 0:
+        image_dict['/Decode'] = '[1 0]'
+
+    predictor = tags.get(_PREDICTOR, 1)
+    if predictor == 2:
+        if bits != 8:
+            raise UnsupportedImageError("Unsupported predictor")
+        image_dict['/DecodeParms'] = f'<< /Predictor 2 /Colors {samples} ' \
+                                     f'/BitsPerComponent {bits} ' \
+                                     f'/Columns {width} >>'
+    elif predictor != 1:
+        raise UnsupportedImageError(f"Unsupported predictor {predictor}")
+
+    # strips are processed one at a time, so the decoded image is never
+    # held in memory completely
+    if compression in _TIFF_DEFLATE:
+        if len(strips) == 1:
+            return image_dict, _read_strip(source_file, strips[0])
+        chunks = (zlib.decompress(strip)
+                  for strip in _iter_strips(source_file, strips))
+    elif compression == _TIFF_UNCOMPRESSED:
+        chunks = _iter_strips(source_file, strips)
+    else:
+        raise UnsupportedImageError(
+            f"Unsupported TIFF compression {compression}")
+
+    return image_dict, _deflate(chunks)
+
+
+def _as_tuple(value):
+    if isinstance(value, tuple):
+        return value
+    return (value,)
+
+
+def _get_strips(tags):
+    """Return the (offset, byte count) of every strip of a TIFF."""
+    if _STRIP_OFFSETS not in tags or _STRIP_BYTE_COUNTS not in tags:
+        raise UnsupportedImageError("Tiled TIFFs are not supported")
+
+    return list(zip(_as_tuple(tags[_STRIP_OFFSETS]),
+                    _as_tuple(tags[_STRIP_BYTE_COUNTS])))
+
+
+def _read_strip(source_file, strip):
+    offset, byte_count = strip
+    with open(source_file, 'rb') as stream:
+        stream.seek(offset)
+        return stream.read(byte_count)
+
+
+def _iter_strips(source_file, strips):
+    with open(source_file, 'rb') as stream:
+        for offset, byte_count in strips:
+            stream.seek(offset)
+            yield stream.read(byte_count)
+
+
+def _deflate(chunks):
+    compressor = zlib.compressobj()
+    data = [compressor.compress(chunk) for chunk in chunks]
+    data.append(compressor.flush())
+    return b''.join(data)
+
+
+def _write_single_image_pdf(target_file, image_dict, data, image_size,
+                            page_size):
+    """Write a minimal PDF with a single page showing the given image."""
+    page_width, page_height = page_size
+    content = f"q {page_width:.4f} 0 0 {page_height:.4f} 0 0 cm /Im0 Do Q" \
+        .encode('ascii')
+
+    image_entries = ' '.join(f"{key} {value}"
+                             for key, value in image_dict.items())
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        f"<< /Type /Page /Parent 2 0 R "
+        f"/MediaBox [0 0 {page_width:.4f} {page_height:.4f}] "
+        f"/Resources << /XObject << /Im0 4 0 R >> >> "
+        f"/Contents 5 0 R >>".encode('ascii'),
+        (f"<< /Type /XObject /Subtype /Image "
+         f"/Width {image_size[0]} /Height {image_size[1]} "
+         f"{image_entries} /Length {len(data)} >>".encode('ascii'), data),
+        (f"<< /Length {len(content)} >>".encode('ascii'), content)
+    ]
+
+    offsets = []
+    with open(target_file, 'wb') as out:
+        out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        for number, pdf_object in enumerate(objects, 1):
+            offsets.append(out.tell())
+            out.write(f"{number} 0 obj\n".encode('ascii'))
+            if isinstance(pdf_object, tuple):
+                dictionary, stream = pdf_object
+                out.write(dictionary)
+                out.write(b"\nstream\n")
+                out.write(stream)
+                out.write(b"\nendstream")
+            else:
+                out.write(pdf_object)
+            out.write(b"\nendobj\n")
+
+        xref_offset = out.tell()
+        out.write(f"xref\n0 {len(objects) + 1}\n".encode('ascii'))
+        out.write(b"0000000000 65535 f \n")
+        for offset in offsets:
+            out.write(f"{offset:010d} 00000 n \n".encode('ascii'))
+        out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+                  f"startxref\n{xref_offset}\n%%EOF\n".encode('ascii'))
+
@@ -0,0 +1,101 @@
+import logging
+import os
+import tempfile
+import time
+
+from PIL import Image as PilImage
+import pyvips
+
+log = logging.getLogger(__name__)
+
+# lossless compression of archived master TIFFs: deflate, lzw or zstd (zstd
+# needs libvips 8.10 or later)
+MASTER_TIFF_COMPRESSION = os.environ.get('MASTER_TIFF_COMPRESSION', 'deflate')
+MASTER_TILE_SIZE = 256
+
+_UNCOMPRESSED = ('raw', None)
+
+
+class PixelMismatchError(OSError):
+    pass
+
+
+def compress_master(source_file, compression=None, tile_size=MASTER_TILE_SIZE):
+    """
+    Rewrite an uncompressed TIFF with lossless compression and tiling.
+
+    The pixels of the result are compared with the source and the source is
+    only replaced if they are identical and the result is smaller. The file
+    is replaced, not rewritten, so hardlinks to the source keep the old
+    content.
+
+    Already compressed, bilevel and multi page TIFFs are skipped.
+
+    :param str source_file: path to the TIFF
+    :param str compression: (optional) deflate, lzw or zstd, defaults to
+        MASTER_TIFF_COMPRESSION
+    :param int tile_size: width and height of the tiles in pixels
+    :return dict: size 'before' and 'after', the 'ratio' and the 'seconds'
+        taken, None if the file was skipped
+    :raises PixelMismatchError: if the pixels of the result differ
+    :raises OSError: if libvips fails, with the libvips error message
+    """
+    compression = compression or MASTER_TIFF_COMPRESSION
+    with PilImage.open(source_file) as image:
+        if image.info.get('compression') not in _UNCOMPRESSED \
+                or image.mode == '1' or getattr(image, 'n_frames', 1) > 1:
+            return None
+
+    start = time.monotonic()
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(source_file),
+                                    suffix='.tif')
+    os.close(fd)
+    try:
+        try:
+            image = pyvips.Image.new_from_file(source_file,
+                                               access='sequential')
+            image.tiffsave(tmp_path, compression=compression,
+                           predictor='horizontal', tile=True,
+                           tile_width=tile_size, tile_height=tile_size)
+        except pyvips.Error as e:
+            raise OSError(f"Compressing {source_file} failed: "
+                          f"{' '.join(str(e).split())}") from e
+
+        if not pixels_identical(source_file, tmp_path):
+            raise PixelMismatchError(
+                f"Compressed {source_file} differs from the original.")
+
+        before = os.path.getsize(source_file)
+        after = os.path.getsize(tmp_path)
+        if after >= before:
+            log.info(f"Compression does not reduce {source_file}, keeping it.")
+            return None
+        os.replace(tmp_path, source_file)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    seconds = round(time.monotonic() - start, 3)
+    log.info(f"Compressed {source_file} from {before} to {after} bytes "
+             f"in {seconds}s.")
+    return {'before': before, 'after': after,
+            'ratio': round(before / after, 2), 'seconds': seconds}
+
+
+def pixels_identical(file_a, file_b):
+    """
+    Check if two images have identical pixels, reading them region by region.
+
+    :return bool:
+    """
+    try:
+        image_a = pyvips.Image.new_from_file(file_a, access='sequential')
+        image_b = pyvips.Image.new_from_file(file_b, access='sequential')
+        if (image_a.width, image_a.height, image_a.bands, image_a.format) \
+                != (image_b.width, image_b.height, image_b.bands,
+                    image_b.format):
+            return False
+        return (image_a != image_b).bandor().max() == 0
+    except pyvips.Error as e:
+        raise OSError(f"Comparing {file_a} and {file_b} failed: "
+                      f"{' '.join(str(e).split())}") from e
@@ -0,0 +1,106 @@
+import logging
+import os
+
+import numpy as np
+
+from workers.convert.image_scaling import open_reduced, REDUCING_GAP
+
+log = logging.getLogger(__name__)
+
+PAGE_BLANK = 'blank'
+PAGE_BITONAL = 'bitonal'
+PAGE_GRAY = 'gray'
+PAGE_COLOR = 'color'
+
+# pages are analyzed downsampled to fit into this size
+ANALYSIS_SIZE = 1024
+# margin (fraction of width and height) ignored to skip scanner borders
+BORDER = 0.03
+# gray values below count as ink, at or above as paper
+INK_THRESHOLD = 128
+PAPER_THRESHOLD = 192
+# pages with less content (non paper pixels) than this fraction are blank
+BLANK_MAX_CONTENT = 0.002
+# minimal colourfulness (Hasler and Suesstrunk) of colour pages, the slight
+# tint of paper stays below
+COLOR_MIN_COLORFULNESS = 20.0
+# Mid tones on bitonal pages only come from the edges of the ink, which are
+# blurred by downsampling. Pages are bitonal if the share of mid tones in
+# flat areas (gradient below FLAT_GRADIENT) of their content is below.
+MIDTONE_RANGE = (48, PAPER_THRESHOLD)
+FLAT_GRADIENT = 16.0
+BITONAL_MAX_FLAT_MIDTONES = 0.05
+HISTOGRAM_BINS = 16
+
+# pages analyzed concurrently per task, the prefork pool already runs one
+# task per CPU, so a small bound avoids oversubscribing the CPUs
+PAGE_ANALYSIS_WORKERS = int(os.environ.get('PAGE_ANALYSIS_WORKERS', 2))
+
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def analyze_page(source_file):
+    """
+    Compute cheap statistics of a scanned page and classify it.
+
+    The page is decoded at a reduced resolution. Returned are
+    - class: 'blank', 'bitonal', 'gray' or 'color'
+    - ink_coverage: fraction of the page covered by dark pixels
+    - content: fraction of the page that is not paper
+    - colorfulness: colourfulness metric after Hasler and Suesstrunk
+    - histogram: normalized gray value histogram with HISTOGRAM_BINS bins
+
+    :param str source_file: path to the image of the page
+    :return dict: the statistics
+    """
+    image = open_reduced(source_file, (ANALYSIS_SIZE, ANALYSIS_SIZE))
+    is_bilevel = image.mode == '1'
+    image.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE), reducing_gap=REDUCING_GAP)
+    rgb = np.asarray(image.convert('RGB'), dtype=np.float32)
+    image.close()
+
+    height, width, _ = rgb.shape
+    border_y, border_x = int(height * BORDER), int(width * BORDER)
+    rgb = rgb[border_y:height - border_y or None,
+              border_x:width - border_x or None]
+
+    gray = rgb @ _LUMA
+    histogram = np.bincount(gray.astype(np.uint8).ravel(), minlength=256)
+    pixels = max(int(histogram.sum()), 1)
+    ink = histogram[:INK_THRESHOLD].sum() / pixels
+    content = histogram[:PAPER_THRESHOLD].sum() / pixels
+    colorfulness = _colorfulness(rgb)
+
+    if content < BLANK_MAX_CONTENT:
+        page_class = PAGE_BLANK
+    elif colorfulness >= COLOR_MIN_COLORFULNESS:
+        page_class = PAGE_COLOR
+    elif is_bilevel or _flat_midtones(gray) / pixels \
+            <= BITONAL_MAX_FLAT_MIDTONES * content:
+        page_class = PAGE_BITONAL
+    else:
+        page_class = PAGE_GRAY
+
+    bins = histogram.reshape(HISTOGRAM_BINS, -1).sum(axis=1) / pixels
+    return {
+        'class': page_class,
+        'ink_coverage': round(float(ink), 4),
+        'content': round(float(content), 4),
+        'colorfulness': round(float(colorfulness), 2),
+        'histogram': [round(float(value), 4) for value in bins]
+    }
+
+
+def _flat_midtones(gray):
+    gradient_y, gradient_x = np.gradient(gray)
+    flat = np.abs(gradient_x) + np.abs(gradient_y) < FLAT_GRADIENT
+    midtones = (gray >= MIDTONE_RANGE[0]) & (gray < MIDTONE_RANGE[1])
+    return int(np.count_nonzero(flat & midtones))
+
+
+def _colorfulness(rgb):
+    red, green, blue = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    rg = red - green
+    yb = 0.5 * (red + green) - blue
+    return np.sqrt(rg.std() ** 2 + yb.std() ** 2) \
+        + 0.3 * np.sqrt(rg.mean() ** 2 + yb.mean() ** 2)
@@ -1,4 +1,7 @@
+import glob
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 from utils.celery_client import celery_app
 from workers.base_task import ObjectTask, FileTask
@@ -6,8 +9,12 @@ from utils.object import Object
 from workers.convert.convert_image import convert_tif_to_jpg, \
     convert_jpg_to_pdf, tif_to_txt, convert_tif_to_ptif, tif_to_pdf
 from workers.convert.convert_pdf import convert_pdf_to_txt, merge_pdf, split_merge_pdf, \
-    convert_pdf_to_tif, set_pdf_metadata
+    convert_pdf_to_tif, set_pdf_metadata, extract_pdf_pages
 from workers.convert.image_scaling import scale_image
+from workers.convert.page_analysis import analyze_page, PAGE_BITONAL, \
+    PAGE_GRAY, PAGE_ANALYSIS_WORKERS
+from workers.convert.master_compression import compress_master
+from utils.fixity import file_checksum
 
 
 def _extract_basename(files):
@@ -21,6 +28,12 @@ def _list_files(directory, extension):
             if f.endswith(extension))
 
 
+def _get_max_size(params):
+    if 'max_width' in params and 'max_height' in params:
+        return int(params['max_width']), int(params['max_height'])
+    return None
+
+
 def _get_target_file(file, target_dir, target_extension):
     _, extension = os.path.splitext(file)
     new_name = os.path.basename(file).replace(extension,
@@ -34,6 +47,8 @@ class MergeConvertedPdfTask(ObjectTask):
 
     TaskParams:
     -representation: The name of the representation
+    -bool optional: (optional) skip the task if the representation does not
+     exist
 
     Preconditions:
     - Files need to be named in alphabetical order
@@ -52,11 +67,76 @@ class MergeConvertedPdfTask(ObjectTask):
             input_directory = 'pdf'
 
         rep_dir = os.path.join(self.get_work_path(), Object.DATA_DIR, input_directory)
+        if self.params.get('optional') and not os.path.isdir(rep_dir):
+            self.log.info(f"Skipping merge, there is no {input_directory} "
+                          f"representation.")
+            return
         files = [os.path.basename(f) for f in sorted(_list_files(rep_dir, '.pdf'))]
 
         merge_pdf(files, rep_dir, f"{obj.id}.pdf")
 
 
+class DeriveArticlesTask(ObjectTask):
+    """
+    Create the article representations from the processed issue.
+
+    Article PDFs are cut out of the issue PDF and the issue's jpg and
+    thumbnail files are linked for the pages found in the issue scans, so
+    every page is only converted once. Articles whose scans were not found
+    in the issue are skipped, they are converted from their own scans by
+    optional list_files links (see IngestJournalsJob).
+
+    TaskParams:
+
+    Preconditions:
+    -issue_pdf, issue_jpg and issue_jpg_thumbnails representations
+    -'issue_page_indices' in the metadata of the articles found in the issue
+
+    Creates:
+    -article-<n>_pdf, article-<n>_jpg and article-<n>_jpg_thumbnails for
+     the articles found in the issue
+    """
+
+    name = "convert.derive_articles"
+
+    def process_object(self, obj):
+        issue_tifs = sorted(os.listdir(obj.get_representation_dir('issue_tif')))
+        issue_pdf = os.path.join(obj.get_representation_dir('issue_pdf'),
+                                 f"{obj.id}.pdf")
+
+        for count, article in enumerate(obj.metadata['articles']):
+            if 'issue_page_indices' not in article:
+                continue
+            prefix = f"article-{count}_"
+            indices = article['issue_page_indices']
+            extract_pdf_pages(
+                issue_pdf,
+                os.path.join(obj.get_representation_dir(f"{prefix}pdf"),
+                             f"{obj.id}.pdf"),
+                [index + 1 for index in indices])
+            page_names = [os.path.splitext(issue_tifs[index])[0]
+                          for index in indices]
+            for rep in ['jpg', 'jpg_thumbnails']:
+                _link_files(obj.get_representation_dir(f"issue_{rep}"),
+                            obj.get_representation_dir(f"{prefix}{rep}"),
+                            page_names)
+
+
+def _link_files(source_dir, target_dir, names):
+    """Hard link the files with the given names (without extension) into target_dir."""
+    os.makedirs(target_dir, exist_ok=True)
+    names = set(names)
+    for file_name in sorted(os.listdir(source_dir)):
+        if os.path.splitext(file_name)[0] not in names:
+            continue
+        source = os.path.join(source_dir, file_name)
+        target = os.path.join(target_dir, file_name)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+
+
 class SetPdfMetadataTask(ObjectTask):
     """
     Sets PDF Metadata for a given object.
@@ -71,9 +151,13 @@ class JpgToPdfTask(FileTask):
     """
     Create a one paged pdf with a jpg.
 
+    The jpg is only downscaled if max_width and max_height are given.
+
     TaskParams:
     -str file: Path to a jpg file that should be converted to pdf
     -str target: Name of the representation the created file will be added to
+    -int max_width: (optional) maximum width in pixels of the pdf page image
+    -int max_height: (optional) maximum height in pixels of the pdf page image
 
     Preconditions:
     -file in the representation
@@ -85,15 +169,145 @@ class JpgToPdfTask(FileTask):
     name = "convert.jpg_to_pdf"
 
     def process_file(self, file, target_dir):
-        convert_jpg_to_pdf(file, _get_target_file(file, target_dir, 'pdf'))
+        convert_jpg_to_pdf(file, _get_target_file(file, target_dir, 'pdf'),
+                           _get_max_size(self.params))
+
+
+class AnalyzePagesTask(ObjectTask):
+    """
+    Classify the pages of a representation as blank, bitonal, gray or color.
+
+    The statistics of every page (see analyze_page) are stored in the object
+    metadata under page_analysis.<representation>.<file name> and are used
+    by later conversions. The number of pages per class is returned.
+
+    TaskParams:
+    -str representation: (optional) name of the representation holding the
+     page images, defaults to tif
+    -bool optional: (optional) skip the task if the representation does not
+     exist
+
+    Preconditions:
+    -image files in the representation
+
+    Creates:
+    -page_analysis in the object metadata
+    """
+
+    name = "convert.analyze_pages"
+
+    def process_object(self, obj):
+        representation = self.params.get('representation', 'tif')
+        representation_dir = obj.get_representation_dir(representation)
+        if self.params.get('optional') \
+                and not os.path.isdir(representation_dir):
+            self.log.info(f"Skipping analysis, there is no {representation} "
+                          f"representation.")
+            return None
+        files = sorted(os.listdir(representation_dir))
+
+        with ThreadPoolExecutor(max_workers=PAGE_ANALYSIS_WORKERS) as executor:
+            results = executor.map(
+                lambda name: analyze_page(os.path.join(representation_dir, name)),
+                files)
+            analysis = dict(zip(files, results))
+
+        obj.metadata.setdefault('page_analysis', {})[representation] = analysis
+        obj.write()
+
+        counts = {}
+        for page in analysis.values():
+            counts[page['class']] = counts.get(page['class'], 0) + 1
+        self.log.info(f"Analyzed {len(files)} pages: {counts}")
+        return {'page_analysis': {representation: counts}}
+
+
+class CompressMastersTask(ObjectTask):
+    """
+    Compress the master TIFFs losslessly before they are archived.
+
+    Uncompressed TIFFs are rewritten with lossless compression and tiling
+    (see compress_master), the pixels are verified to be identical. The
+    checksums in the object manifest are updated and the compression
+    ratio and time per representation are stored in the object metadata
+    under master_compression.<representation>.
+
+    TaskParams:
+    -list representations: (optional) names of the representations holding
+     the masters, defaults to tif and all representations ending in _tif
+
+    Preconditions:
+    -TIFF files in the representations
+
+    Creates:
+    -compressed TIFF files replacing the uncompressed ones
+    -master_compression in the object metadata
+    """
+
+    name = "convert.compress_masters"
+
+    def process_object(self, obj):
+        representations = self.params.get('representations') or [
+            rep for rep in obj.list_representations()
+            if rep == 'tif' or rep.endswith('_tif')]
+
+        summary = {}
+        checksums = {}
+        for representation in representations:
+            representation_dir = obj.get_representation_dir(representation)
+            files = [os.path.join(representation_dir, name)
+                     for name in sorted(os.listdir(representation_dir))]
+            # libvips is multithreaded itself, only overlap I/O here
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                results = list(executor.map(compress_master, files))
+
+            stats = {'files': 0, 'before': 0, 'after': 0, 'seconds': 0.0}
+            for file, result in zip(files, results):
+                if result is None:
+                    continue
+                stats['files'] += 1
+                stats['before'] += result['before']
+                stats['after'] += result['after']
+                stats['seconds'] = round(stats['seconds'] + result['seconds'],
+                                         3)
+                checksums[os.path.relpath(file, obj.path)] = \
+                    file_checksum(file)
+            stats['ratio'] = round(stats['before'] / stats['after'], 2) \
+                if stats['after'] else 1.0
+            summary[representation] = stats
+            self.log.info(f"Compressed {stats['files']} of {len(files)} "
+                          f"masters in {representation}: {stats}")
+
+        if checksums:
+            obj.update_manifest(checksums)
+        obj.metadata['master_compression'] = summary
+        obj.write()
+        return {'master_compression': summary}
 
 
 class TifToPdfTask(FileTask):
+    """
+    Create a one paged pdf with a tif, with OCR if a language is given.
+
+    Without OCR the image is only downscaled if max_width and max_height
+    are given.
+
+    Pages classified by convert.analyze_pages are not OCR'd if blank and
+    embedded with 1 bit or 8 bit gray values if bitonal or gray.
+
+    TaskParams:
+    -str ocr_lang: the language used for ocr, no ocr is done if None
+    -int max_width: (optional) maximum width in pixels of the pdf page image
+    -int max_height: (optional) maximum height in pixels of the pdf page image
+    -str page_class: (optional) the class of the page, set by list_files
+    """
+
     name = "convert.tif_to_pdf"
 
     def process_file(self, file, target_dir):
         lang = self.get_param("ocr_lang")
-        tif_to_pdf(file, _get_target_file(file, target_dir, 'pdf'), lang)
+        tif_to_pdf(file, _get_target_file(file, target_dir, 'pdf'), lang,
+                   _get_max_size(self.params), self.params.get('page_class'))
 
 
 class TifToJpgTask(FileTask):
@@ -103,27 +317,37 @@ class TifToJpgTask(FileTask):
     TaskParams:
     -str file: Path to the tif file
     -str target: Name of the representation the created file will be added to
+    -str page_class: (optional) the class of the page, set by list_files
 
     Preconditions:
     -file in the representation
 
     Creates:
-    -<file_name>.jpg in the working dir
+    -<file_name>.jpg in the working dir, in grayscale for pages classified
+     as bitonal or gray by convert.analyze_pages
     """
 
     name = "convert.tif_to_jpg"
 
     def process_file(self, file, target_dir):
-        convert_tif_to_jpg(file, _get_target_file(file, target_dir, 'jpg'))
+        convert_tif_to_jpg(file, _get_target_file(file, target_dir, 'jpg'),
+                           self.params.get('page_class')
+                           in (PAGE_BITONAL, PAGE_GRAY))
 
 
 class PdfToTxtTask(FileTask):
     """
     Extract text from a pdf and create a txt file for every page.
 
+    If an OCR language is given, pages without a usable text layer are
+    OCR'd. The page tags and the numbers of OCR'd and skipped pages are
+    returned as the task result.
+
     TaskParams:
     -str file: Path to the pdf file
     -str target: Name of the representation the created file will be added to
+    -str ocr_lang: (optional) language used for OCR of pages without text
+    -bool consolidate: (optional) create a single txt file with a page index
 
     Preconditions:
     -file in the representation
@@ -131,12 +355,17 @@ class PdfToTxtTask(FileTask):
     Creates:
     -for each page in file:
         -page.<page_no>.txt
+    -or, if consolidate is set:
+        -<file_name>.txt and the page offsets in <file_name>.pages.json
     """
 
     name = "convert.pdf_to_txt"
 
     def process_file(self, file, target_dir):
-        convert_pdf_to_txt(file, target_dir)
+        result = convert_pdf_to_txt(file, target_dir,
+                                    self.params.get('ocr_lang'),
+                                    self.params.get('consolidate', False))
+        return {'text_layer': {os.path.basename(file): result}}
 
 
 class PdfToTifTask(FileTask):
@@ -146,6 +375,8 @@ class PdfToTifTask(FileTask):
     TaskParams:
     -str file: The path to the pdf file
     -str target: Name of the representation the created files will be added to
+    -int resolution: (optional) resolution of the tif files in dpi
+    -str tif_compression: (optional) compression of the tif files
 
     Preconditions:
     -file in the representation
@@ -158,7 +389,8 @@ class PdfToTifTask(FileTask):
     name = "convert.pdf_to_tif"
 
     def process_file(self, file, target_dir):
-        convert_pdf_to_tif(file, target_dir)
+        convert_pdf_to_tif(file, target_dir, self.params.get('resolution'),
+                           self.params.get('tif_compression'))
 
 
 class TifToTxtTask(FileTask):
@@ -192,6 +424,9 @@ class ScaleImageTask(FileTask):
         TaskParams:
         -str image_max_width: width of the generated image file
         -str image_max_height: height of the generated image file
+        -str derive_from: (optional) representation holding smaller
+         derivatives of the images (e.g. jpg), which are scaled instead of
+         the original files if present
 
         Preconditions:
         - image files existing in format JPEG or TIFF
@@ -211,7 +446,18 @@ class ScaleImageTask(FileTask):
     def process_file(self, file, target_dir):
         max_width = int(self.params['max_width'])
         max_height = int(self.params['max_height'])
-        scale_image(file, target_dir, max_width, max_height)
+        scale_image(self._get_source(file, target_dir), target_dir,
+                    max_width, max_height)
+
+    def _get_source(self, file, target_dir):
+        if 'derive_from' not in self.params:
+            return file
+        derive_dir = os.path.join(os.path.dirname(target_dir),
+                                  self.params['derive_from'])
+        name = os.path.splitext(os.path.basename(file))[0]
+        derivatives = glob.glob(os.path.join(glob.escape(derive_dir),
+                                             f"{glob.escape(name)}.*"))
+        return derivatives[0] if derivatives else file
 
 
 class TifToPTifTask(FileTask):
@@ -227,19 +473,26 @@ class TifToPTifTask(FileTask):
 
     Creates:
     - PTIF representation of all TIFFs
+
+    The number of pyramid levels and tiles and the time taken are returned
+    as the task result.
     """
 
     name = "convert.tif_to_ptif"
 
     def process_file(self, file, target_dir):
-        convert_tif_to_ptif(file, target_dir)
+        result = convert_tif_to_ptif(file, target_dir)
+        return {'ptif': {os.path.basename(file): result}}
 
 
 
 ScaleImageTask = celery_app.register_task(ScaleImageTask())
 JpgToPdfTask = celery_app.register_task(JpgToPdfTask())
+AnalyzePagesTask = celery_app.register_task(AnalyzePagesTask())
+CompressMastersTask = celery_app.register_task(CompressMastersTask())
 TifToPdfTask = celery_app.register_task(TifToPdfTask())
 MergeConvertedPdf = celery_app.register_task(MergeConvertedPdfTask())
+DeriveArticlesTask = celery_app.register_task(DeriveArticlesTask())
 TifToJpgTask = celery_app.register_task(TifToJpgTask())
 PdfToTifTask = celery_app.register_task(PdfToTifTask())
 PdfToTxtTask = celery_app.register_task(PdfToTxtTask())
@@ -4,6 +4,7 @@ from utils.celery_client import celery_app
 
 from workers.base_task import ObjectTask
 from utils.atom_api import create_digital_object
+from utils.adaptive_limiter import get_limiter
 from requests import HTTPError
 
 
@@ -23,7 +24,8 @@ class PublishToAtomTask(ObjectTask):
 
     def process_object(self, obj):
         try:
-            uri = create_digital_object(obj)
+            with get_limiter('atom').slot():
+                uri = create_digital_object(obj)
             log.info(f"Created digital object in AtoM: {uri}")
         except HTTPError as err:
             msg = (
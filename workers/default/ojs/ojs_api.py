@@ -1,8 +1,8 @@
 import os
 import logging
-import json
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError
+
+from utils import http_client
+from utils.upload import upload_file
 
 ojs_api_uri = os.environ['OJS_URI']
 auth_key = os.environ['OJS_AUTH_KEY']
@@ -24,7 +24,7 @@ def generate_frontmatter(article_id):
     """
     headers = {'ojsAuthorization': auth_key}
     url = f"{_get_api_url()}/frontmatters/create/article/?id={article_id}"
-    return _make_request(url, headers)
+    return _make_request(url, headers, 'ojs.frontmatters')
 
 
 def publish(import_xml_file_path, journalcode):
@@ -32,8 +32,8 @@ def publish(import_xml_file_path, journalcode):
     Publish the documents referenced in the passed XML via OJS-Import-Plugin.
 
     The paramter file contains OJS-specific XML which contains file paths to
-    documents which shall be imported to OJS. It is read and passed to a POST
-    request (in UTF-8) to the OJS import plugin.
+    documents which shall be imported to OJS. It is streamed from disk in a
+    POST request to the OJS import plugin, see `utils.upload.upload_file()`.
 
     Server address and port can be given optionally.
 
@@ -43,36 +43,31 @@ def publish(import_xml_file_path, journalcode):
     :param str journalcode: Name of the journal that will be imported to
     :return: Tuple of return code and text of the POST request to OJS
     """
-    with open(import_xml_file_path, "r") as f:
-        import_data = f.read()
-
     headers = {'Content-Type': 'application/xml',
                'ojsAuthorization': auth_key}
     request_url = f"{_get_api_url()}/import/{journalcode}"
-    return _make_request(request_url, headers,
-                         import_data.encode(encoding='utf-8'))
+    return _parse_response(upload_file(request_url, import_xml_file_path,
+                                       headers, endpoint='ojs.import'))
 
 
 def _get_api_url():
     return ojs_api_uri
 
 
-def _make_request(url, headers, import_data=None):
-    """Make the request to OJS and return response code and content."""
-    log.debug(f"Request: URL: {url} Headers: {headers} Data: {import_data}")
+def _make_request(url, headers, endpoint):
+    """Make a GET request to OJS and return response code and content."""
+    log.debug(f"Request: URL: {url} Headers: {headers}")
+    return _parse_response(http_client.get(url, headers=headers,
+                                           endpoint=endpoint))
 
-    request = Request(url, headers=headers,
-                      data=import_data)
 
-    try:
-        with urlopen(request) as response:
-            response_text = response.read().decode('utf-8')
-    except HTTPError as e:
-        log.error(f"Request failed with: {e.read()}")
-        raise
+def _parse_response(response):
+    if not response.ok:
+        log.error(f"Request failed with: {response.text}")
+        response.raise_for_status()
 
     try:
-        return response.getcode(), json.loads(response_text)
-    except json.JSONDecodeError as e:
-        log.error(f"Failed to parse response as JSON: {response_text}")
+        return response.status_code, response.json()
+    except ValueError:
+        log.error(f"Failed to parse response as JSON: {response.text}")
         raise
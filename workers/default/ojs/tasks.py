@@ -4,6 +4,7 @@ from utils.celery_client import celery_app
 
 from workers.base_task import ObjectTask
 from workers.default.ojs.ojs_api import publish, generate_frontmatter
+from utils.adaptive_limiter import get_limiter
 
 log = logging.getLogger(__name__)
 
@@ -25,8 +26,9 @@ class PublishToOJSTask(ObjectTask):
         work_path = self.get_work_path()
         ojs_journal_code = self.get_param('ojs_journal_code')
 
-        _, result = publish(os.path.join(work_path, 'ojs_import.xml'),
-                            ojs_journal_code)
+        with get_limiter('ojs').slot():
+            _, result = publish(os.path.join(work_path, 'ojs_import.xml'),
+                                ojs_journal_code)
 
         if len(result['warnings']) > 0:
             raise RuntimeError(result['warnings'])
@@ -4,6 +4,7 @@ from utils.celery_client import celery_app
 
 from workers.base_task import ObjectTask
 from workers.default.omp.omp_api import publish
+from utils.adaptive_limiter import get_limiter
 
 log = logging.getLogger(__name__)
 
@@ -26,8 +27,9 @@ class PublishToOMPTask(ObjectTask):
         work_path = self.get_work_path()
         omp_press_code = self.get_param('omp_press_code')
 
-        _, result = publish(os.path.join(work_path, 'omp_import.xml'),
-                            omp_press_code)
+        with get_limiter('omp').slot():
+            _, result = publish(os.path.join(work_path, 'omp_import.xml'),
+                                omp_press_code)
 
         if not result['success']:
             raise RuntimeError(result)
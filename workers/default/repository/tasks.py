@@ -1,10 +1,17 @@
 import os
-import shutil
 import glob
 
+from celery import Task
+
 from utils.celery_client import celery_app
 from workers.base_task import BaseTask, ObjectTask
-from utils.repository import generate_repository_path
+from utils.repository import generate_repository_path, \
+    get_repository_sources
+from utils.publishing import publish_tree
+from utils.fixity import TAG_FILES, file_checksum, read_manifest, \
+    audit_objects
+from utils.object import Object, import_file
+from utils.blob_store import get_archive_blob_store
 from utils.job_db import JobDb
 
 from utils import cilantro_info_file
@@ -14,6 +21,10 @@ archive_dir = os.environ['ARCHIVE_DIR']
 working_dir = os.environ['WORKING_DIR']
 staging_dir = os.environ['STAGING_DIR']
 
+FIXITY_AUDIT_BATCH_SIZE = int(os.environ.get('FIXITY_AUDIT_BATCH_SIZE', 50))
+FIXITY_AUDIT_BYTES_PER_SECOND = \
+    int(os.environ.get('FIXITY_AUDIT_MB_PER_SECOND', 50)) * 1024 * 1024
+
 
 filename_extension_mapping = {
     'pdf': ['**/*.pdf', '**/*.PDF'],
@@ -28,6 +39,7 @@ class CreateObjectTask(ObjectTask):
     -files in staging
     Creates:
     -An Object in the working dir
+    -a manifest with the SHA-256 checksums of the imported files
     """
     name = "create_object"
 
@@ -71,8 +83,7 @@ class CreateObjectTask(ObjectTask):
         if len(files_grabbed) < 1:
             raise Exception(f'no valid job files found in {path}')
 
-        for file_name in files_grabbed:
-            obj.add_file(init_rep, file_name)
+        obj.add_files(init_rep, files_grabbed, checksum=True)
 
 
 
@@ -80,6 +91,25 @@ CreateObjectTask = celery_app.register_task(CreateObjectTask())
 
 
 class CreateComplexObjectTask(ObjectTask):
+    """
+    Create a Cilantro-Object from multiple staging directories.
+
+    TaskParams:
+    -dict copy_instructions: maps staging subdirectories to tuples of
+        target representation and file pattern
+    -list article_instructions: (optional) articles whose scans are a subset
+        of the issue scans, each a dict with the article 'source' directory,
+        the representation 'prefix' and optional explicit 'issue_pages'
+        ([first, last] issue scan, starting at 1)
+
+    Creates:
+    -An Object in the working dir
+    -a manifest with the SHA-256 checksums of the imported files
+    -for every article the indices of its pages within the issue scans in
+     the article metadata ('issue_page_indices'), articles that could not
+     be matched to issue scans are copied to <prefix>tif instead
+    """
+
     name = "create_complex_object"
 
     def process_object(self, obj):
@@ -104,6 +134,8 @@ class CreateComplexObjectTask(ObjectTask):
         obj.metadata = params['metadata']
         self._initialize_files(obj, params['path'], params['user'],
                         params['copy_instructions'])
+        self._initialize_articles(obj, params['path'], params['user'],
+                                  params.get('article_instructions', []))
         obj.write()
 
     def _initialize_files(self, obj, path, user, copy_instructions):
@@ -117,8 +149,55 @@ class CreateComplexObjectTask(ObjectTask):
             if len(files_grabbed) == 0:
                 raise Exception((f"no valid file found in {glob_path}."))
             
-            for file_name in files_grabbed:
-                obj.add_file(target_dir, file_name)
+            obj.add_files(target_dir, files_grabbed, checksum=True)
+
+    def _initialize_articles(self, obj, path, user, article_instructions):
+        """
+        Locate the article pages within the issue scans.
+
+        Pages are taken from explicit page ranges or found by comparing the
+        content hashes of the article scans with those of the issue scans.
+        """
+        if not article_instructions:
+            return
+
+        issue_dir = obj.get_representation_dir('issue_tif')
+        issue_files = [os.path.join(issue_dir, name)
+                       for name in sorted(os.listdir(issue_dir))]
+        # the checksums of the issue scans were computed while importing them
+        manifest = read_manifest(obj.path)
+        issue_index = _IssueScanIndex(issue_files, {
+            file_name: manifest.get(os.path.relpath(file_name, obj.path))
+            for file_name in issue_files})
+
+        for count, instruction in enumerate(article_instructions):
+            article = obj.metadata['articles'][count]
+
+            if instruction.get('issue_pages'):
+                first, last = instruction['issue_pages']
+                if first < 1 or last > len(issue_files) or first > last:
+                    raise Exception(f"invalid issue pages {first}-{last} for "
+                                    f"article {instruction['source']}, the "
+                                    f"issue has {len(issue_files)} scans.")
+                article['issue_page_indices'] = list(range(first - 1, last))
+                continue
+
+            glob_path = os.path.join(staging_dir, user, path,
+                                     instruction['source'], '*.tif')
+            files_grabbed = sorted(glob.glob(glob_path))
+            if len(files_grabbed) == 0:
+                raise Exception((f"no valid file found in {glob_path}."))
+
+            indices = issue_index.find_all(files_grabbed)
+            if indices is not None:
+                self.log.info(f"Found all pages of article "
+                              f"{instruction['source']} in issue scans.")
+                article['issue_page_indices'] = indices
+            else:
+                self.log.info(f"Pages of article {instruction['source']} not "
+                              f"found in issue scans, copying article scans.")
+                obj.add_files(f"{instruction['prefix']}tif", files_grabbed,
+                              checksum=True)
 
     def _generate_object_id(self):
         part_a = self.get_param('id')
@@ -128,6 +207,133 @@ class CreateComplexObjectTask(ObjectTask):
 
 CreateComplexObjectTask = celery_app.register_task(CreateComplexObjectTask())
 
+
+class LoadArchivedObjectTask(ObjectTask):
+    """
+    Load an archived Cilantro-Object into the working dir to update it.
+
+    The data files are hardlinked or reflinked from the archive, so loading
+    takes seconds regardless of the size of the object. Metadata files and
+    the representations given in writable_representations are copied
+    instead, because the following tasks rewrite them in place.
+
+    TaskParams:
+    -str id: the id of the archived object
+    -dict metadata: metadata updating the archived metadata
+    -list writable_representations: (optional) representations whose files
+        are rewritten by following tasks
+
+    Preconditions:
+    -the object in the archive
+
+    Creates:
+    -the object in the working dir with the updated meta.json
+    -a manifest with the archived checksums of the linked files
+    """
+
+    name = "load_archived_object"
+
+    def process_object(self, obj):
+        oid = self.get_param('id')
+        archive_path = os.path.join(archive_dir, generate_repository_path(oid))
+        archive_root = os.path.realpath(archive_dir)
+        if os.path.commonpath([archive_root, os.path.realpath(archive_path)]) \
+                != archive_root:
+            raise Exception(f'object id {oid} points outside of the archive')
+        if not os.path.exists(os.path.join(archive_path, 'meta.json')):
+            raise Exception(f'object {oid} not found in the archive')
+
+        self.job_db.set_job_object_id(self.parent_job_id, oid)
+
+        checksums = _load_archived_files(
+            archive_path, obj.path,
+            self.params.get('writable_representations', []))
+        self.log.info(f"Loaded {len(checksums)} linked files of {oid} "
+                      f"from the archive.")
+
+        obj = Object(obj.path)
+        obj.id = oid
+        obj.metadata.update(self.get_param('metadata'))
+        obj.update_manifest(checksums)
+        obj.write()
+        return {'object_id': oid}
+
+
+LoadArchivedObjectTask = celery_app.register_task(LoadArchivedObjectTask())
+
+
+def _load_archived_files(archive_path, work_path, writable_representations):
+    """
+    Link or copy the files of an archived object to the working dir.
+
+    :return dict: the archived checksums of the linked files
+    """
+    archived_checksums = read_manifest(archive_path)
+    checksums = {}
+    for root, _, files in os.walk(archive_path):
+        for name in files:
+            source = os.path.join(root, name)
+            rel_path = os.path.relpath(source, archive_path)
+            if rel_path in TAG_FILES:
+                continue
+            parts = rel_path.split(os.sep)
+            link = len(parts) > 2 and parts[0] == Object.DATA_DIR \
+                and parts[1] not in writable_representations
+            target = os.path.join(work_path, rel_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            import_file(source, target, hardlink=link)
+            if link and rel_path in archived_checksums:
+                checksums[rel_path] = archived_checksums[rel_path]
+    return checksums
+
+
+class _IssueScanIndex:
+    """
+    Find files among the issue scans by content.
+
+    Scans are compared by size first, so only files of matching size
+    are hashed. Known checksums of the issue scans are used instead of
+    hashing them again.
+    """
+
+    def __init__(self, issue_files, checksums=None):
+        self.issue_files = issue_files
+        self.sizes = {}
+        self.hashes = {}
+        checksums = checksums or {}
+        for index, file_name in enumerate(issue_files):
+            self.sizes.setdefault(os.path.getsize(file_name), []).append(index)
+            if checksums.get(file_name):
+                self.hashes[index] = checksums[file_name]
+
+    def find_all(self, files):
+        """
+        Return the issue scan indices of the given files.
+
+        :param list files: paths of the files to be found
+        :return list: the indices or None if any of the files is missing
+        """
+        indices = []
+        for file_name in files:
+            index = self.find(file_name)
+            if index is None:
+                return None
+            indices.append(index)
+        return indices
+
+    def find(self, file_name):
+        candidates = self.sizes.get(os.path.getsize(file_name), [])
+        if not candidates:
+            return None
+        file_hash = file_checksum(file_name)
+        for index in candidates:
+            if index not in self.hashes:
+                self.hashes[index] = file_checksum(self.issue_files[index])
+            if self.hashes[index] == file_hash:
+                return index
+        return None
+
+
 def _get_work_path(params):
     abs_path = os.path.join(working_dir, params['work_path'])
     if not os.path.exists(abs_path):
@@ -137,7 +343,10 @@ def _get_work_path(params):
 
 class PublishToRepositoryTask(BaseTask):
     """
-    Copy the given dir-trees from work dir to the repository.
+    Copy the pdf and jpg representations and metadata to the repository.
+
+    The previous version is replaced atomically and files that did not
+    change are hardlinked from it.
 
     TaskParams:
 
@@ -145,6 +354,7 @@ class PublishToRepositoryTask(BaseTask):
 
     Creates:
     -a copy of the work dir in the repository.
+    -a manifest with the SHA-256 checksums of the published files
     """
 
     name = "publish_to_repository"
@@ -154,31 +364,65 @@ class PublishToRepositoryTask(BaseTask):
         repository_path = os.path.join(repository_dir,
                                        generate_repository_path(
                                            self.get_result('object_id')))
-        shutil.rmtree(repository_path, ignore_errors=True)
-
-        shutil.copytree(os.path.join(work_path, 'data', 'pdf'),
-                        os.path.join(repository_path, 'data', 'pdf'))
-        shutil.copytree(os.path.join(work_path, 'data', 'jpg'),
-                        os.path.join(repository_path, 'data', 'jpg'))
-        shutil.copy(os.path.join(work_path, 'meta.json'), repository_path)
-        shutil.copy(os.path.join(work_path, 'mets.xml'), repository_path)
+        publish_tree(get_repository_sources(work_path), repository_path,
+                     manifest=True, expected=read_manifest(work_path))
 
 
 PublishToRepositoryTask = celery_app.register_task(PublishToRepositoryTask())
 
 
 class PublishToArchiveTask(BaseTask):
-    """Copy the given dir-trees from work dir to the archive."""
+    """
+    Copy the given dir-trees from work dir to the archive.
+
+    The previous version is replaced atomically. Unchanged files are
+    hardlinked from the previous version or the repository copy. Copied
+    files are checked against the checksums computed on ingest and a
+    manifest of all files is written. If the blob store is enabled
+    (ARCHIVE_BLOB_STORE), every distinct file content is stored only once.
+    """
 
     name = "publish_to_archive"
 
     def execute_task(self):
         work_path = self.get_work_path()
-        archive_path = os.path.join(archive_dir,
-                                    generate_repository_path(
-                                        self.get_result('object_id')))
-        shutil.rmtree(archive_path, ignore_errors=True)
-        shutil.copytree(work_path, archive_path)
+        object_path = generate_repository_path(self.get_result('object_id'))
+        publish_tree({'': work_path}, os.path.join(archive_dir, object_path),
+                     link_dirs=[os.path.join(repository_dir, object_path)],
+                     manifest=True, expected=read_manifest(work_path),
+                     blob_store=get_archive_blob_store(archive_dir))
 
 
 PublishToArchiveTask = celery_app.register_task(PublishToArchiveTask())
+
+
+class FixityAuditTask(Task):
+    """
+    Verify a batch of archived objects against their manifests.
+
+    The audit continues after the object checked last in the previous run,
+    its progress and failures are stored in the job database. The task is
+    run periodically if FIXITY_AUDIT_INTERVAL is set, see celery_client.
+
+    TaskParams:
+    -int max_objects: (optional) number of objects verified per run
+    -int bytes_per_second: (optional) maximum read rate
+    """
+
+    name = "fixity_audit"
+
+    def run(self, max_objects=None, bytes_per_second=None):
+        job_db = JobDb()
+        try:
+            progress = job_db.get_fixity_progress()
+            result = audit_objects(
+                archive_dir, progress.get('cursor'),
+                max_objects or FIXITY_AUDIT_BATCH_SIZE,
+                bytes_per_second or FIXITY_AUDIT_BYTES_PER_SECOND)
+            job_db.update_fixity_progress(result)
+        finally:
+            job_db.close()
+        return result
+
+
+FixityAuditTask = celery_app.register_task(FixityAuditTask())
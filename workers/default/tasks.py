@@ -1,3 +1,6 @@
+from celery.worker.control import inspect_command
+
+from utils.adaptive_limiter import get_limiter_stats
 from utils.celery_client import celery_app
 
 celery_app.autodiscover_tasks([
@@ -9,3 +12,13 @@ celery_app.autodiscover_tasks([
     'workers.default.arachne',
     'workers.default.atom'
     ], force=True)
+
+
+@inspect_command()
+def publisher_stats(state, **_):
+    """
+    Report the publish calls in flight and queued per target system.
+
+    Usage: celery -A workers.default.tasks inspect publisher_stats
+    """
+    return get_limiter_stats()
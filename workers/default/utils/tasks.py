@@ -17,9 +17,14 @@ class ListFilesTask(ObjectTask):
     A chain is created for every file. These are run in parallel. The next task
     is run when the last file chain has finished.
 
+    The class of every page determined by convert.analyze_pages is passed
+    to the file tasks as page_class, so the metadata is only read once.
+
     TaskParams:
     -str representation: The name of the representation
     -list task: the name of the task that is run for all files
+    -bool optional: (optional) skip the task if the representation does not
+     exist
     """
 
     name = "list_files"
@@ -28,17 +33,26 @@ class ListFilesTask(ObjectTask):
         rep = self.get_param('representation')
         task = self.get_param('task')
 
+        if self.params.get('optional') \
+                and not os.path.isdir(obj.get_representation_dir(rep)):
+            self.log.info(f"Skipping {task}, there is no {rep} representation.")
+            return
+
         pattern = os.path.join(obj.get_representation_dir(rep), '*.*')
         files = []
         for matching_file in glob.iglob(pattern):
             files.append(matching_file)
-        raise self.replace(self._generate_chord_for_files(files, task))
+        page_analysis = obj.metadata.get('page_analysis', {}).get(rep, {})
+        raise self.replace(self._generate_chord_for_files(files, task,
+                                                          page_analysis))
 
-    def _generate_chord_for_files(self, files, subtasks):
+    def _generate_chord_for_files(self, files, subtasks, page_analysis):
         chord_tasks = []
         child_ids = []
         for file in files:
-            chain, task_id = self._create_chain(file, subtasks)
+            page_class = page_analysis.get(os.path.basename(file), {}) \
+                .get('class')
+            chain, task_id = self._create_chain(file, subtasks, page_class)
             child_ids += [task_id]
             chord_tasks.append(chain)
 
@@ -47,10 +61,12 @@ class ListFilesTask(ObjectTask):
 
         return chord(chord_tasks, signature('finish_chord', kwargs={'job_id': self.job_id, 'work_path': self.job_id}))
 
-    def _create_chain(self, file, subtasks):
+    def _create_chain(self, file, subtasks, page_class=None):
         params = self.params.copy()
         params['job_id'] = str(uuid.uuid1())
         params['work_path'] = file
+        if page_class is not None:
+            params['page_class'] = page_class
         params['parent_job_id'] = self.job_id
         # workaround for storing results inside params
         # this is necessary since prev_results do not always seem to be
@@ -94,6 +110,13 @@ class FinishChainTask(BaseTask):
     name = "finish_chain"
 
     def execute_task(self):
+        # chains working on archived objects have no staging directory
+        if self.params.get('chain_input_directory') is not None:
+            self._write_info_file()
+
+        self.job_db.update_job_state(self.parent_job_id, 'success')
+
+    def _write_info_file(self):
         chain_input_directory = os.path.join(
             self.staging_dir, 
             self.get_param('user_name'), 
@@ -117,8 +140,6 @@ class FinishChainTask(BaseTask):
                 success_url_label
             )
 
-        self.job_db.update_job_state(self.parent_job_id, 'success')
-
 
 FinishChainTask = celery_app.register_task(FinishChainTask())
 
@@ -1,10 +1,12 @@
 import os
 import logging
 
+import celery.signals
+
 from utils.celery_client import celery_app
 
 from workers.base_task import ObjectTask
-from workers.default.xml.xml_generator import generate_xml
+from workers.default.xml.xml_generator import generate_xml, preload_templates
 from workers.default.xml.xml_validator import validate_xml
 
 
@@ -26,6 +28,9 @@ class GenerateXMLTask(ObjectTask):
 
     Creates:
     -ojs_import.xml
+
+    The time spent building the template context and rendering is returned
+    in the results under 'metrics'.
     """
 
     name = "generate_xml"
@@ -45,16 +50,29 @@ class GenerateXMLTask(ObjectTask):
         except KeyError:
             schema_file = None
 
+        metrics = {}
         generated_xml_file = generate_xml(obj, template_file, target_filepath,
-                                          params)
+                                          params, metrics)
 
         validate_xml(generated_xml_file, dtd_file_path=dtd_file,
                      schema_file_path=schema_file)
 
+        xml_name = os.path.splitext(self.get_param('target_filename'))[0]
+        return {'metrics': {'generate_xml': {xml_name: metrics}}}
+
 
 GenerateXMLTask = celery_app.register_task(GenerateXMLTask())
 
 
+@celery.signals.worker_process_init.connect
+def on_worker_process_init(**_):
+    """Compile the XML templates before the worker process takes tasks."""
+    try:
+        preload_templates()
+    except Exception:  # noqa: a broken template only fails its own tasks
+        log.exception("Preloading the XML templates failed.")
+
+
 def _read_file(path):
     template_file = open(path, 'r')
     template_string = template_file.read()
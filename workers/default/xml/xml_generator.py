@@ -4,90 +4,217 @@ import datetime
 import glob
 import json
 import base64
+import functools
+import tempfile
+import time
+from collections.abc import Mapping
 
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, \
+    select_autoescape
+from markupsafe import Markup
 
 log = logging.getLogger(__name__)
 
+# bytes of an embedded file read and encoded at once while rendering
+BASE64_CHUNK_SIZE = 3 * 256 * 1024
 
-def generate_xml(obj, template_file, target_filepath, params):
+TEMPLATE_DIR = 'resources'
+TEMPLATE_CACHE_DIR = os.environ.get(
+    'TEMPLATE_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'cilantro-templates'))
+
+_environment = None
+
+
+def generate_xml(obj, template_file, target_filepath, params, metrics=None):
     """
     Build Jinja2 template and write it to target file.
 
+    The files of the object are only looked up when the template references
+    them, see `LazyContext`. Templates are compiled once per process, see
+    `get_environment()`.
+
     :param Object obj: The Cilantro Object to be used in the template
     :param str template_file: name of the template file to be used
     :param str target_filepath: name of the generated XML file
     :param dict params: task paramters (to be used in the template)
+    :param dict metrics: (optional) filled with the seconds spent building
+        the context ('context_seconds') and rendering in total
+        ('render_seconds')
     :return str: Path to generated XML file
     """
-    env = Environment(
-        loader=FileSystemLoader('resources'),
-        trim_blocks=True,
-        lstrip_blocks=True,
-        autoescape=True
-    )
-
-    # Some functions which may be needed in the template (logic)
-    env.globals['path_join'] = os.path.join
-    env.globals['datetime'] = datetime
-    env.globals['basename'] = os.path.basename
-    env.globals['splitext'] = os.path.splitext
-    env.globals['getsize'] = os.path.getsize
-    env.globals['environ'] = os.environ
+    start = time.monotonic()
+    env = get_environment()
 
     log.info("Generating XML with template: " + template_file)
 
-
-    params['files'] = {}
+    context_start = time.monotonic()
+    timer = {'seconds': 0.0}
     try: 
         input_file_directories = params["input_file_directories"]
-
+        loaders = {}
         if 'pdfs' in input_file_directories:
-            pdf_file_paths = {}
-            encoded_pdf_file_paths = {}
+            pdf_file_paths = LazyContext({
+                pdf_dir: _glob_loader(obj.get_representation_dir(pdf_dir),
+                                      '*.pdf')
+                for pdf_dir in input_file_directories['pdfs']
+            }, timer)
+            loaders['pdf'] = lambda: pdf_file_paths
+        params['files'] = LazyContext(loaders, timer)
 
-            for pdf_dir in input_file_directories['pdfs']:
+    except KeyError:
+        params['files'] = LazyContext({
+            'jpegs': _glob_loader(obj.get_representation_dir('jpg'), '*.jpg'),
+            'thumbnails': _glob_loader(
+                obj.get_representation_dir('jpg_thumbnails'), '*.jpg'),
+            'pdfs': _glob_loader(obj.get_representation_dir('pdf'), '*.pdf')
+        }, timer)
+    setup_seconds = time.monotonic() - context_start
 
-                pdf_files = glob.glob(obj.get_representation_dir(pdf_dir) + '/*.pdf')
+    template = env.get_template(template_file)
+    getsize = functools.lru_cache(maxsize=None)(os.path.getsize)
+    _write_xml_to_file(template.generate(obj=obj, params=params,
+                                         getsize=getsize),
+                       target_filepath)
+
+    context_seconds = setup_seconds + timer['seconds']
+    render_seconds = time.monotonic() - start
+    log.info(f"Generated {target_filepath} in {render_seconds:.3f}s, "
+             f"{context_seconds:.3f}s of it building the context.")
+    if metrics is not None:
+        metrics['context_seconds'] = round(context_seconds, 3)
+        metrics['render_seconds'] = round(render_seconds, 3)
+    return os.path.join(target_filepath)
 
-                pdf_file_paths[pdf_dir] = pdf_files
-                encoded_pdf_file_paths[pdf_dir] = []
 
-                for file_path in pdf_files:
-                    with open(file_path, "rb") as pdf_file:
-                        encoded_pdf_file_paths[pdf_dir].append(base64.b64encode(pdf_file.read()).decode('utf-8'))
+def get_environment():
+    """
+    Return the Jinja2 environment of this process, creating it on first use.
 
-            params['files']['pdf'] = pdf_file_paths
-            params['files']['pdf_base64'] = encoded_pdf_file_paths
+    The environment keeps the compiled templates in memory and recompiles a
+    template only if its file changed. Compiled templates are also cached on
+    disk in TEMPLATE_CACHE_DIR, so new worker processes do not have to
+    compile them again.
 
-    except KeyError:
-        pdf_doc = os.path.join(obj.get_representation_dir('pdf'),
-                            f"{obj.id}.pdf")
-        with open(pdf_doc, "rb") as pdf_file:
-            encoded_string = base64.b64encode(pdf_file.read())
-        params['pdf_base64'] = encoded_string.decode('utf-8')
+    :return Environment:
+    """
+    global _environment
+    if _environment is None:
+        os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+        env = Environment(
+            loader=FileSystemLoader(TEMPLATE_DIR),
+            trim_blocks=True,
+            lstrip_blocks=True,
+            autoescape=True,
+            auto_reload=True,
+            bytecode_cache=FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+        )
+
+        # Some functions which may be needed in the template (logic)
+        env.globals['path_join'] = os.path.join
+        env.globals['datetime'] = datetime
+        env.globals['basename'] = os.path.basename
+        env.globals['splitext'] = os.path.splitext
+        env.globals['getsize'] = os.path.getsize
+        env.globals['environ'] = os.environ
+        env.globals['base64_file'] = base64_file
+        env.globals['repository_file_url'] = repository_file_url
+        _environment = env
+    return _environment
+
+
+def preload_templates():
+    """
+    Compile all templates in TEMPLATE_DIR into the template cache.
 
-        jpegs = glob.glob(obj.get_representation_dir('jpg') + '/*.jpg')
-        thumbnails = glob.glob(obj.get_representation_dir('jpg_thumbnails') + '/*.jpg')
-        pdfs = glob.glob(obj.get_representation_dir('pdf') + '/*.pdf')
+    :return list: names of the loaded templates
+    """
+    env = get_environment()
+    names = env.list_templates(filter_func=lambda name: 'template' in name
+                               and name.endswith('.xml'))
+    for name in names:
+        env.get_template(name)
+    log.info(f"Preloaded templates {names}.")
+    return names
 
-        if jpegs:
-            params['files']['jpegs'] = jpegs
 
-        if thumbnails:
-            params['files']['thumbnails'] = thumbnails
+class LazyContext(Mapping):
+    """
+    A template context mapping whose values are computed on first access.
 
-        if pdfs:
-            params['files']['pdfs'] = pdfs
+    Each value is produced by a loader function the first time the template
+    references its key and memoized, so e.g. directories the template never
+    looks at are never listed.
 
-    template = env.get_template(template_file)
-    filled_template = template.render(obj=obj, params=params)
+    Like the plain dicts used before, the mapping only contains keys with
+    non-empty values when iterated or tested for truth. Looking up a key
+    with an empty value returns the empty value.
+    """
 
-    _write_xml_to_file(filled_template, target_filepath)
-    return os.path.join(target_filepath)
+    def __init__(self, loaders, timer=None):
+        """
+        :param dict loaders: maps keys to functions without arguments
+        :param dict timer: (optional) the seconds spent in loaders are added
+            to its 'seconds'
+        """
+        self._loaders = loaders
+        self._values = {}
+        self._timer = timer if timer is not None else {'seconds': 0.0}
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            loader = self._loaders[key]
+            start = time.monotonic()
+            self._values[key] = loader()
+            self._timer['seconds'] += time.monotonic() - start
+        return self._values[key]
+
+    def __iter__(self):
+        return (key for key in self._loaders if self[key])
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def _glob_loader(directory, pattern):
+    return functools.partial(glob.glob, os.path.join(directory, pattern))
+
+
+def base64_file(file_path, chunk_size=BASE64_CHUNK_SIZE):
+    """
+    Base64 encode a file chunk by chunk while the template is rendered.
+
+    Use it in a loop, so the encoded file is never held in memory as a
+    whole: {% for chunk in base64_file(path) %}{{chunk}}{% endfor %}
+
+    :param str file_path: path of the file to be embedded
+    :param int chunk_size: bytes read per chunk, rounded down to a multiple
+        of 3 so the chunks concatenate to valid base64
+    :return: generator of base64 encoded chunks
+    """
+    chunk_size -= chunk_size % 3
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            yield Markup(base64.b64encode(chunk).decode('ascii'))
+
+
+def repository_file_url(obj, file_path):
+    """
+    Return the URL of a file of the object in the repository.
+
+    The file is served by the repository_controller once the object is
+    published to the repository.
+
+    :param Object obj: The Cilantro Object the file belongs to
+    :param str file_path: path of the file in a representation of obj
+    :return str:
+    """
+    representation = os.path.basename(os.path.dirname(file_path))
+    return f"{os.environ['REPOSITORY_URI']}/file/{obj.id}/data/" \
+           f"{representation}/{os.path.basename(file_path)}"
 
 
-def _write_xml_to_file(template, target_filepath):
+def _write_xml_to_file(template_stream, target_filepath):
     log.debug("Saving XML file to" + os.path.join(target_filepath))
     with open(target_filepath, "w") as text_file:
-        text_file.write(str(template))
+        text_file.writelines(template_stream)
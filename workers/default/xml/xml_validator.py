@@ -1,12 +1,21 @@
 import logging
+import os
 from io import StringIO
 
 from lxml import etree
 
 log = logging.getLogger(__name__)
 
+# files larger than this are validated in streaming mode by default
+XML_STREAMING_THRESHOLD_MB = int(
+    os.environ.get('XML_STREAMING_THRESHOLD_MB', '64'))
 
-def validate_xml(xml_file_path, dtd_file_path=None, schema_file_path=None):
+# compiled DTDs and schemas of this process by path, with the file's mtime
+_cache = {}
+
+
+def validate_xml(xml_file_path, dtd_file_path=None, schema_file_path=None,
+                 streaming=None):
     """
     Validate XML for well-formed, XSD and DTD.
 
@@ -16,22 +25,39 @@ def validate_xml(xml_file_path, dtd_file_path=None, schema_file_path=None):
     When parameter is given also checks against the DTD referenced in the XML.
     The DTD is downloaded from the web.
 
+    In streaming mode, which is used for files larger than
+    XML_STREAMING_THRESHOLD_MB by default, the content of <embed> elements
+    is checked for base64 characters while reading and replaced by a short
+    placeholder before parsing, so memory does not grow with the embedded
+    files. Without DTD the document is also never held as a whole: it is
+    parsed and validated against the schema incrementally. Line numbers in
+    error messages refer to the document without the embedded content then.
+
     :param str xml_file_path: path to XML file to be validated
     :param str dtd_file_path: (optional) path to DTD to be checked against
     :param str schema_file_path: (optional) path to XSD to be checked against
+    :param bool streaming: (optional) force or disable streaming mode
     :raises etree.XMLSyntaxError: if XML document is not well-formed
     :raises etree.DocumentInvalid: if XML document does not adhere to XSD
     :return: None
     """
+    if streaming is None:
+        streaming = os.path.getsize(xml_file_path) \
+            > XML_STREAMING_THRESHOLD_MB * 1024 * 1024
+    if streaming:
+        _validate_streaming(xml_file_path, dtd_file_path, schema_file_path)
+        return
+
     parser = etree.XMLParser(huge_tree=True)
 
     xml_doc = etree.parse(xml_file_path, parser)
     log.info("XML Syntax-Check OK!")
+    _validate_doc(xml_doc, dtd_file_path, schema_file_path)
+
 
+def _validate_doc(xml_doc, dtd_file_path, schema_file_path):
     if dtd_file_path:
-        with open(dtd_file_path, 'r') as f:
-            dtd_content = f.read()
-        dtd = etree.DTD(StringIO(dtd_content))
+        dtd = get_dtd(dtd_file_path)
 
         if dtd.validate(xml_doc):
             log.info("DTD Validation OK!")
@@ -40,7 +66,177 @@ def validate_xml(xml_file_path, dtd_file_path=None, schema_file_path=None):
             log.warning(dtd.error_log.filter_from_errors()[0])
 
     if schema_file_path:
-        xmlschema_doc = etree.parse(schema_file_path)
-        xmlschema = etree.XMLSchema(xmlschema_doc)
+        xmlschema = get_schema(schema_file_path)
         xmlschema.assertValid(xml_doc)
         log.info("XSD Schema Validation OK!")
+
+
+def _validate_streaming(xml_file_path, dtd_file_path, schema_file_path):
+    with open(xml_file_path, 'rb') as file:
+        source = _EmbedFilter(file)
+        if dtd_file_path:
+            # DTDs can only validate a tree, which is small without payloads
+            parser = etree.XMLParser(huge_tree=True)
+            xml_doc = etree.parse(source, parser)
+            log.info("XML Syntax-Check OK!")
+            _validate_doc(xml_doc, dtd_file_path, schema_file_path)
+        else:
+            schema = get_schema(schema_file_path) if schema_file_path \
+                else None
+            try:
+                for _, element in etree.iterparse(source, huge_tree=True,
+                                                  schema=schema):
+                    element.clear()
+                    while element.getprevious() is not None:
+                        del element.getparent()[0]
+            except etree.XMLSyntaxError as e:
+                if e.error_log.last_error.domain_name == 'SCHEMASV':
+                    raise etree.DocumentInvalid(str(e)) from e
+                raise
+            log.info("XML Syntax-Check OK!")
+            if schema:
+                log.info("XSD Schema Validation OK!")
+
+    if source.invalid_payloads:
+        raise etree.DocumentInvalid(
+            f"Embedded content of {xml_file_path} is not base64 encoded.")
+    log.info(f"Checked {source.payloads} embedded payloads with "
+             f"{source.payload_bytes} bytes.")
+
+
+class _EmbedFilter:
+    """
+    File wrapper dropping the content of <embed> elements.
+
+    The dropped content is checked for base64 characters and replaced by
+    the placeholder "AAAA" unless it is empty. Only a few bytes around
+    chunk boundaries are kept in memory.
+    """
+
+    _START = b'<embed'
+    _END = b'</embed'
+    _BASE64 = b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz' \
+              b'0123456789+/=' + b' \t\r\n'
+    _PLACEHOLDER = b'AAAA'
+
+    def __init__(self, file, chunk_size=64 * 1024):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.payloads = 0
+        self.payload_bytes = 0
+        self.invalid_payloads = 0
+        self._buffer = b''
+        self._in_payload = False
+        self._payload_size = 0
+        self._payload_valid = True
+        self._eof = False
+        self._output = b''
+        self._position = 0
+
+    def read(self, size=-1):
+        while self._position >= len(self._output) \
+                and not (self._eof and not self._buffer):
+            if not self._eof:
+                data = self.file.read(self.chunk_size)
+                self._eof = not data
+                self._buffer += data
+            self._output = self._process()
+            self._position = 0
+        end = len(self._output) if size < 0 else self._position + size
+        data = self._output[self._position:end]
+        self._position += len(data)
+        return data
+
+    def _process(self):
+        output = []
+        while True:
+            if self._in_payload:
+                end = self._buffer.find(self._END)
+                if end < 0:
+                    keep = 0 if self._eof else len(self._END) - 1
+                    cut = max(len(self._buffer) - keep, 0)
+                    self._drop(self._buffer[:cut])
+                    self._buffer = self._buffer[cut:]
+                    if self._eof:
+                        self._buffer = b''
+                    return b''.join(output)
+                self._drop(self._buffer[:end])
+                if self._payload_size:
+                    output.append(self._PLACEHOLDER)
+                self._buffer = self._buffer[end:]
+                self._in_payload = False
+                continue
+
+            start = self._buffer.find(self._START)
+            if start < 0:
+                keep = 0 if self._eof else len(self._START) - 1
+                cut = max(len(self._buffer) - keep, 0)
+                output.append(self._buffer[:cut])
+                self._buffer = self._buffer[cut:]
+                return b''.join(output)
+
+            tag_end = self._buffer.find(b'>', start)
+            if tag_end < 0 and not self._eof:
+                output.append(self._buffer[:start])
+                self._buffer = self._buffer[start:]
+                return b''.join(output)
+            name_end = start + len(self._START)
+            if tag_end < 0 or self._buffer[name_end:name_end + 1] \
+                    not in (b' ', b'\t', b'\r', b'\n', b'>', b'/'):
+                # another element starting with "embed" or broken markup
+                output.append(self._buffer[:name_end])
+                self._buffer = self._buffer[name_end:]
+                continue
+
+            self_closing = self._buffer[tag_end - 1:tag_end] == b'/'
+            output.append(self._buffer[:tag_end + 1])
+            self._buffer = self._buffer[tag_end + 1:]
+            if not self_closing:
+                self._in_payload = True
+                self._payload_size = 0
+                self._payload_valid = True
+                self.payloads += 1
+
+    def _drop(self, data):
+        if not data:
+            return
+        self._payload_size += len(data)
+        self.payload_bytes += len(data)
+        if self._payload_valid and data.translate(None, self._BASE64):
+            self._payload_valid = False
+            self.invalid_payloads += 1
+
+
+def get_dtd(dtd_file_path):
+    """
+    Return the compiled DTD, parsing the file only if it changed.
+
+    :param str dtd_file_path: path to the DTD
+    :return etree.DTD:
+    """
+    def parse(path):
+        with open(path, 'r') as f:
+            return etree.DTD(StringIO(f.read()))
+    return _get_cached(dtd_file_path, parse)
+
+
+def get_schema(schema_file_path):
+    """
+    Return the compiled XML schema, parsing the file only if it changed.
+
+    :param str schema_file_path: path to the XSD
+    :return etree.XMLSchema:
+    """
+    return _get_cached(schema_file_path,
+                       lambda path: etree.XMLSchema(etree.parse(path)))
+
+
+def _get_cached(path, parse):
+    key = os.path.abspath(path)
+    mtime = os.stat(key).st_mtime_ns
+    cached = _cache.get(key)
+    if cached is None or cached[0] != mtime:
+        log.debug(f"Parsing {key}.")
+        cached = (mtime, parse(key))
+        _cache[key] = cached
+    return cached[1]
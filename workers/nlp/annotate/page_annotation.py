@@ -14,16 +14,29 @@ def annotate_pages(pages: [str]) -> str:
     :param list pages: The pages as a list of strings.
     :return str: The xmi document as an xml string.
     """
-    text = ''.join(pages)
-    builder = DaiNlpXmiBuilder("page-annotator")
-    builder.set_sofa(text)
-
+    page_offsets = []
     page_start = 0
-    page_no = 1
     for page in pages:
         page_end = page_start + len(page)
-        builder.add_annotation(Annotation.page, start=page_start, end=page_end, number=page_no)
+        page_offsets.append((page_start, page_end))
         page_start = page_end
-        page_no += 1
+
+    return annotate_page_offsets(''.join(pages), page_offsets)
+
+
+def annotate_page_offsets(text: str, page_offsets: [(int, int)]) -> str:
+    """
+    Takes a text and the character offsets of its pages and turns them
+    into an XMI document that conforms to the DAI NLP typesystem.
+
+    :param str text: The text of all pages.
+    :param list page_offsets: The (start, end) offsets of the pages in text.
+    :return str: The xmi document as an xml string.
+    """
+    builder = DaiNlpXmiBuilder("page-annotator")
+    builder.set_sofa(text)
+
+    for page_no, (page_start, page_end) in enumerate(page_offsets, 1):
+        builder.add_annotation(Annotation.page, start=page_start, end=page_end, number=page_no)
 
     return builder.xmi()
@@ -4,10 +4,12 @@ import os
 import re
 
 import io
+import json
 from utils.list_dir import list_dir
 from utils.object import Object
+from utils.page_index import PAGE_INDEX_EXTENSION
 from workers.base_task import ObjectTask, FileTask
-from workers.nlp.annotate.page_annotation import annotate_pages
+from workers.nlp.annotate.page_annotation import annotate_pages, annotate_page_offsets
 from workers.nlp.annotate.nlp_components_wrapper import annotate_xmi, annotate_text
 
 log = logging.getLogger(__name__)
@@ -35,19 +37,42 @@ class AnnotatePagesTask(ObjectTask):
         Takes the object, searches its data directory for a bunch of
         pages (txt files) and creates a single xmi file with
         the text of the pages as the SofA and the page ranges in annotations.
+
+        If the directory holds a consolidated text file with a page index
+        (<name>.txt and <name>.pages.json), the page ranges are taken from
+        the index instead of reading the single pages.
         """
         representation = self.get_param('representation')
+        representation_dir = obj.get_representation_dir(representation)
+        directory = self.get_param('target')
+
+        index_files = [path for path in list_dir(representation_dir, sorted=True)
+                       if path.endswith(PAGE_INDEX_EXTENSION)]
+        if index_files:
+            for index_file in index_files:
+                name = index_file[:-len(PAGE_INDEX_EXTENSION)]
+                content = self._annotate_indexed_text(representation_dir, name)
+                obj.add_stream(f'{name}.xmi', directory, io.BytesIO(content.encode(encoding="utf8")))
+            return
+
         pages = []
         # This assumes alphanumerically sorted order for the files returned
         for bytes_io in obj.get_representation(representation):
             text = bytes_io.read().decode(encoding="utf8")
             pages.append(text)
 
-        filename = self._determine_new_filename(obj.get_representation_dir(representation))
+        filename = self._determine_new_filename(representation_dir)
         content = annotate_pages(pages)
-        directory = self.get_param('target')
         obj.add_stream(filename, directory, io.BytesIO(content.encode(encoding="utf8")))
 
+    @staticmethod
+    def _annotate_indexed_text(from_dir: str, name: str):
+        with open(os.path.join(from_dir, name + PAGE_INDEX_EXTENSION)) as index_file:
+            page_offsets = json.load(index_file)['pages']
+        with open(os.path.join(from_dir, f'{name}.txt'), encoding='utf8', newline='') as text_file:
+            text = text_file.read()
+        return annotate_page_offsets(text, page_offsets)
+
 
 class AnnotateNamedEntitiesTask(FileTask):
     """
@@ -1,6 +1,12 @@
 information = {
     "convert.merge_converted_pdf": {"label": "Merge converted PDF",
                                     "description": "Merges individual PDF files into one."},
+    "convert.derive_articles": {"label": "Derive articles",
+                                "description": "Cuts the article PDFs out of the issue PDF and reuses the issue images."},
+    "convert.analyze_pages": {"label": "Analyze pages",
+                              "description": "Detects blank, black-and-white and grayscale pages."},
+    "convert.compress_masters": {"label": "Compress masters",
+                                 "description": "Compresses the master TIFFs losslessly for the archive."},
     "convert.set_pdf_metadata": {"label": "Set PDF metadata",
                                  "description": "Sets PDF metadata based"},
     "convert.jpg_to_pdf": {"label": "Convert JPG to PDF",
@@ -9,8 +15,8 @@ information = {
                            "description": "Converts TIF files into PDF files."},
     "convert.tif_to_jpg": {"label": "Convert TIF to JPG",
                            "description": "Converts TIF files into JPG files."},
-    "convert.pdf_to_txt": {"label": "Convert TIF to TXT",
-                           "description": "Converts TIF files into TXT files."},
+    "convert.pdf_to_txt": {"label": "Convert PDF to TXT",
+                           "description": "Extracts the text of PDF files, OCRs pages without text layer."},
     "convert.pdf_to_tif": {"label": "Convert PDF to TIF",
                            "description": "Converts PDF files into TIF files."},
     "convert.tif_to_txt": {"label": "Convert TIF to TXT",
@@ -29,6 +35,8 @@ information = {
                              "description": "Generates an article frontmatter for OJS."},
     "create_object": {"label": "Create object",
                       "description": "Sets up metadata for further processing."},
+    "load_archived_object": {"label": "Load archived object",
+                             "description": "Links the archived object into the working directory and updates its metadata."},
     "create_complex_object": {"label": "Create complex object", "description": "Copies files from staging to working directories and sets up metadata for further processing."},
     "publish_to_repository": {"label": "Publish to repository",
                               "description": "Copies the current results into the data repository."},